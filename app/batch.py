@@ -0,0 +1,124 @@
+"""
+Concurrent, dependency-ordered execution of task batches (POST /run/batch).
+
+dependencies() builds a graph from the tasks' memo.TaskSpecs. A task depends
+on every earlier task in the batch that
+
+  - writes a path it reads (A1 writes data/, which A3-A10 read),
+  - writes a path it also writes, or
+  - reads a path it writes,
+
+where two paths conflict if they are equal or one contains the other. Edges
+only point back in the list, so the graph is acyclic and list order decides
+which of two conflicting tasks goes first. A task without a spec might touch
+anything: it waits for every task before it, and every task after it waits
+for it. A task whose spec could not be built (a path outside data/, say)
+never runs: it reports its error and nothing waits for it.
+
+run() starts every task at once and each one waits only for its own
+dependencies, so a batch takes as long as its critical path (with at most
+BATCH_CONCURRENCY tasks past their dependencies at a time). Outcomes are
+yielded in completion order. A task whose dependency failed is not run and
+reports status 424. Tasks go through the same execute path as POST /run, so
+identical tasks share one run (single-flight) and repeated ones are answered
+by the task memo. Each task still reads and parses its own inputs.
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from fastapi.encoders import jsonable_encoder
+
+from app.executor import error_status
+from app.memo import TaskSpec
+
+BATCH_MAX_TASKS = int(os.getenv("BATCH_MAX_TASKS", 100))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 8))
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BatchItem:
+    index: int
+    task: str
+    route: Any
+    spec: Optional[TaskSpec]
+    error: Optional[BaseException] = None
+
+
+def _conflict(paths: Sequence[str], others: Sequence[str]) -> bool:
+    for path in paths:
+        for other in others:
+            if path == other or path.startswith(other + os.sep) or other.startswith(path + os.sep):
+                return True
+    return False
+
+
+def _depends(item: BatchItem, earlier: BatchItem) -> bool:
+    if item.error is not None or earlier.error is not None:
+        return False
+    if item.spec is None or earlier.spec is None:
+        return True
+    return (
+        _conflict(item.spec.inputs, earlier.spec.outputs)
+        or _conflict(item.spec.outputs, earlier.spec.outputs)
+        or _conflict(item.spec.outputs, earlier.spec.inputs)
+    )
+
+
+def dependencies(items: Sequence[BatchItem]) -> List[List[int]]:
+    """For each item, the indexes of the earlier items it must wait for."""
+    return [[earlier.index for earlier in items[:position] if _depends(item, earlier)] for position, item in enumerate(items)]
+
+
+def _failure(e: BaseException) -> Dict[str, Any]:
+    # The same statuses POST /run answers with.
+    status = error_status(e)
+    if status == 500 and not hasattr(e, "status_code"):
+        logger.error("Batch task failed", exc_info=e)
+        return {"status": 500, "error": "Internal server error"}
+    return {"status": status, "error": getattr(e, "detail", str(e))}
+
+
+async def run(items: Sequence[BatchItem], execute: Callable[[BatchItem], Awaitable[Any]]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Runs execute(item) for every item, each once its dependencies have
+    finished, and yields {"index", "task", "handler", "depends_on",
+    "status", "seconds", "result" or "error"} as each one completes.
+    """
+    graph = dependencies(items)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    nodes: Dict[int, asyncio.Future] = {}
+
+    async def node(item: BatchItem, depends_on: List[int]) -> Dict[str, Any]:
+        outcome = {"index": item.index, "task": item.task, "handler": item.route.name, "depends_on": depends_on}
+        if item.error is not None:
+            return {**outcome, **_failure(item.error), "seconds": 0.0}
+        failed = []
+        for index in depends_on:
+            if (await asyncio.shield(nodes[index]))["status"] != 200:
+                failed.append(index)
+        if failed:
+            return {**outcome, "status": 424, "seconds": 0.0, "error": f"Not run: task(s) {failed} failed"}
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await execute(item)
+            except Exception as e:
+                return {**outcome, **_failure(e), "seconds": time.perf_counter() - start}
+        return {**outcome, "status": 200, "seconds": time.perf_counter() - start, "result": jsonable_encoder(result)}
+
+    for item, depends_on in zip(items, graph):
+        nodes[item.index] = asyncio.ensure_future(node(item, depends_on))
+    try:
+        for finished in asyncio.as_completed(list(nodes.values())):
+            yield await finished
+    finally:
+        # A client that goes away stops the tasks that have not started yet;
+        # running ones are shielded by single-flight and finish regardless.
+        for future in nodes.values():
+            future.cancel()
@@ -0,0 +1,237 @@
+"""
+Offline card-number OCR for images laid out like datagen's credit card
+(handle_a8).
+
+The number is drawn at a fixed position (50, 250) with PIL's default font,
+so only that band of the image is decoded:
+
+1. Crop the band to grayscale and normalize background and ink to 0..1.
+2. Binarize with one vectorized threshold.
+3. Split the band into glyphs at empty columns. Runs wider than one glyph
+   (glyphs touching through anti-aliasing) are split at the cut that best
+   matches two or more glyphs.
+4. Score each glyph against every template at 3x3 offsets in one NumPy
+   reduction.
+
+Templates are rendered from the same font once per process (and per font
+size, if the number was drawn larger than the default). The best
+reading is checked with Luhn. If it fails, the single-digit substitution
+that satisfies Luhn at the lowest extra matching cost is taken instead.
+"""
+import itertools
+import os
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from app.fsutil import atomic_write
+
+# Band around the number drawn at (50, 250), generous enough for larger fonts.
+REGION = (40, 240, 1012, 330)
+THRESHOLD = 0.6
+DIGITS = "0123456789"
+_PAD = 1
+
+
+@lru_cache(maxsize=None)
+def _templates(size: Optional[int] = None) -> Tuple[np.ndarray, int, int, int, int]:
+    """
+    Returns (stack of shape (10 * 9, H, W), glyph height, max glyph width,
+    number of shifts, min glyph width) for the default font at size (None:
+    its default size).
+    Entry 9 * d + s is digit d at shift s.
+    """
+    font = ImageFont.load_default() if size is None else ImageFont.load_default(size=size)
+    glyphs = []
+    extent = 4 * max(font.getbbox("0")[2:])
+    for digit in DIGITS:
+        canvas = Image.new("L", (extent, extent), 0)
+        ImageDraw.Draw(canvas).text((extent // 4, extent // 4), digit, fill=255, font=font)
+        glyphs.append(_trim(np.asarray(canvas, dtype=np.float32) / 255.0))
+    height = max(glyph.shape[0] for glyph in glyphs)
+    width = max(glyph.shape[1] for glyph in glyphs)
+    shape = (height + 2 * _PAD + 1, width + 2 * _PAD + 1)
+    shifts = list(itertools.product(range(2 * _PAD + 1), repeat=2))
+    stack = np.zeros((len(DIGITS) * len(shifts), *shape), dtype=np.float32)
+    for d, glyph in enumerate(glyphs):
+        for s, (dy, dx) in enumerate(shifts):
+            stack[d * len(shifts) + s, dy:dy + glyph.shape[0], dx:dx + glyph.shape[1]] = glyph
+    return stack, height, width, len(shifts), min(glyph.shape[1] for glyph in glyphs)
+
+
+def _trim(glyph: np.ndarray) -> np.ndarray:
+    ink = glyph > THRESHOLD
+    rows, cols = np.flatnonzero(ink.any(axis=1)), np.flatnonzero(ink.any(axis=0))
+    if not len(rows):
+        return glyph[:0, :0]
+    return glyph[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+
+
+def _costs(glyph: np.ndarray, size: Optional[int]) -> np.ndarray:
+    """Matching cost of glyph against each digit (best shift), shape (10,)."""
+    stack, _, _, shifts, _ = _templates(size)
+    glyph = _trim(glyph)
+    canvas = np.zeros(stack.shape[1:], dtype=np.float32)
+    height, width = min(glyph.shape[0], canvas.shape[0] - 2 * _PAD), min(glyph.shape[1], canvas.shape[1] - 2 * _PAD)
+    canvas[_PAD:_PAD + height, _PAD:_PAD + width] = glyph[:height, :width]
+    # Ink that does not fit the canvas counts fully against every template.
+    overflow = glyph.sum() - glyph[:height, :width].sum()
+    costs = np.abs(stack - canvas).sum(axis=(1, 2)) + overflow
+    return costs.reshape(len(DIGITS), shifts).min(axis=1)
+
+
+def _template_size(height: int) -> Optional[int]:
+    """Font size whose digits are height pixels tall (None: the default size)."""
+    if height == _templates()[1]:
+        return None
+    try:
+        estimate = round(height / 0.72)
+        for size in sorted(range(max(1, estimate - 6), estimate + 7), key=lambda s: abs(s - estimate)):
+            if _templates(size)[1] == height:
+                return size
+    except TypeError:
+        # Pillow < 10.1 has no sized default font.
+        pass
+    return None
+
+
+def _decode_run(run: np.ndarray, size: Optional[int]) -> Tuple[float, List[np.ndarray]]:
+    """
+    Best split of a run of ink columns into glyphs, by dynamic programming
+    over cut positions: (total cost, per-glyph costs).
+    """
+    _, _, max_width, _, min_width = _templates(size)
+    width = run.shape[1]
+    if width <= max_width + 1:
+        costs = _costs(run, size)
+        return float(costs.min()), [costs]
+    best = {0: (0.0, [])}
+    for end in range(min_width, width + 1):
+        for start in range(max(0, end - max_width - 1), end - min_width + 1):
+            if start not in best:
+                continue
+            costs = _costs(run[:, start:end], size)
+            total = best[start][0] + float(costs.min())
+            if end not in best or total < best[end][0]:
+                best[end] = (total, best[start][1] + [costs])
+    if width not in best:
+        costs = _costs(run, size)
+        return float(costs.min()), [costs]
+    return best[width]
+
+
+def luhn_valid(number: str) -> bool:
+    total = 0
+    for i, ch in enumerate(reversed(number)):
+        digit = int(ch)
+        if i % 2:
+            digit = digit * 2 - 9 if digit > 4 else digit * 2
+        total += digit
+    return len(number) > 1 and total % 10 == 0
+
+
+def _luhn_repair(costs: Sequence[np.ndarray]) -> Optional[str]:
+    """Cheapest single-digit change to the best reading that passes Luhn."""
+    best = [int(c.argmin()) for c in costs]
+    candidates = []
+    for position, glyph_costs in enumerate(costs):
+        for digit in range(10):
+            if digit == best[position]:
+                continue
+            number = "".join(map(str, best[:position] + [digit] + best[position + 1:]))
+            if luhn_valid(number):
+                candidates.append((glyph_costs[digit] - glyph_costs[best[position]], number))
+    return min(candidates)[1] if candidates else None
+
+
+def _band(image: Image.Image) -> np.ndarray:
+    left, top, right, bottom = REGION
+    band = image.crop((left, top, min(right, image.width), min(bottom, image.height))).convert("L")
+    pixels = np.asarray(band, dtype=np.float32)
+    background, ink = np.median(pixels), pixels.max()
+    if ink - background < 32:
+        return pixels[:0]
+    return np.clip((pixels - background) / (ink - background), 0.0, 1.0)
+
+
+def read_number(image: Image.Image) -> dict:
+    """Returns {"number", "luhn_valid", "repaired", "cost"} for one card image."""
+    band = _band(image)
+    ink = band > THRESHOLD
+    rows = np.flatnonzero(ink.any(axis=1))
+    if not len(rows):
+        return {"number": "", "luhn_valid": False, "repaired": False, "cost": None}
+    # Only the first line of text: stop at the first empty row after ink.
+    gaps = np.flatnonzero(np.diff(rows) > 1)
+    last = rows[gaps[0]] if len(gaps) else rows[-1]
+    band, ink = band[rows[0]:last + 1], ink[rows[0]:last + 1]
+    size = _template_size(band.shape[0])
+
+    columns = np.concatenate([[0], ink.any(axis=0).astype(np.int8), [0]])
+    edges = np.flatnonzero(np.diff(columns))
+    total, costs = 0.0, []
+    for start, end in zip(edges[::2], edges[1::2]):
+        run_cost, run_costs = _decode_run(band[:, start:end], size)
+        total += run_cost
+        costs.extend(run_costs)
+
+    number = "".join(DIGITS[int(c.argmin())] for c in costs)
+    valid = luhn_valid(number)
+    repaired = False
+    if not valid:
+        fixed = _luhn_repair(costs)
+        if fixed is not None:
+            number, valid, repaired = fixed, True, True
+    return {"number": number, "luhn_valid": valid, "repaired": repaired, "cost": round(total, 3)}
+
+
+def _open_band(path: str) -> Image.Image:
+    """
+    Opens path for reading the band. JPEGs are decoded straight to grayscale
+    with draft(). PNG rows are stored top to bottom, so a non-interlaced PNG
+    is decoded only down to the bottom of the band, which halves the load
+    time of a card image; that relies on Pillow internals (tile, _size), so
+    if it fails the whole image is decoded instead.
+    """
+    image = Image.open(path)
+    if image.format == "JPEG":
+        image.draft("L", image.size)
+    elif image.format == "PNG" and len(image.tile) == 1 and "interlace" not in image.info:
+        bottom = min(REGION[3], image.height)
+        try:
+            name, _, offset, args = image.tile[0]
+            image.tile = [(name, (0, 0, image.width, bottom), offset, args)]
+            image._size = (image.width, bottom)
+            image.load()
+        except Exception:
+            image.close()
+            with Image.open(path) as full:
+                return full.convert("L")
+    return image
+
+
+def read_file(path: str) -> dict:
+    with _open_band(path) as image:
+        return {"path": path, **read_number(image)}
+
+
+def read_batch(paths: Sequence[str]) -> List[dict]:
+    """Reads a batch of images in this process (one cpu_pool task per batch)."""
+    return [read_file(path) for path in paths]
+
+
+def extract_to_file(path: str, output: str) -> dict:
+    result = read_file(path)
+    with atomic_write(output) as output_file:
+        output_file.write(result["number"])
+    return result
+
+
+def image_paths(directory: str) -> List[str]:
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if os.path.splitext(name)[1].lower() in (".png", ".jpg", ".jpeg")
+    )
@@ -0,0 +1,175 @@
+"""
+Bounded-memory external sort for JSON arrays of records (contacts.json).
+
+Records are decoded incrementally from the input array, their sort key is
+computed once, and they are collected into runs that fit in a memory budget.
+Full runs are sorted and spilled to temporary files as `key<TAB>record`
+lines, then k-way merged into the output, so peak memory is set by the
+budget rather than by the size of the file.
+"""
+import heapq
+import json
+import os
+import tempfile
+from operator import itemgetter
+from typing import Iterable, Iterator, List, Sequence, TextIO, Tuple
+
+from app.fsutil import atomic_write
+
+DEFAULT_FIELDS = ("last_name", "first_name")
+MEMORY_BYTES = int(os.getenv("CONTACTS_SORT_MEMORY", 64 * 1024 * 1024))
+MERGE_FAN_IN = 128
+READ_SIZE = 1 << 16
+
+# Rough per-record overhead of a (key tuple, str) pair in a Python list.
+_RECORD_OVERHEAD = 200
+
+_decoder = json.JSONDecoder()
+
+
+def iter_json_array(file: TextIO, read_size: int = READ_SIZE) -> Iterator[object]:
+    """Yields the elements of a top-level JSON array without loading it whole."""
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = file.read(read_size)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    skip_whitespace()
+    if pos >= len(buf) or buf[pos] != "[":
+        raise ValueError("Expected a JSON array")
+    pos += 1
+    expect_value = True
+    while True:
+        skip_whitespace()
+        if pos >= len(buf):
+            raise ValueError("Unterminated JSON array")
+        if buf[pos] == "]":
+            return
+        if not expect_value:
+            if buf[pos] != ",":
+                raise ValueError(f"Expected ',' in JSON array, got {buf[pos]!r}")
+            pos += 1
+            skip_whitespace()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # The value may just be cut off at the end of the buffer.
+                if eof:
+                    raise
+                fill()
+                continue
+            if end == len(buf) and not eof:
+                # A number at the end of the buffer may continue in the next read.
+                fill()
+                continue
+            break
+        pos = end
+        expect_value = False
+        yield value
+
+
+def sort_key(record: dict, fields: Sequence[str]) -> Tuple[str, ...]:
+    return tuple(str(record.get(field) or "") for field in fields)
+
+
+def _spill(run: List[Tuple[tuple, str]], directory: str) -> str:
+    run.sort(key=itemgetter(0))
+    fd, path = tempfile.mkstemp(suffix=".run", dir=directory)
+    with os.fdopen(fd, "w", encoding="utf-8") as out:
+        for key, line in run:
+            out.write(json.dumps(key))
+            out.write("\t")
+            out.write(line)
+            out.write("\n")
+    return path
+
+
+def _read_run(path: str) -> Iterator[Tuple[list, str]]:
+    with open(path, "r", encoding="utf-8") as run:
+        for row in run:
+            key, _, line = row.rstrip("\n").partition("\t")
+            yield json.loads(key), line
+
+
+def _merge_runs(paths: List[str], directory: str) -> str:
+    fd, path = tempfile.mkstemp(suffix=".run", dir=directory)
+    with os.fdopen(fd, "w", encoding="utf-8") as out:
+        for key, line in heapq.merge(*(_read_run(p) for p in paths), key=itemgetter(0)):
+            out.write(json.dumps(key))
+            out.write("\t")
+            out.write(line)
+            out.write("\n")
+    for p in paths:
+        os.remove(p)
+    return path
+
+
+def _write_array(lines: Iterable[str], out: TextIO) -> int:
+    count = 0
+    for line in lines:
+        out.write(",\n" if count else "[\n")
+        out.write(line)
+        count += 1
+    out.write("\n]\n" if count else "[]\n")
+    return count
+
+
+def sort_contacts(
+    src: str,
+    dst: str,
+    fields: Sequence[str] = DEFAULT_FIELDS,
+    memory_bytes: int = MEMORY_BYTES,
+) -> dict:
+    """
+    Sorts the JSON array in src by fields and writes it to dst, one compact
+    record per line. The sort is stable. Returns record and run counts.
+    """
+    fields = tuple(fields)
+    directory = os.path.dirname(os.path.abspath(dst))
+    with tempfile.TemporaryDirectory(prefix=".sort-", dir=directory) as tmp:
+        runs = []
+        run: List[Tuple[tuple, str]] = []
+        run_bytes = 0
+        with open(src, "r", encoding="utf-8") as file:
+            for record in iter_json_array(file):
+                line = json.dumps(record)
+                run.append((sort_key(record, fields), line))
+                run_bytes += 2 * len(line) + _RECORD_OVERHEAD
+                if run_bytes >= memory_bytes:
+                    runs.append(_spill(run, tmp))
+                    run, run_bytes = [], 0
+
+        if runs and run:
+            runs.append(_spill(run, tmp))
+            run = []
+        spilled = len(runs)
+        while len(runs) > MERGE_FAN_IN:
+            runs = [_merge_runs(runs[i:i + MERGE_FAN_IN], tmp) for i in range(0, len(runs), MERGE_FAN_IN)]
+
+        if runs:
+            merged = heapq.merge(*(_read_run(p) for p in runs), key=itemgetter(0))
+            lines = (line for _, line in merged)
+        else:
+            run.sort(key=itemgetter(0))
+            lines = (line for _, line in run)
+
+        with atomic_write(dst) as out:
+            count = _write_array(lines, out)
+    return {"records": count, "runs": max(1, spilled), "fields": list(fields)}
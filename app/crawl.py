@@ -0,0 +1,185 @@
+"""
+Concurrent page crawler and metadata extractor (handle_b6).
+
+Seed URLs are fetched concurrently through the shared client in app.fetch,
+under a global concurrency cap and a per-host limit (in-flight requests plus
+a minimum delay between request starts). Bodies are never buffered whole:
+each chunk is fed to an incremental lxml HTMLPullParser and to a SHA-256,
+and parsing stops as soon as the head has been read, since only head
+metadata is extracted.
+
+Per-URL state (ETag, Last-Modified, body hash, last record) is kept in
+data/.cache. A page answering 304 to a conditional request is not downloaded
+again, and a page whose body hash is unchanged is reported as unchanged.
+Records are written to the NDJSON output as each page completes; the file
+and the state are written on io_pool, never on the event loop.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Iterable, Optional
+from urllib.parse import urldefrag, urlsplit
+
+import httpx
+from lxml import etree
+
+from app import fetch
+from app.executor import io_pool
+from app.fsutil import async_atomic_write, cache_path, load_json, save_json
+
+CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", 32))
+PER_HOST = int(os.getenv("CRAWL_PER_HOST", 4))
+HOST_DELAY = float(os.getenv("CRAWL_HOST_DELAY", 0.0))
+MAX_BYTES = int(os.getenv("CRAWL_MAX_BYTES", 5 * 1024 * 1024))
+
+STATE_PATH = "crawl-state.json"
+
+
+class _Host:
+    """Caps in-flight requests to one host and spaces out their start times."""
+
+    def __init__(self, limit: int, delay: float):
+        self.slots = asyncio.Semaphore(limit)
+        self.delay = delay
+        self.next_start = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait_turn(self):
+        if self.delay <= 0:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            wait = self.next_start - now
+            self.next_start = max(now, self.next_start) + self.delay
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class HeadExtractor:
+    """
+    Feeds HTML incrementally and collects title, meta description, canonical
+    link and document language. `done` turns true once the head has ended.
+    """
+
+    def __init__(self, encoding: Optional[str] = None):
+        self._parser = etree.HTMLPullParser(events=("start", "end"), encoding=encoding)
+        self.fields = {"title": None, "description": None, "canonical": None, "lang": None}
+        self.done = False
+
+    def feed(self, chunk: bytes):
+        if self.done:
+            return
+        self._parser.feed(chunk)
+        self._drain()
+
+    def close(self) -> dict:
+        if not self.done:
+            try:
+                self._parser.close()
+            except etree.XMLSyntaxError:
+                pass
+            self._drain()
+        return self.fields
+
+    def _drain(self):
+        for event, element in self._parser.read_events():
+            tag = element.tag if isinstance(element.tag, str) else ""
+            if event == "start":
+                if tag == "html":
+                    self.fields["lang"] = element.get("lang")
+                elif tag == "body":
+                    self.done = True
+                    return
+                continue
+            if tag == "title" and self.fields["title"] is None:
+                self.fields["title"] = (element.text or "").strip()
+            elif tag == "meta" and (element.get("name") or "").lower() == "description":
+                self.fields["description"] = element.get("content")
+            elif tag == "link" and "canonical" in (element.get("rel") or "").lower().split():
+                self.fields["canonical"] = element.get("href")
+            elif tag == "head":
+                self.done = True
+                return
+
+
+def normalize_url(url: str) -> str:
+    return urldefrag(url.strip())[0]
+
+
+async def _fetch_page(url: str, previous: dict) -> dict:
+    headers = {}
+    if previous.get("etag"):
+        headers["If-None-Match"] = previous["etag"]
+    if previous.get("last_modified"):
+        headers["If-Modified-Since"] = previous["last_modified"]
+
+    async with fetch.client().stream("GET", url, headers=headers) as response:
+        if response.status_code == 304 and previous.get("record"):
+            return {**previous, "changed": False}
+        response.raise_for_status()
+        extractor = HeadExtractor(response.charset_encoding)
+        digest = hashlib.sha256()
+        size = 0
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > MAX_BYTES:
+                raise ValueError(f"Response larger than {MAX_BYTES} bytes")
+            digest.update(chunk)
+            extractor.feed(chunk)
+        content_hash = digest.hexdigest()
+        if content_hash == previous.get("hash") and previous.get("record"):
+            record = previous["record"]
+        else:
+            record = {"url": url, "final_url": str(response.url), **extractor.close()}
+        return {
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "hash": content_hash,
+            "record": record,
+            "changed": content_hash != previous.get("hash"),
+        }
+
+
+async def crawl(urls: Iterable[str], output: str, concurrency: int = CONCURRENCY,
+                per_host: int = PER_HOST, host_delay: float = HOST_DELAY) -> dict:
+    """
+    Fetches every URL once and writes one NDJSON record per page to output.
+    Returns counts of pages, changed, unchanged and errors.
+    """
+    urls = list(dict.fromkeys(normalize_url(url) for url in urls))
+    state_path = await io_pool.run(cache_path, STATE_PATH)
+    state: Dict[str, dict] = await io_pool.run(load_json, state_path, {})
+    hosts: Dict[str, _Host] = {}
+    limit = asyncio.Semaphore(concurrency)
+    counts = {"pages": len(urls), "changed": 0, "unchanged": 0, "errors": 0}
+
+    async def visit(url: str):
+        host = hosts.setdefault(urlsplit(url).netloc, _Host(per_host, host_delay))
+        # Wait for the host (its slots and its politeness delay) first, so
+        # requests queued behind a slow host do not hold global slots that
+        # other hosts could use.
+        async with host.slots:
+            await host.wait_turn()
+            async with limit:
+                try:
+                    return url, await _fetch_page(url, state.get(url, {})), None
+                except (httpx.HTTPError, ValueError) as e:
+                    return url, None, str(e) or type(e).__name__
+
+    async with async_atomic_write(output) as output_file:
+        for next_result in asyncio.as_completed([visit(url) for url in urls]):
+            url, entry, error = await next_result
+            if error is not None:
+                counts["errors"] += 1
+                record = {"url": url, "error": error}
+            else:
+                counts["changed" if entry.pop("changed") else "unchanged"] += 1
+                state[url] = entry
+                record = entry["record"]
+            await output_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            await output_file.flush()
+
+    await io_pool.run(save_json, state_path, state)
+    return counts
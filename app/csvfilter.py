@@ -0,0 +1,274 @@
+"""
+Out-of-core CSV filtering (handle_b10 and GET /csv/filter).
+
+A filter expression such as `name == "Alice" and (age >= 30 or city in
+('Paris', 'Rome'))` is parsed by a small recursive-descent parser into a SQL
+predicate. Column names are checked against the CSV header and quoted, and
+every literal is bound as a parameter, so no user text is interpolated into
+SQL. The query runs on DuckDB's read_csv_auto, which scans the file in
+parallel, streaming, with the projection and predicate pushed into the scan.
+Results are pulled as Arrow record batches, so memory stays bounded whatever
+the file size. For JSON output DuckDB serializes each row itself (to_json),
+which is several times faster than converting rows to Python objects;
+other formats go through duckquery.encode.
+"""
+import os
+import re
+import threading
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import duckdb
+
+from app import duckquery
+from app.fsutil import atomic_write
+
+BATCH_ROWS = int(os.getenv("CSV_FILTER_BATCH_ROWS", 65536))
+MEMORY_LIMIT = os.getenv("CSV_FILTER_MEMORY_LIMIT", "1GB")
+
+_TOKENS = re.compile(
+    r"""\s*(?:
+        (?P<number>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+      | (?P<string>'(?:[^']|'')*'|"(?:[^"\\]|\\.)*")
+      | (?P<quoted>`[^`]+`)
+      | (?P<word>[A-Za-z_][\w.]*)
+      | (?P<op>==|!=|<>|<=|>=|=|<|>|\(|\)|,)
+    )""",
+    re.VERBOSE,
+)
+_KEYWORDS = {"and", "or", "not", "in", "is", "null", "like", "ilike", "between", "true", "false"}
+_COMPARISONS = {"==": "=", "=": "=", "!=": "<>", "<>": "<>", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+
+
+class FilterSyntaxError(ValueError):
+    pass
+
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens, position = [], 0
+    text = text.strip()
+    while position < len(text):
+        match = _TOKENS.match(text, position)
+        if not match or match.end() == position:
+            raise FilterSyntaxError(f"Unexpected input at {position}: {text[position:position + 20]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "word" and value.lower() in _KEYWORDS:
+            kind, value = "keyword", value.lower()
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+def _literal(kind: str, value: str):
+    if kind == "number":
+        return float(value) if re.search(r"[.eE]", value) else int(value)
+    if kind == "string":
+        if value[0] == "'":
+            return value[1:-1].replace("''", "'")
+        return re.sub(r"\\(.)", r"\1", value[1:-1])
+    if kind == "keyword" and value in ("true", "false"):
+        return value == "true"
+    raise FilterSyntaxError(f"Expected a literal, got {value!r}")
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+class _Parser:
+    def __init__(self, text: str, columns: Sequence[str]):
+        self.tokens = _tokenize(text)
+        self.position = 0
+        self.columns = {column.lower(): column for column in columns}
+        self.params: list = []
+
+    def peek(self, offset: int = 0) -> Tuple[Optional[str], Optional[str]]:
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def take(self, kind: str = None, value: str = None) -> str:
+        token_kind, token_value = self.peek()
+        if token_kind is None or (kind and token_kind != kind) or (value and token_value != value):
+            expected = value or kind or "more input"
+            raise FilterSyntaxError(f"Expected {expected}, got {token_value or 'end of expression'!r}")
+        self.position += 1
+        return token_value
+
+    def accept(self, kind: str, value: str = None) -> bool:
+        token_kind, token_value = self.peek()
+        if token_kind == kind and (value is None or token_value == value):
+            self.position += 1
+            return True
+        return False
+
+    def parse(self) -> str:
+        sql = self.disjunction()
+        if self.position != len(self.tokens):
+            raise FilterSyntaxError(f"Unexpected {self.peek()[1]!r}")
+        return sql
+
+    def disjunction(self) -> str:
+        parts = [self.conjunction()]
+        while self.accept("keyword", "or"):
+            parts.append(self.conjunction())
+        return parts[0] if len(parts) == 1 else "(" + " OR ".join(parts) + ")"
+
+    def conjunction(self) -> str:
+        parts = [self.negation()]
+        while self.accept("keyword", "and"):
+            parts.append(self.negation())
+        return parts[0] if len(parts) == 1 else "(" + " AND ".join(parts) + ")"
+
+    def negation(self) -> str:
+        if self.accept("keyword", "not"):
+            return f"(NOT {self.negation()})"
+        if self.accept("op", "("):
+            sql = self.disjunction()
+            self.take("op", ")")
+            return sql
+        return self.comparison()
+
+    def column(self) -> str:
+        kind, value = self.peek()
+        if kind not in ("word", "quoted"):
+            raise FilterSyntaxError(f"Expected a column name, got {value or 'end of expression'!r}")
+        self.position += 1
+        name = value.strip("`")
+        if name.lower() not in self.columns:
+            raise FilterSyntaxError(f"Unknown column: {name}")
+        return _quote(self.columns[name.lower()])
+
+    def value(self) -> str:
+        kind, value = self.peek()
+        if kind is None:
+            raise FilterSyntaxError("Expected a literal, got end of expression")
+        self.position += 1
+        self.params.append(_literal(kind, value))
+        return "?"
+
+    def comparison(self) -> str:
+        column = self.column()
+        kind, value = self.peek()
+        if kind == "op" and value in _COMPARISONS:
+            self.position += 1
+            return f"{column} {_COMPARISONS[value]} {self.value()}"
+        negated = self.accept("keyword", "not")
+        prefix = "NOT " if negated else ""
+        if self.accept("keyword", "in"):
+            self.take("op", "(")
+            values = [self.value()]
+            while self.accept("op", ","):
+                values.append(self.value())
+            self.take("op", ")")
+            return f"{column} {prefix}IN ({', '.join(values)})"
+        if self.accept("keyword", "like") or self.accept("keyword", "ilike"):
+            operator = self.tokens[self.position - 1][1].upper()
+            return f"{column} {prefix}{operator} {self.value()}"
+        if self.accept("keyword", "between"):
+            low = self.value()
+            self.take("keyword", "and")
+            return f"{column} {prefix}BETWEEN {low} AND {self.value()}"
+        if not negated and self.accept("keyword", "is"):
+            is_not = self.accept("keyword", "not")
+            self.take("keyword", "null")
+            return f"{column} IS {'NOT ' if is_not else ''}NULL"
+        raise FilterSyntaxError(f"Expected an operator after {column}, got {value or 'end of expression'!r}")
+
+
+def compile_filter(expression: str, columns: Sequence[str]) -> Tuple[str, list]:
+    """Returns (SQL predicate with ? placeholders, parameters) for expression."""
+    if not expression or not expression.strip():
+        return "TRUE", []
+    parser = _Parser(expression, columns)
+    return parser.parse(), parser.params
+
+
+_local = threading.local()
+
+
+def _connection() -> duckdb.DuckDBPyConnection:
+    conn = getattr(_local, "connection", None)
+    if conn is None:
+        conn = _local.connection = duckdb.connect(config={"memory_limit": MEMORY_LIMIT})
+    return conn
+
+
+def columns(path: str) -> List[str]:
+    rows = _connection().execute("DESCRIBE SELECT * FROM read_csv_auto(?)", [path]).fetchall()
+    return [row[0] for row in rows]
+
+
+def build_query(path: str, where: str = "", select: Optional[Sequence[str]] = None,
+                limit: Optional[int] = None) -> Tuple[str, list]:
+    """Returns (sql, params) selecting `select` columns of rows matching `where`."""
+    available = columns(path)
+    by_name = {column.lower(): column for column in available}
+    if select:
+        unknown = [name for name in select if name.lower() not in by_name]
+        if unknown:
+            raise FilterSyntaxError(f"Unknown column(s): {', '.join(unknown)}")
+        projection = ", ".join(_quote(by_name[name.lower()]) for name in select)
+    else:
+        projection = "*"
+    predicate, params = compile_filter(where, available)
+    sql = f"SELECT {projection} FROM read_csv_auto(?) WHERE {predicate}"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    return sql, [path, *params]
+
+
+def _encode_json_rows(batches, fmt: str) -> Iterator[bytes]:
+    """Joins the pre-serialized JSON rows of a one-column reader."""
+    separator = "["
+    for batch in batches:
+        rows = batch.column(0).to_pylist()
+        if not rows:
+            continue
+        if fmt == "ndjson":
+            yield ("\n".join(rows) + "\n").encode()
+        else:
+            yield (separator + ",".join(rows)).encode()
+            separator = ","
+    if fmt == "json":
+        yield b"[]" if separator == "[" else b"]"
+
+
+def filter_csv(path: str, where: str = "", select: Optional[Sequence[str]] = None, fmt: str = "ndjson",
+               limit: Optional[int] = None, batch_rows: int = BATCH_ROWS) -> Iterator[bytes]:
+    """
+    Filters the CSV at path and returns an iterator of encoded chunks. The
+    expression is validated and the scan started before this returns.
+    """
+    if fmt not in duckquery.MEDIA_TYPES:
+        raise ValueError(f"Unsupported format: {fmt}")
+    sql, params = build_query(path, where, select, limit)
+    json_rows = fmt in ("json", "ndjson")
+    if json_rows:
+        sql = f"SELECT to_json(filtered)::VARCHAR FROM ({sql}) AS filtered"
+    # A cursor of the thread's connection, so the stream can be consumed on
+    # another thread while this one runs the next query.
+    cursor = _connection().cursor()
+    try:
+        reader = cursor.execute(sql, params).fetch_record_batch(batch_rows)
+    except BaseException:
+        cursor.close()
+        raise
+
+    def stream():
+        try:
+            yield from _encode_json_rows(reader, fmt) if json_rows else duckquery.encode(reader, fmt)
+        finally:
+            cursor.close()
+
+    return stream()
+
+
+def filter_to_file(path: str, output: str, where: str = "", select: Optional[Sequence[str]] = None,
+                   fmt: str = "json") -> int:
+    """Writes the filtered rows to output; returns the number of bytes written."""
+    written = 0
+    with atomic_write(output, "wb") as output_file:
+        for chunk in filter_csv(path, where, select, fmt):
+            output_file.write(chunk)
+            written += len(chunk)
+    return written
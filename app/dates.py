@@ -0,0 +1,166 @@
+"""
+Streaming weekday histogram over a file of dates in mixed formats.
+
+The file is read in fixed-size blocks of whole lines, so memory stays flat
+regardless of file size. Each block is handled as one NumPy byte array: line
+starts come from the newline positions, a line's format is picked from the
+separator at a fixed offset, and the year/month/day fields of every line of a
+format are decoded and converted to weekdays with array arithmetic, without a
+Python-level loop over lines.
+"""
+import os
+from dataclasses import dataclass, field
+from typing import List
+
+import numpy as np
+
+CHUNK_BYTES = int(os.getenv("DATES_CHUNK_BYTES", 16 * 1024 * 1024))
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+_MONTH_KEYS = np.array([(ord(m[0]) << 16) | (ord(m[1]) << 8) | ord(m[2]) for m in MONTHS], dtype=np.int64)
+_MONTH_ORDER = np.argsort(_MONTH_KEYS)
+_MONTH_KEYS_SORTED = _MONTH_KEYS[_MONTH_ORDER]
+_DAYS_IN_MONTH = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31], dtype=np.int64)
+_BLANK = np.array([ord(c) for c in " \t\r\n"], dtype=np.uint8)
+
+
+@dataclass(frozen=True)
+class DateFormat:
+    """Fixed-width layout of one date format produced by datagen.get_dates."""
+    example: str
+    length: int
+    separators: tuple  # (offset, character) pairs that must all match
+    year: int
+    month: int
+    day: int
+    month_name: bool = False
+
+
+FORMATS = [
+    DateFormat("2024-03-14", 10, ((4, "-"), (7, "-")), year=0, month=5, day=8),
+    DateFormat("2024/03/14 15:30:45", 19, ((4, "/"), (7, "/"), (10, " "), (13, ":"), (16, ":")), year=0, month=5, day=8),
+    DateFormat("14-Mar-2024", 11, ((2, "-"), (6, "-")), year=7, month=3, day=0, month_name=True),
+    DateFormat("Mar 14, 2024", 12, ((3, " "), (6, ","), (7, " ")), year=8, month=0, day=4, month_name=True),
+]
+
+
+@dataclass
+class DateStats:
+    weekdays: List[int] = field(default_factory=lambda: [0] * 7)
+    invalid: int = 0
+
+    @property
+    def total(self) -> int:
+        return sum(self.weekdays) + self.invalid
+
+    def count(self, weekday: str) -> int:
+        return self.weekdays[WEEKDAYS.index(weekday.capitalize())]
+
+    def as_dict(self):
+        return dict(zip(WEEKDAYS, self.weekdays))
+
+
+def _digits(buf, starts, offset, width):
+    value = np.zeros(len(starts), dtype=np.int64)
+    ok = np.ones(len(starts), dtype=bool)
+    for i in range(width):
+        digit = buf[starts + offset + i].astype(np.int64) - 48
+        ok &= (digit >= 0) & (digit <= 9)
+        value = value * 10 + digit
+    return value, ok
+
+
+def _month_names(buf, starts, offset):
+    key = np.zeros(len(starts), dtype=np.int64)
+    for i in range(3):
+        key = (key << 8) | (buf[starts + offset + i] | 0x20).astype(np.int64)
+    idx = np.minimum(np.searchsorted(_MONTH_KEYS_SORTED, key), 11)
+    return _MONTH_ORDER[idx] + 1, _MONTH_KEYS_SORTED[idx] == key
+
+
+def _weekday(year, month, day):
+    """Monday=0 weekday of proleptic Gregorian dates (days_from_civil)."""
+    y = year - (month <= 2)
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * np.where(month > 2, month - 3, month + 9) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    days = era * 146097 + doe - 719468
+    return (days + 3) % 7
+
+
+def _parse(buf, starts, fmt: DateFormat):
+    """Returns (weekday, valid) arrays for lines already classified as fmt."""
+    year, ok = _digits(buf, starts, fmt.year, 4)
+    if fmt.month_name:
+        month, month_ok = _month_names(buf, starts, fmt.month)
+    else:
+        month, month_ok = _digits(buf, starts, fmt.month, 2)
+    day, day_ok = _digits(buf, starts, fmt.day, 2)
+    ok &= month_ok & day_ok & (month >= 1) & (month <= 12)
+    for offset, char in fmt.separators:
+        ok &= buf[starts + offset] == ord(char)
+    # Anything after the date other than whitespace makes the line invalid.
+    ok &= np.isin(buf[starts + fmt.length], _BLANK)
+    month = np.clip(month, 1, 12)
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    ok &= (day >= 1) & (day <= _DAYS_IN_MONTH[month] + (leap & (month == 2)))
+    return _weekday(year, month, day), ok
+
+
+def _count_block(block: bytes, stats: DateStats):
+    # Padding with newlines lets every fixed-offset read stay in bounds; a
+    # short line then simply fails its separator or digit checks.
+    pad = max(fmt.length for fmt in FORMATS) + 1
+    buf = np.frombuffer(block + b"\n" * pad, dtype=np.uint8)
+    newlines = np.flatnonzero(buf[: len(block)] == 10)
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [len(block)]))
+    starts, ends = starts[starts < ends], ends[starts < ends]
+
+    # Lines that start with whitespace are rare; strip them in Python and
+    # recount them as their own block.
+    indented = np.isin(buf[starts], _BLANK)
+    if indented.any():
+        stripped = [block[s:e].strip() for s, e in zip(starts[indented], ends[indented])]
+        stripped = [line for line in stripped if line]
+        starts = starts[~indented]
+        if stripped:
+            _count_block(b"\n".join(stripped), stats)
+
+    counts = np.zeros(7, dtype=np.int64)
+    unclassified = np.ones(len(starts), dtype=bool)
+    for fmt in FORMATS:
+        offset, char = fmt.separators[0]
+        mask = unclassified & (buf[starts + offset] == ord(char))
+        if not mask.any():
+            continue
+        unclassified &= ~mask
+        weekday, ok = _parse(buf, starts[mask], fmt)
+        stats.invalid += int((~ok).sum())
+        counts += np.bincount(weekday[ok], minlength=7)
+    stats.invalid += int(unclassified.sum())
+    stats.weekdays = [a + int(b) for a, b in zip(stats.weekdays, counts)]
+
+
+def weekday_histogram(path: str, chunk_bytes: int = CHUNK_BYTES) -> DateStats:
+    """Counts the dates in the file per weekday (Monday first)."""
+    stats = DateStats()
+    remainder = b""
+    with open(path, "rb") as file:
+        while True:
+            data = file.read(chunk_bytes)
+            if not data:
+                break
+            data = remainder + data
+            cut = data.rfind(b"\n") + 1
+            if cut == 0:
+                remainder = data
+                continue
+            remainder = data[cut:]
+            _count_block(data[:cut], stats)
+    if remainder:
+        _count_block(remainder, stats)
+    return stats
@@ -0,0 +1,94 @@
+"""
+Incremental, parallel index of Markdown titles (handle_a6).
+
+The docs tree is walked recursively with one os.scandir per directory, fanned
+out over a thread pool. A manifest keyed by relative path remembers each
+file's (mtime_ns, size, title), so only new or changed files are opened, and
+each of those is read only up to its first H1. The cost of a re-index is one
+stat per file plus one partial read per changed file.
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from app.fsutil import atomic_write, cache_path, load_json, save_json
+
+WORKERS = int(os.getenv("DOCS_INDEX_WORKERS", 16))
+
+_manifests: Dict[str, dict] = {}
+
+
+def _manifest_path(root: str) -> str:
+    digest = hashlib.sha1(os.path.abspath(root).encode()).hexdigest()[:16]
+    return cache_path(f"docs-manifest-{digest}.json")
+
+
+def _scan_dir(path: str) -> Tuple[List[Tuple[str, int, int]], List[str]]:
+    files, subdirs = [], []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.name.endswith(".md") and entry.is_file():
+                    st = entry.stat()
+                    files.append((entry.path, st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                continue
+    return files, subdirs
+
+
+def walk_markdown(root: str, executor: ThreadPoolExecutor) -> List[Tuple[str, int, int]]:
+    """Returns (path, mtime_ns, size) for every .md file under root."""
+    found = []
+    pending = [executor.submit(_scan_dir, root)]
+    while pending:
+        files, subdirs = pending.pop().result()
+        found.extend(files)
+        pending.extend(executor.submit(_scan_dir, subdir) for subdir in subdirs)
+    return found
+
+
+def first_h1(path: str) -> str:
+    with open(path, "r", encoding="utf-8", errors="replace") as file:
+        for line in file:
+            if line.startswith("# "):
+                return line.strip("# ").strip()
+    return "Untitled"
+
+
+def build_index(root: str, output: str) -> dict:
+    """
+    Writes {relative path: first H1} for every Markdown file under root to
+    output, re-reading only files whose mtime or size changed.
+    """
+    manifest_path = _manifest_path(root)
+    manifest = _manifests.get(manifest_path)
+    if manifest is None:
+        manifest = load_json(manifest_path, default={})
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        found = walk_markdown(root, executor)
+        current = {}
+        changed = []
+        for path, mtime_ns, size in found:
+            key = os.path.relpath(path, root).replace(os.sep, "/")
+            entry = manifest.get(key)
+            if entry is not None and entry[0] == mtime_ns and entry[1] == size:
+                current[key] = entry
+            else:
+                changed.append((key, path, mtime_ns, size))
+        titles = executor.map(first_h1, [path for _, path, _, _ in changed])
+        for (key, _, mtime_ns, size), title in zip(changed, titles):
+            current[key] = [mtime_ns, size, title]
+
+    removed = len(manifest.keys() - current.keys())
+    if changed or removed or not os.path.exists(output):
+        index = {key: current[key][2] for key in sorted(current)}
+        with atomic_write(output) as index_file:
+            json.dump(index, index_file, indent=2)
+        save_json(manifest_path, current)
+    _manifests[manifest_path] = current
+    return {"files": len(current), "reindexed": len(changed), "removed": removed}
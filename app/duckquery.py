@@ -0,0 +1,249 @@
+"""
+Persistent DuckDB query service (handle_b3 and GET /duckdb/query).
+
+One read-only DuckDB connection is kept per database file and reopened when
+the file changes; a replaced connection is closed once its last cursor is
+released. Connections have external access disabled (and their configuration
+locked), so SQL cannot read or write files other than the database itself
+(read_csv('/etc/passwd'), COPY ... TO, ATTACH, extension installs), which
+also keeps every result a function of the database file. Each query runs on
+a cursor (DuckDB's duplicate connection, safe to use from another thread)
+taken from a small idle pool, so concurrent readers do not serialize on one
+connection. Results are pulled as Arrow record batches and encoded
+incrementally as NDJSON, a JSON array, CSV, Parquet or an Arrow IPC stream,
+keeping memory flat for large results. Small encoded results are cached
+keyed on the normalized SQL, the output format and the file version.
+"""
+import io
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator
+
+import duckdb
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+BATCH_ROWS = int(os.getenv("DUCKDB_BATCH_ROWS", 65536))
+IDLE_CURSORS = int(os.getenv("DUCKDB_IDLE_CURSORS", 8))
+RESULT_CACHE_BYTES = int(os.getenv("DUCKDB_RESULT_CACHE_BYTES", 32 * 1024 * 1024))
+RESULT_CACHE_ENTRY_BYTES = int(os.getenv("DUCKDB_RESULT_CACHE_ENTRY_BYTES", 1024 * 1024))
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# Quoted strings and identifiers are kept verbatim; whitespace elsewhere is collapsed.
+_SQL_TOKENS = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\s+|[^'\"\s]+")
+
+
+def normalize_sql(sql: str) -> str:
+    parts = []
+    for token in _SQL_TOKENS.findall(sql.strip().rstrip(";").strip()):
+        parts.append(" " if token.isspace() else token)
+    return "".join(parts)
+
+
+def _version(path: str) -> tuple:
+    st = os.stat(path)
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+CONNECTION_CONFIG = {"enable_external_access": False, "lock_configuration": True}
+
+
+class _Database:
+    def __init__(self, path: str, version: tuple):
+        self.version = version
+        self.connection = duckdb.connect(path, read_only=True, config=CONNECTION_CONFIG)
+        self.idle = []
+        self.busy = 0
+
+    def close(self):
+        for cur in self.idle:
+            cur.close()
+        self.idle = []
+        self.connection.close()
+
+
+_databases = {}
+_lock = threading.Lock()
+
+
+def _acquire(path: str):
+    version = _version(path)
+    with _lock:
+        database = _databases.get(path)
+        if database is None or database.version != version:
+            if database is not None and database.busy == 0:
+                database.close()
+            # Otherwise the last cursor still in use closes it (_release).
+            database = _databases[path] = _Database(path, version)
+        cur = database.idle.pop() if database.idle else database.connection.cursor()
+        database.busy += 1
+    return database, cur
+
+
+def _release(path: str, database: _Database, cur):
+    with _lock:
+        database.busy -= 1
+        current = _databases.get(path) is database
+        if current and len(database.idle) < IDLE_CURSORS:
+            database.idle.append(cur)
+            return
+        retired = not current and database.busy == 0
+    cur.close()
+    if retired:
+        with _lock:
+            database.close()
+
+
+@contextmanager
+def cursor(path: str):
+    """Yields a read-only cursor on the database at path."""
+    path = os.path.abspath(path)
+    database, cur = _acquire(path)
+    try:
+        yield cur
+    finally:
+        _release(path, database, cur)
+
+
+class _ResultCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value: bytes):
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+_results = _ResultCache(RESULT_CACHE_BYTES)
+
+
+def _encode_ndjson(batches) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(json.dumps(row, default=str) + "\n" for row in batch.to_pylist()).encode()
+
+
+def _encode_csv(batches) -> Iterator[bytes]:
+    first = True
+    for batch in batches:
+        sink = io.BytesIO()
+        pa_csv.write_csv(batch, sink, pa_csv.WriteOptions(include_header=first))
+        first = False
+        yield sink.getvalue()
+
+
+def _encode_json(batches) -> Iterator[bytes]:
+    separator = "["
+    for batch in batches:
+        rows = batch.to_pylist()
+        if rows:
+            yield (separator + ",".join(json.dumps(row, default=str) for row in rows)).encode()
+            separator = ","
+    yield b"[]" if separator == "[" else b"]"
+
+
+def _drain(sink: io.BytesIO) -> bytes:
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+
+def _encode_arrow(batches, schema) -> Iterator[bytes]:
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield _drain(sink)
+    yield sink.getvalue()
+
+
+def _encode_parquet(batches, schema) -> Iterator[bytes]:
+    # Each batch becomes a row group; the footer is written on close.
+    sink = io.BytesIO()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield _drain(sink)
+    yield sink.getvalue()
+
+
+def encode(reader: pa.RecordBatchReader, fmt: str) -> Iterator[bytes]:
+    """Encodes the batches of reader incrementally in one of MEDIA_TYPES."""
+    if fmt == "arrow":
+        return _encode_arrow(reader, reader.schema)
+    if fmt == "parquet":
+        return _encode_parquet(reader, reader.schema)
+    if fmt == "csv":
+        return _encode_csv(reader)
+    if fmt == "json":
+        return _encode_json(reader)
+    if fmt == "ndjson":
+        return _encode_ndjson(reader)
+    raise ValueError(f"Unsupported format: {fmt}")
+
+
+def query(path: str, sql: str, fmt: str = "ndjson", batch_rows: int = BATCH_ROWS) -> Iterator[bytes]:
+    """
+    Runs sql against the database at path and returns an iterator of encoded
+    chunks. The statement is executed before this returns, so SQL errors are
+    raised here rather than mid-stream.
+    """
+    if fmt not in MEDIA_TYPES:
+        raise ValueError(f"Unsupported format: {fmt}")
+    path = os.path.abspath(path)
+    key = (path, _version(path), normalize_sql(sql), fmt)
+    cached = _results.get(key)
+    if cached is not None:
+        return iter([cached])
+
+    database, cur = _acquire(path)
+    try:
+        reader = cur.execute(sql).fetch_record_batch(batch_rows)
+    except BaseException:
+        _release(path, database, cur)
+        raise
+
+    def stream():
+        kept, size = [], 0
+        try:
+            for chunk in encode(reader, fmt):
+                if kept is not None:
+                    size += len(chunk)
+                    kept = None if size > RESULT_CACHE_ENTRY_BYTES else kept
+                    if kept is not None:
+                        kept.append(chunk)
+                yield chunk
+            if kept is not None:
+                _results.put(key, b"".join(kept))
+        finally:
+            _release(path, database, cur)
+
+    return stream()
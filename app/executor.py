@@ -0,0 +1,97 @@
+"""
+Bounded worker pools for running blocking handler work off the event loop.
+
+I/O-bound work (subprocesses, network, file and database access) goes to a
+thread pool; CPU-bound work (image, audio, similarity, large sorts) goes to a
+process pool. Each pool caps how many jobs run at once and how many requests
+may wait for a slot; once the queue is full new requests are rejected with
+PoolBusyError instead of piling up behind the event loop.
+"""
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Callable, Optional
+
+
+class PoolBusyError(RuntimeError):
+    pass
+
+
+def error_status(e: BaseException) -> int:
+    """The HTTP status a task failing with e is answered with."""
+    if isinstance(e, PoolBusyError):
+        return 503
+    if isinstance(e, ValueError):
+        return 400
+    return getattr(e, "status_code", 500)
+
+
+class WorkerPool:
+    def __init__(self, name: str, executor_class, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor_class = executor_class
+        self._executor = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._admitted = 0
+
+    @property
+    def admitted(self) -> int:
+        return self._admitted
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        Reserves a place in this pool for one request. Raises PoolBusyError when
+        every worker is busy and the wait queue is already full.
+        """
+        if self._admitted >= self.max_workers + self.max_queue:
+            raise PoolBusyError(f"{self.name} pool is saturated, try again later")
+        self._admitted += 1
+        try:
+            yield self
+        finally:
+            self._admitted -= 1
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Runs fn(*args, **kwargs) on a pool worker once a slot is free."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), partial(fn, *args, **kwargs))
+
+    def shutdown(self, wait: bool = False):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = self._executor_class(max_workers=self.max_workers)
+        return self._executor
+
+
+_cpus = os.cpu_count() or 1
+
+io_pool = WorkerPool(
+    "io",
+    ThreadPoolExecutor,
+    max_workers=int(os.getenv("IO_POOL_WORKERS", min(32, _cpus + 4))),
+    max_queue=int(os.getenv("IO_POOL_QUEUE", 64)),
+)
+cpu_pool = WorkerPool(
+    "cpu",
+    ProcessPoolExecutor,
+    max_workers=int(os.getenv("CPU_POOL_WORKERS", _cpus)),
+    max_queue=int(os.getenv("CPU_POOL_QUEUE", 16)),
+)
+pools = {pool.name: pool for pool in (io_pool, cpu_pool)}
+
+
+def shutdown_pools(wait: bool = False):
+    for pool in pools.values():
+        pool.shutdown(wait)
@@ -0,0 +1,135 @@
+"""
+Shared async HTTP client and cached, streamed downloads (handle_b1).
+
+All outbound requests go through one httpx.AsyncClient, so connections are
+pooled and kept alive across tasks. download() revalidates against the
+previous response with If-None-Match / If-Modified-Since, retries transport
+errors and retryable statuses with exponential backoff, and streams the body
+straight into the destination file (atomically replaced on success), in
+WRITE_BYTES batches written on io_pool so the event loop never blocks on the
+disk. An unchanged resource costs a single 304; a 304 to a request that was
+not conditional is treated as a miss and fetched again with no-cache.
+"""
+import asyncio
+import hashlib
+import os
+from typing import Optional
+
+import httpx
+
+from app.executor import io_pool
+from app.fsutil import async_atomic_write, cache_path, load_json, save_json
+
+TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 30))
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 10))
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", 20))
+RETRIES = int(os.getenv("HTTP_RETRIES", 3))
+BACKOFF = float(os.getenv("HTTP_BACKOFF", 0.5))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+WRITE_BYTES = int(os.getenv("HTTP_WRITE_BYTES", 1024 * 1024))
+USER_AGENT = "dataworks-agent"
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE),
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT},
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class RetryableStatus(Exception):
+    def __init__(self, response: httpx.Response):
+        super().__init__(f"HTTP {response.status_code} from {response.url}")
+        self.retry_after = response.headers.get("retry-after")
+
+
+def _backoff(attempt: int, retry_after: Optional[str] = None) -> float:
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), 60.0)
+    return BACKOFF * (2 ** attempt)
+
+
+def _validators(url: str, dest: str) -> tuple:
+    """(metadata path, stored metadata, conditional request headers)."""
+    meta_path = cache_path(f"http-{hashlib.sha1(url.encode()).hexdigest()}.json")
+    meta = load_json(meta_path, default={})
+    headers = {}
+    try:
+        st = os.stat(dest)
+        # Only revalidate if dest is still exactly what we downloaded.
+        if meta.get("dest") == os.path.abspath(dest) and meta.get("stat") == [st.st_mtime_ns, st.st_size]:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+    except FileNotFoundError:
+        pass
+    return meta_path, meta, headers
+
+
+async def _write_body(response: httpx.Response, dest: str):
+    async with async_atomic_write(dest, "wb") as output_file:
+        batch, size = [], 0
+        async for chunk in response.aiter_bytes():
+            batch.append(chunk)
+            size += len(chunk)
+            if size >= WRITE_BYTES:
+                await output_file.write(b"".join(batch))
+                batch, size = [], 0
+        if batch:
+            await output_file.write(b"".join(batch))
+
+
+async def download(url: str, dest: str, retries: int = RETRIES) -> dict:
+    """
+    Fetches url into dest. Returns {"outcome": "downloaded" | "not_modified",
+    "bytes": size of dest, "status_code": ...}.
+    """
+    meta_path, meta, headers = await io_pool.run(_validators, url, dest)
+
+    attempt = 0
+    while True:
+        try:
+            async with client().stream("GET", url, headers=headers) as response:
+                if response.status_code == 304:
+                    if "If-None-Match" in headers or "If-Modified-Since" in headers:
+                        return {"outcome": "not_modified", "bytes": meta["stat"][1], "status_code": 304}
+                    if "Cache-Control" in headers:
+                        raise ValueError(f"HTTP 304 to an unconditional request for {url}")
+                    # Nothing was stored for the 304 to refer to: a miss, so
+                    # ask again past whatever cache answered.
+                    headers = {"Cache-Control": "no-cache"}
+                    continue
+                if response.status_code in RETRY_STATUSES:
+                    raise RetryableStatus(response)
+                response.raise_for_status()
+                await _write_body(response, dest)
+                st = await io_pool.run(os.stat, dest)
+                await io_pool.run(save_json, meta_path, {
+                    "url": url,
+                    "dest": os.path.abspath(dest),
+                    "etag": response.headers.get("etag"),
+                    "last_modified": response.headers.get("last-modified"),
+                    "stat": [st.st_mtime_ns, st.st_size],
+                })
+                return {"outcome": "downloaded", "bytes": st.st_size, "status_code": response.status_code}
+        except (httpx.TransportError, RetryableStatus) as e:
+            if attempt == retries:
+                raise
+            await asyncio.sleep(_backoff(attempt, getattr(e, "retry_after", None)))
+            attempt += 1
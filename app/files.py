@@ -0,0 +1,147 @@
+"""
+Helpers for serving files from GET /read.
+
+Files are streamed in fixed-size chunks, single HTTP byte ranges are
+supported, validators (ETag / Last-Modified) come straight from os.stat, and
+small hot files are kept in a bounded in-memory cache keyed by their stat so
+a changed file is never served stale.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Tuple
+
+CHUNK_SIZE = int(os.getenv("READ_CHUNK_SIZE", 64 * 1024))
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+class SmallFileCache:
+    """LRU cache of whole small files, bounded by total bytes."""
+
+    def __init__(self, max_bytes: int, max_file_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self._entries: "OrderedDict[str, Tuple[tuple, bytes]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def accepts(self, st: os.stat_result) -> bool:
+        return st.st_size <= self.max_file_bytes
+
+    def get(self, path: str, st: os.stat_result) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != stat_key(st):
+                return None
+            self._entries.move_to_end(path)
+            return entry[1]
+
+    def put(self, path: str, st: os.stat_result, content: bytes):
+        if len(content) > self.max_file_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self._size -= len(old[1])
+            self._entries[path] = (stat_key(st), content)
+            self._size += len(content)
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+def stat_key(st: os.stat_result) -> tuple:
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def etag(st: os.stat_result) -> str:
+    return f'"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+def last_modified(st: os.stat_result) -> str:
+    return formatdate(st.st_mtime, usegmt=True)
+
+
+def not_modified(headers, st: os.stat_result) -> bool:
+    """
+    Evaluates If-None-Match / If-Modified-Since. If-None-Match takes
+    precedence, as required by RFC 9110.
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag(st) in tags
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(st.st_mtime) <= since
+    return False
+
+
+def parse_range(headers, st: os.stat_result) -> Optional[Tuple[int, int]]:
+    """
+    Returns the inclusive (start, end) byte range requested, or None to serve
+    the whole file. Multi-range requests and an If-Range that no longer
+    matches fall back to the whole file.
+    """
+    header = headers.get("range")
+    if not header:
+        return None
+    if_range = headers.get("if-range")
+    if if_range and if_range.strip() not in (etag(st), last_modified(st)):
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    size = st.st_size
+    first, last = match.groups()
+    if first == "" and last == "":
+        return None
+    if first == "":
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable(header)
+        start, end = max(0, size - length), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable(header)
+    return start, end
+
+
+def read_all(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def iter_file(path: str, start: int = 0, end: Optional[int] = None, chunk_size: int = CHUNK_SIZE):
+    """Yields bytes start..end (inclusive) of the file in chunk_size pieces."""
+    with open(path, "rb") as file:
+        file.seek(start)
+        remaining = None if end is None else end - start + 1
+        while remaining is None or remaining > 0:
+            chunk = file.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+small_files = SmallFileCache(
+    max_bytes=int(os.getenv("READ_CACHE_BYTES", 8 * 1024 * 1024)),
+    max_file_bytes=int(os.getenv("READ_CACHE_FILE_BYTES", 256 * 1024)),
+)
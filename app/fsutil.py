@@ -0,0 +1,85 @@
+"""
+Small filesystem helpers shared by the task engines.
+"""
+import json
+import os
+import sys
+import tempfile
+from contextlib import asynccontextmanager, contextmanager
+
+from app.executor import io_pool
+
+# Indexes, manifests and other derived state live here, outside the
+# directories they describe so that writing them never changes those
+# directories' mtimes.
+CACHE_DIR = os.getenv("DATAWORKS_CACHE_DIR", os.path.join("data", ".cache"))
+
+
+def cache_path(name: str) -> str:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, name)
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = "w", encoding: str = "utf-8"):
+    """
+    Opens a temporary file next to path and renames it over path once the
+    block exits cleanly, so readers see either the old file or the new one.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, partial = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, mode, encoding=None if "b" in mode else encoding) as file:
+            yield file
+        os.replace(partial, path)
+    except BaseException:
+        os.remove(partial)
+        raise
+
+
+class AsyncFile:
+    """A file whose writes run on io_pool; see async_atomic_write."""
+
+    def __init__(self, file):
+        self._file = file
+
+    async def write(self, data):
+        await io_pool.run(self._file.write, data)
+
+    async def flush(self):
+        await io_pool.run(self._file.flush)
+
+
+@asynccontextmanager
+async def async_atomic_write(path: str, mode: str = "w", encoding: str = "utf-8"):
+    """
+    atomic_write for coroutines: creating, writing and renaming the file all
+    run on io_pool, so the event loop never waits on the disk.
+    """
+    writer = atomic_write(path, mode, encoding)
+    file = await io_pool.run(writer.__enter__)
+    try:
+        yield AsyncFile(file)
+    except BaseException:
+        # Removes the temporary file; re-raises unless it was suppressed.
+        if not await io_pool.run(writer.__exit__, *sys.exc_info()):
+            raise
+    else:
+        await io_pool.run(writer.__exit__, None, None, None)
+
+
+def load_json(path: str, default=None):
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json(path: str, data):
+    # One dumps() + write is several times faster than json.dump()'s many
+    # small writes for the large manifests kept here.
+    encoded = json.dumps(data, separators=(",", ":"))
+    with atomic_write(path) as file:
+        file.write(encoded)
@@ -0,0 +1,171 @@
+"""
+Lazily loaded task handlers for POST /run.
+
+Each handler lives in its own module (app.handlers.a1 ... b10), which
+imports the heavy libraries it needs (NumPy, DuckDB, Pillow, GitPython,
+lxml, ...) at module level. HANDLERS lists every route with its patterns,
+pool and a "module:function" target; register() adds them to the router as
+LazyHandler proxies, so importing app.main loads none of those modules.
+
+The first call to a handler imports its module on io_pool, off the event
+loop, and the proxy keeps the resolved function from then on. A module may
+also define spec(task) -> memo.TaskSpec, declaring the task's inputs,
+outputs and parameters; the proxy exposes it as spec() for memoization.
+HANDLER_PREWARM ("all" or comma-separated route names) imports handlers in
+the background once the server has started, trading memory for first-request
+latency. Import time and RSS growth of every module loaded this way are
+recorded in load_stats; benchmarks/bench_cold_start.py reports them per
+handler.
+"""
+import asyncio
+import importlib
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from app.executor import io_pool
+
+PREWARM = os.getenv("HANDLER_PREWARM", "")
+
+# (route name, patterns, pool, "module:function"), in registration order.
+HANDLERS = [
+    ("handle_a1", (r"install uv", r"datagen\.py"), "io", "app.handlers.a1:handle_a1"),
+    ("handle_a2", (r"format", r"prettier"), "io", "app.handlers.a2:handle_a2"),
+    ("handle_a3", (r"count.*wednesday",), "cpu", "app.handlers.a3:handle_a3"),
+    ("handle_a4", (r"sort.*contacts",), "cpu", "app.handlers.a4:handle_a4"),
+    ("handle_a5", (r"first.*line.*log",), "io", "app.handlers.a5:handle_a5"),
+    ("handle_a6", (r"index.*markdown",), "io", "app.handlers.a6:handle_a6"),
+    ("handle_a7", (r"extract.*email",), "io", "app.handlers.a7:handle_a7"),
+    ("handle_a8", (r"credit.*card.*number",), "cpu", "app.handlers.a8:handle_a8"),
+    ("handle_a9", (r"similar.*comments",), "cpu", "app.handlers.a9:handle_a9"),
+    ("handle_a10", (r"sales.*gold.*tickets",), "io", "app.handlers.a10:handle_a10"),
+    ("handle_b1", (r"fetch.*data.*api",), "io", "app.handlers.b1:handle_b1"),
+    ("handle_b2", (r"clone.*git",), "io", "app.handlers.b2:handle_b2"),
+    ("handle_b3", (r"run.*sql.*duckdb",), "io", "app.handlers.b3:handle_b3"),
+    ("handle_b5", (r"compress.*image",), "cpu", "app.handlers.b5:handle_b5"),
+    ("handle_b6", (r"scrape.*website",), "io", "app.handlers.b6:handle_b6"),
+    ("handle_b7", (r"transcribe.*audio",), "io", "app.handlers.b7:handle_b7"),
+    ("handle_b9_convert", (r"convert.*markdown.*html",), "io", "app.handlers.b9:handle_b9_convert"),
+    ("handle_b10", (r"filter.*csv.*json",), "io", "app.handlers.b10:handle_b10"),
+]
+
+logger = logging.getLogger(__name__)
+
+load_stats: Dict[str, dict] = {}
+_load_lock = threading.Lock()
+_loaded = set()
+
+
+def _rss() -> int:
+    """Current resident set size in bytes (peak RSS where /proc is missing)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def import_module(name: str):
+    """
+    Imports a module (blocking) and records how long it took and how much
+    RSS it added, if this call is the one that loaded it.
+    """
+    with _load_lock:
+        if name in _loaded:
+            return sys.modules[name]
+        fresh = name not in sys.modules
+        rss, start = _rss(), time.perf_counter()
+        module = importlib.import_module(name)
+        if fresh:
+            load_stats[name] = {"seconds": time.perf_counter() - start, "rss_bytes": _rss() - rss}
+        _loaded.add(name)
+        return module
+
+
+async def load_module(name: str):
+    """import_module on io_pool, so a cold import never blocks the event loop."""
+    if name in _loaded:
+        return sys.modules[name]
+    return await io_pool.run(import_module, name)
+
+
+class LazyHandler:
+    """Proxy for a "module:function" handler that imports it on first call."""
+
+    def __init__(self, target: str):
+        self.target = target
+        self.module, _, self.attribute = target.partition(":")
+        self.__name__ = self.attribute
+        self._handler: Optional[Callable] = None
+        self._spec: Optional[Callable] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._handler is not None
+
+    def load(self) -> Callable:
+        if self._handler is None:
+            module = import_module(self.module)
+            self._spec = getattr(module, "spec", None)
+            self._handler = getattr(module, self.attribute)
+        return self._handler
+
+    async def spec(self, task: str):
+        """The module's spec(task), or None if it declares none."""
+        if self._handler is None:
+            await io_pool.run(self.load)
+        return self._spec(task) if self._spec is not None else None
+
+    async def __call__(self, task: str):
+        handler = self._handler
+        if handler is None:
+            handler = await io_pool.run(self.load)
+        return await handler(task)
+
+    def __repr__(self):
+        return f"LazyHandler({self.target!r})"
+
+
+handlers: Dict[str, LazyHandler] = {name: LazyHandler(target) for name, _, _, target in HANDLERS}
+
+
+def register(router):
+    """Adds every handler in HANDLERS to router, in order."""
+    for name, patterns, pool, _ in HANDLERS:
+        router.add(handlers[name], *patterns, name=name, pool=pool)
+
+
+def prewarm_names(spec: str = PREWARM) -> List[str]:
+    if spec.strip().lower() == "all":
+        return list(handlers)
+    names = [name.strip() for name in spec.split(",") if name.strip()]
+    unknown = [name for name in names if name not in handlers]
+    if unknown:
+        raise ValueError(f"Unknown handler(s) in HANDLER_PREWARM: {', '.join(unknown)}")
+    return names
+
+
+async def prewarm(names: Iterable[str]):
+    """Loads handlers one at a time; a handler that fails to import is logged and skipped."""
+    for name in names:
+        try:
+            await io_pool.run(handlers[name].load)
+        except Exception:
+            logger.exception("Could not prewarm %s", name)
+
+
+_prewarm_task: Optional[asyncio.Task] = None
+
+
+def start_prewarm(spec: str = PREWARM) -> Optional[asyncio.Task]:
+    """Starts prewarming the handlers named by spec in the background."""
+    global _prewarm_task
+    names = prewarm_names(spec)
+    if names and _prewarm_task is None:
+        _prewarm_task = asyncio.ensure_future(prewarm(names))
+    return _prewarm_task
@@ -0,0 +1,29 @@
+"""Task A1: install uv and run datagen.py."""
+import os
+import subprocess
+
+from fastapi import HTTPException
+
+from app.executor import io_pool
+from app.memo import TaskSpec
+from app.metrics import stage
+
+
+def _run_datagen():
+    subprocess.run(["pip", "install", "uv"], check=True)
+    # Into the data/ the other handlers read (datagen.py defaults to /data).
+    subprocess.run(["python", "datagen.py", "baruc@example.com", "--root", os.path.abspath("data")], check=True)
+
+
+def spec(task: str) -> TaskSpec:
+    # datagen.py writes the files the A3-A10 tasks read.
+    return TaskSpec(inputs=("datagen.py",), outputs=("data",), memoize=False)
+
+
+async def handle_a1(task: str):
+    try:
+        with stage("compute"):
+            await io_pool.run(_run_datagen)
+        return {"status": "success", "message": "datagen.py executed successfully"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Task A1 error: {e}")
@@ -0,0 +1,63 @@
+"""Task A10: total ticket sales by type."""
+import re
+from typing import Optional
+
+from fastapi import HTTPException
+
+from app import sqlitedb
+from app.executor import io_pool
+from app.fsutil import atomic_write
+from app.memo import TaskSpec
+from app.metrics import stage
+
+
+def _ticket_sales(ticket_type: str, group_by):
+    total_sales = sqlitedb.aggregate("data/ticket-sales.db", "sales", where={"type": ticket_type})
+    groups = None
+    if group_by:
+        groups = sqlitedb.aggregate("data/ticket-sales.db", "sales", where={"type": ticket_type}, group_by=group_by)
+    return total_sales, groups
+
+
+def _output_path(ticket_type: str) -> str:
+    return f"data/ticket-sales-{ticket_type.lower()}.txt"
+
+
+def _write_total(ticket_type: str, total_sales):
+    with atomic_write(_output_path(ticket_type)) as output_file:
+        output_file.write(str(total_sales))
+
+
+def _options(task: str):
+    """(ticket type, group-by column or None); the type is None if the task names none."""
+    ticket_type = re.search(r"\b(\w+)\s+tickets?\b", task, re.IGNORECASE)
+    group_by = re.search(r"\b(?:per|group(?:ed)? by)\s+(\w+)", task, re.IGNORECASE)
+    return ticket_type and ticket_type.group(1).capitalize(), group_by and group_by.group(1)
+
+
+def spec(task: str) -> Optional[TaskSpec]:
+    ticket_type, group_by = _options(task)
+    if ticket_type is None:
+        return None
+    return TaskSpec(
+        inputs=("data/ticket-sales.db",),
+        outputs=(_output_path(ticket_type),),
+        params={"type": ticket_type, "group_by": group_by},
+    )
+
+
+async def handle_a10(task: str):
+    try:
+        ticket_type, group_by = _options(task)
+        if ticket_type is None:
+            raise ValueError("No ticket type in task")
+        with stage("compute"):
+            total_sales, groups = await io_pool.run(_ticket_sales, ticket_type, group_by)
+        with stage("write"):
+            await io_pool.run(_write_total, ticket_type, total_sales)
+        result = {"status": "success", "message": f"Total sales for {ticket_type} tickets: {total_sales}"}
+        if groups is not None:
+            result["groups"] = groups
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Task A10 error: {e}")
@@ -0,0 +1,21 @@
+"""Task A2: format data/format.md with prettier."""
+import subprocess
+
+from fastapi import HTTPException
+
+from app.executor import io_pool
+from app.memo import TaskSpec
+from app.metrics import stage
+
+
+def spec(task: str) -> TaskSpec:
+    return TaskSpec(inputs=("data/format.md",), outputs=("data/format.md",))
+
+
+async def handle_a2(task: str):
+    try:
+        with stage("compute"):
+            await io_pool.run(subprocess.run, ["prettier", "--write", "data/format.md"], check=True)
+        return {"status": "success", "message": "File formatted successfully"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Task A2 error: {e}")
@@ -0,0 +1,33 @@
+"""Task A3: count the Wednesdays in data/dates.txt."""
+from fastapi import HTTPException
+
+from app import dates
+from app.executor import cpu_pool, io_pool
+from app.fsutil import atomic_write
+from app.memo import TaskSpec
+from app.metrics import stage
+
+
+def _write_count(count: int):
+    with atomic_write("data/dates-wednesdays.txt") as output_file:
+        output_file.write(str(count))
+
+
+def spec(task: str) -> TaskSpec:
+    return TaskSpec(inputs=("data/dates.txt",), outputs=("data/dates-wednesdays.txt",))
+
+
+async def handle_a3(task: str):
+    try:
+        with stage("compute"):
+            stats = await cpu_pool.run(dates.weekday_histogram, "data/dates.txt")
+        with stage("write"):
+            await io_pool.run(_write_count, stats.count("Wednesday"))
+        return {
+            "status": "success",
+            "message": f"{stats.count('Wednesday')} Wednesdays found",
+            "weekdays": stats.as_dict(),
+            "invalid": stats.invalid,
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Task A3 error: {e}")
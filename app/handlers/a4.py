@@ -0,0 +1,37 @@
+"""Task A4: sort data/contacts.json."""
+import re
+
+from fastapi import HTTPException
+
+from app import contacts
+from app.executor import cpu_pool
+from app.memo import TaskSpec
+from app.metrics import stage
+
+
+def _sort_fields(task: str):
+    """Field names after "by", e.g. "by last_name, then first_name"."""
+    match = re.search(r"\bby\s+(.+)$", task, re.IGNORECASE)
+    if not match:
+        return contacts.DEFAULT_FIELDS
+    parts = re.split(r",|\bthen\b|\band\b", match.group(1))
+    fields = [part.strip(" .") for part in parts]
+    fields = [field for field in fields if re.fullmatch(r"\w+", field)]
+    return fields or contacts.DEFAULT_FIELDS
+
+
+def spec(task: str) -> TaskSpec:
+    return TaskSpec(
+        inputs=("data/contacts.json",), outputs=("data/contacts-sorted.json",), params={"fields": _sort_fields(task)}
+    )
+
+
+async def handle_a4(task: str):
+    try:
+        with stage("compute"):
+            result = await cpu_pool.run(
+                contacts.sort_contacts, "data/contacts.json", "data/contacts-sorted.json", _sort_fields(task)
+            )
+        return {"status": "success", "message": "Contacts sorted successfully", **result}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Task A4 error: {e}")
@@ -0,0 +1,52 @@
+"""Task A5: first lines of the most recent log files."""
+import functools
+import os
+import re
+
+from fastapi import HTTPException
+
+from app import logs
+from app.executor import io_pool
+from app.fsutil import atomic_write
+from app.memo import TaskSpec, engine_state
+from app.metrics import stage
+
+
+def _recent_first_lines(k: int, pattern: str, recent=None):
+    # recent is the memo's engine state, the same top-k it fingerprinted.
+    if recent is None:
+        recent = logs.recent("data/logs", k, pattern)
+    return logs.first_lines([os.path.join("data/logs", name) for name, _ in recent])
+
+
+def _write_lines(lines):
+    with atomic_write("data/logs-recent.txt") as output_file:
+        output_file.write("\n".join(lines))
+
+
+def _options(task: str):
+    """(k, glob pattern), e.g. "10 most recent" and "*.log"."""
+    k = re.search(r"\b(\d+)\s+(?:most\s+)?recent", task, re.IGNORECASE)
+    pattern = re.search(r"(?<!\S)(\S*\*\S*)", task)
+    return int(k.group(1)) if k else 10, pattern.group(1).strip("`'\"") if pattern else "*.log"
+
+
+def spec(task: str) -> TaskSpec:
+    k, pattern = _options(task)
+    return TaskSpec(
+        inputs=("data/logs",),
+        outputs=("data/logs-recent.txt",),
+        params={"k": k, "pattern": pattern},
+        states={"data/logs": functools.partial(logs.recent, k=k, pattern=pattern)},
+    )
+
+
+async def handle_a5(task: str):
+    try:
+        with stage("read"):
+            first_lines = await io_pool.run(_recent_first_lines, *_options(task), engine_state("data/logs"))
+        with stage("write"):
+            await io_pool.run(_write_lines, first_lines)
+        return {"status": "success", "message": f"First lines of {len(first_lines)} log files extracted successfully"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Task A5 error: {e}")
@@ -0,0 +1,20 @@
+"""Task A6: index the Markdown files under data/docs."""
+from fastapi import HTTPException
+
+from app import docindex
+from app.executor import io_pool
+from app.memo import TaskSpec
+from app.metrics import stage
+
+
+def spec(task: str) -> TaskSpec:
+    return TaskSpec(inputs=("data/docs",), outputs=("data/docs/index.json",))
+
+
+async def handle_a6(task: str):
+    try:
+        with stage("compute"):
+            result = await io_pool.run(docindex.build_index, "data/docs", "data/docs/index.json")
+        return {"status": "success", "message": "Markdown index created successfully", **result}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Task A6 error: {e}")
@@ -0,0 +1,99 @@
+"""Task A7: extract sender addresses from email headers."""
+import asyncio
+import json
+import os
+import re
+from collections import deque
+from typing import Tuple
+
+from fastapi import HTTPException
+
+from app import fsutil, mailheaders
+from app.executor import cpu_pool, io_pool
+from app.handlers.common import data_path
+from app.memo import TaskSpec
+from app.metrics import stage
+
+
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", 256))
+MAIL_RANGE_BYTES = int(os.getenv("MAIL_RANGE_BYTES", 32 * 1024 * 1024))
+
+
+def _write_sender(address: str):
+    with fsutil.atomic_write("data/email-sender.txt") as output_file:
+        output_file.write(address)
+
+
+def _parse_to_ndjson(parse, *args) -> Tuple[int, str]:
+    """Runs a mailheaders batch parser on a pool worker and returns (count, NDJSON text)."""
+    records = parse(*args)
+    return len(records), "".join(json.dumps(record) + "\n" for record in records)
+
+
+async def _extract_senders(source: str) -> dict:
+    """
+    Parses the batches on cpu_pool and appends each one to the output as it
+    is done, in order, with at most two batches per worker in flight, so
+    memory stays bounded by the batch size rather than the mailbox size.
+    """
+    with stage("read"):
+        if os.path.isdir(source):
+            paths = await io_pool.run(mailheaders.message_paths, source)
+            batches = [(mailheaders.parse_files, paths[i:i + MAIL_BATCH_SIZE]) for i in range(0, len(paths), MAIL_BATCH_SIZE)]
+        else:
+            ranges = await io_pool.run(mailheaders.mbox_ranges, source, 4 * cpu_pool.max_workers, MAIL_RANGE_BYTES)
+            batches = [(mailheaders.parse_mbox_range, source, start, end) for start, end in ranges]
+    messages = 0
+    pending = deque()
+    # Parsing and writing overlap, so they are timed as one stage.
+    with stage("compute"), fsutil.atomic_write("data/email-senders.ndjson") as output_file:
+
+        async def write_next():
+            count, text = await pending.popleft()
+            await io_pool.run(output_file.write, text)
+            return count
+
+        try:
+            for batch in batches:
+                pending.append(asyncio.ensure_future(cpu_pool.run(_parse_to_ndjson, *batch)))
+                if len(pending) >= 2 * cpu_pool.max_workers:
+                    messages += await write_next()
+            while pending:
+                messages += await write_next()
+        finally:
+            for future in pending:
+                future.cancel()
+    return {"messages": messages}
+
+
+def _source(task: str):
+    source = re.search(r"\bdata/[\w./-]*\w", task)
+    return data_path(source.group(0)) if source else None
+
+
+def _bulk(source) -> bool:
+    return bool(source) and (os.path.isdir(source) or source.endswith(".mbox"))
+
+
+def spec(task: str) -> TaskSpec:
+    source = _source(task)
+    if _bulk(source):
+        return TaskSpec(inputs=(source,), outputs=("data/email-senders.ndjson",))
+    return TaskSpec(inputs=(source or "data/email.txt",), outputs=("data/email-sender.txt",))
+
+
+async def handle_a7(task: str):
+    try:
+        source = _source(task)
+        if _bulk(source):
+            result = await _extract_senders(source)
+            return {"status": "success", "message": "Sender emails extracted successfully", **result}
+        with stage("compute"):
+            headers = await io_pool.run(mailheaders.parse_file, source or "data/email.txt")
+        if not headers["from"]:
+            raise ValueError("No email address found")
+        with stage("write"):
+            await io_pool.run(_write_sender, headers["from"]["email"])
+        return {"status": "success", "message": "Sender email extracted successfully", "headers": headers}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Task A7 error: {e}")
@@ -0,0 +1,58 @@
+"""Task A8: read credit card numbers from images."""
+import asyncio
+import os
+import re
+
+from fastapi import HTTPException
+
+from app import cardocr, fsutil
+from app.executor import cpu_pool, io_pool
+from app.handlers.common import data_path
+from app.memo import TaskSpec
+from app.metrics import stage
+
+
+CARD_BATCH_SIZE = int(os.getenv("CARD_BATCH_SIZE", 64))
+
+
+def _card_image() -> str:
+    # datagen.py writes credit_card.png; older data uses credit-card.png.
+    for path in ("data/credit-card.png", "data/credit_card.png"):
+        if os.path.exists(path):
+            return path
+    return "data/credit-card.png"
+
+
+async def _read_card_directory(directory: str) -> dict:
+    with stage("read"):
+        paths = await io_pool.run(cardocr.image_paths, directory)
+    batches = [paths[i:i + CARD_BATCH_SIZE] for i in range(0, len(paths), CARD_BATCH_SIZE)]
+    with stage("compute"):
+        results = [result for batch in await asyncio.gather(*(cpu_pool.run(cardocr.read_batch, batch) for batch in batches)) for result in batch]
+    with stage("write"):
+        await io_pool.run(fsutil.save_json, "data/credit-cards.json", results)
+    return {"images": len(results), "luhn_valid": sum(result["luhn_valid"] for result in results)}
+
+
+def _target(task: str) -> str:
+    target = re.search(r"\bdata/[\w./-]*\w", task)
+    return data_path(target.group(0)) if target else _card_image()
+
+
+def spec(task: str) -> TaskSpec:
+    path = _target(task)
+    return TaskSpec(inputs=(path,), outputs=("data/credit-cards.json" if os.path.isdir(path) else "data/credit-card.txt",))
+
+
+async def handle_a8(task: str):
+    try:
+        path = _target(task)
+        if os.path.isdir(path):
+            result = await _read_card_directory(path)
+        else:
+            with stage("compute"):
+                result = await cpu_pool.run(cardocr.extract_to_file, path, "data/credit-card.txt")
+            result = {key: result[key] for key in ("luhn_valid", "repaired")}
+        return {"status": "success", "message": "Credit card number extracted successfully", **result}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Task A8 error: {e}")
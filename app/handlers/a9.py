@@ -0,0 +1,39 @@
+"""Task A9: find the most similar comments."""
+import re
+
+from fastapi import HTTPException
+
+from app import similarity
+from app.executor import cpu_pool, io_pool
+from app.fsutil import atomic_write
+from app.memo import TaskSpec
+from app.metrics import stage
+
+
+def _write_pairs(pairs):
+    with atomic_write("data/comments-similar.txt") as output_file:
+        output_file.write("\n\n".join(f"{pair.first_text}\n{pair.second_text}" for pair in pairs))
+
+
+def _pair_count(task: str) -> int:
+    k = re.search(r"\btop\s+(\d+)|\b(\d+)\s+(?:most\s+)?similar", task, re.IGNORECASE)
+    return int(next(filter(None, k.groups()))) if k else 1
+
+
+def spec(task: str) -> TaskSpec:
+    return TaskSpec(inputs=("data/comments.txt",), outputs=("data/comments-similar.txt",), params={"k": _pair_count(task)})
+
+
+async def handle_a9(task: str):
+    try:
+        with stage("compute"):
+            pairs = await cpu_pool.run(similarity.most_similar, "data/comments.txt", _pair_count(task))
+        with stage("write"):
+            await io_pool.run(_write_pairs, pairs)
+        return {
+            "status": "success",
+            "message": "Most similar comments found and written to file",
+            "pairs": [pair.as_dict() for pair in pairs],
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Task A9 error: {e}")
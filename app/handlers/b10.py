@@ -0,0 +1,41 @@
+"""Task B10: filter a CSV file."""
+import re
+
+from fastapi import HTTPException
+
+from app import csvfilter
+from app.executor import io_pool
+from app.handlers.common import data_path
+from app.memo import TaskSpec
+from app.metrics import stage
+
+
+def _task_filter(task: str) -> str:
+    """Filter in a code span, else the text after "where", else name == "Alice"."""
+    quoted = re.search(r"`([^`]+)`", task)
+    if quoted:
+        return quoted.group(1)
+    where = re.search(r"\bwhere\s+(.+?)(?:\s+(?:and\s+)?(?:return|save|write|output)\b.*)?[.\s]*$", task, re.IGNORECASE | re.DOTALL)
+    return where.group(1) if where else 'name == "Alice"'
+
+
+def _options(task: str):
+    """(CSV file, output format)."""
+    csv_path = re.search(r"\bdata/[\w./-]+\.csv\b", task)
+    fmt = re.search(r"\b(ndjson|parquet|csv)\s*(?:output|format|file)?\s*$", task, re.IGNORECASE)
+    return data_path(csv_path.group(0) if csv_path else "data/query-result.csv"), fmt.group(1).lower() if fmt else "json"
+
+
+def spec(task: str) -> TaskSpec:
+    csv_path, fmt = _options(task)
+    return TaskSpec(inputs=(csv_path,), outputs=(f"data/filtered_data.{fmt}",), params={"filter": _task_filter(task), "format": fmt})
+
+
+async def handle_b10(task: str):
+    try:
+        csv_path, fmt = _options(task)
+        with stage("compute"):
+            written = await io_pool.run(csvfilter.filter_to_file, csv_path, f"data/filtered_data.{fmt}", _task_filter(task), None, fmt)
+        return {"status": "success", "message": f"Filtered data saved to {fmt.upper()}", "bytes": written}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Task B10 error: {e}")
@@ -0,0 +1,42 @@
+"""Task B2: clone a Git repository and commit a change."""
+import os
+from datetime import datetime
+
+import git
+from fastapi import HTTPException
+
+from app.executor import io_pool
+from app.memo import TaskSpec
+from app.metrics import stage
+
+
+B2_REPO_URL = os.getenv("B2_REPO_URL", "https://github.com/Baruch-George/dataworks-agent.git")
+
+
+def _clone_and_commit():
+    repo_url = B2_REPO_URL
+    repo_path = "data/dataworks-agent"
+    if not os.path.exists(repo_path):
+        git.Repo.clone_from(repo_url, repo_path)
+    repo = git.Repo(repo_path)
+    with open(os.path.join(repo_path, "README.md"), "a") as readme_file:
+        readme_file.write(f"\n## Automated Update at {datetime.now()}")
+    # IndexFile.add() chdirs the whole process into the repository while it
+    # runs, which breaks every concurrent task that resolves data/ paths.
+    repo.git.add("README.md")
+    repo.index.commit("Automated commit by DataWorks Agent")
+    origin = repo.remote(name="origin")
+    origin.push()
+
+
+def spec(task: str) -> TaskSpec:
+    return TaskSpec(outputs=("data/dataworks-agent",), memoize=False)
+
+
+async def handle_b2(task: str):
+    try:
+        with stage("compute"):
+            await io_pool.run(_clone_and_commit)
+        return {"status": "success", "message": "Repository cloned and changes committed"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Task B2 error: {e}")
@@ -0,0 +1,49 @@
+"""Task B3: run a SQL query on DuckDB."""
+import re
+
+from fastapi import HTTPException
+
+from app import duckquery
+from app.executor import io_pool
+from app.fsutil import atomic_write
+from app.handlers.common import data_path
+from app.memo import TaskSpec
+from app.metrics import stage
+
+
+def _task_sql(task: str) -> str:
+    """SQL in a code span or fence, else everything from the first SELECT/WITH."""
+    fenced = re.search(r"```(?:sql)?\s*(.+?)```|`([^`]+)`", task, re.IGNORECASE | re.DOTALL)
+    if fenced:
+        return next(filter(None, fenced.groups())).strip()
+    inline = re.search(r"\b(?:SELECT|WITH)\b.*", task, re.IGNORECASE | re.DOTALL)
+    if inline:
+        return inline.group(0).strip()
+    return "SELECT table_name FROM information_schema.tables"
+
+
+def _run_duckdb_query(db: str, sql: str):
+    rows = 0
+    with atomic_write("data/duckdb-result.ndjson", "wb") as output_file:
+        for chunk in duckquery.query(db, sql, "ndjson"):
+            output_file.write(chunk)
+            rows += chunk.count(b"\n")
+    return rows
+
+
+def _database(task: str) -> str:
+    db = re.search(r"[\w./-]+\.duckdb\b", task)
+    return data_path(db.group(0) if db else "data/sample.duckdb")
+
+
+def spec(task: str) -> TaskSpec:
+    return TaskSpec(inputs=(_database(task),), outputs=("data/duckdb-result.ndjson",), params={"sql": _task_sql(task)})
+
+
+async def handle_b3(task: str):
+    try:
+        with stage("compute"):
+            rows = await io_pool.run(_run_duckdb_query, _database(task), _task_sql(task))
+        return {"status": "success", "message": f"SQL query executed successfully, {rows} rows written"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Task B3 error: {e}")
@@ -0,0 +1,73 @@
+"""Task B5: compress or resize images."""
+import asyncio
+import os
+import re
+
+from fastapi import HTTPException
+
+from app import images
+from app.executor import cpu_pool, io_pool
+from app.handlers.common import data_path
+from app.memo import TaskSpec
+from app.metrics import stage
+
+
+def _image_settings(task: str) -> dict:
+    """Max dimension ("1024px"), target size ("200 KB") and quality from the task."""
+    settings = {"max_dimension": None, "target_bytes": None, "quality": images.DEFAULT_QUALITY}
+    dimension = re.search(r"(\d+)\s*(?:px|pixels)\b", task, re.IGNORECASE)
+    if dimension:
+        settings["max_dimension"] = int(dimension.group(1))
+    target = re.search(r"(\d+(?:\.\d+)?)\s*(kb|kib|mb|mib)\b", task, re.IGNORECASE)
+    if target:
+        scale = 1024 if target.group(2).lower().startswith("k") else 1024 * 1024
+        settings["target_bytes"] = int(float(target.group(1)) * scale)
+    quality = re.search(r"quality\s*(?:of\s*)?(\d+)", task, re.IGNORECASE)
+    if quality:
+        settings["quality"] = max(1, min(images.MAX_QUALITY, int(quality.group(1))))
+    return settings
+
+
+async def _compress_directory(src_dir: str, dst_dir: str, settings: dict) -> dict:
+    with stage("read"):
+        todo, skipped = await io_pool.run(images.plan_directory, src_dir, dst_dir, settings)
+    with stage("compute"):
+        results = await asyncio.gather(*(cpu_pool.run(images.optimize_image, src, dst, **settings) for _, src, dst, _ in todo))
+    done = [(key, content_hash, result) for (key, _, _, content_hash), result in zip(todo, results)]
+    with stage("write"):
+        await io_pool.run(images.record_results, src_dir, dst_dir, settings, done)
+    return {
+        "processed": len(results),
+        "skipped": skipped,
+        "bytes_saved": sum(result["bytes_saved"] for result in results),
+        "images": results,
+    }
+
+
+def _paths(task: str):
+    """(source image or directory, where its compressed copy goes)."""
+    target = re.search(r"\bdata/[\w./-]*\w", task)
+    src = data_path(target.group(0)) if target else data_path("data/sample-image.jpg")
+    if os.path.isdir(src):
+        return src, src.rstrip(os.sep) + "-compressed"
+    stem, ext = os.path.splitext(src)
+    return src, f"{stem}-compressed{ext}"
+
+
+def spec(task: str) -> TaskSpec:
+    src, dst = _paths(task)
+    return TaskSpec(inputs=(src,), outputs=(dst,), params=_image_settings(task))
+
+
+async def handle_b5(task: str):
+    try:
+        settings = _image_settings(task)
+        src, dst = _paths(task)
+        if os.path.isdir(src):
+            result = await _compress_directory(src, dst, settings)
+        else:
+            with stage("compute"):
+                result = await cpu_pool.run(images.optimize_image, src, dst, **settings)
+        return {"status": "success", "message": "Image compressed successfully", **result}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Task B5 error: {e}")
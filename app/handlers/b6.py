@@ -0,0 +1,26 @@
+"""Task B6: crawl websites."""
+import os
+import re
+
+from fastapi import HTTPException
+
+from app import crawl
+from app.memo import TaskSpec
+from app.metrics import stage
+
+
+B6_SEED_URLS = os.getenv("B6_SEED_URLS", "https://en.wikipedia.org/wiki/Straive").split()
+
+
+def spec(task: str) -> TaskSpec:
+    return TaskSpec(outputs=("data/scraped_data.ndjson",), memoize=False)
+
+
+async def handle_b6(task: str):
+    try:
+        urls = [url.rstrip(".,;)") for url in re.findall(r"https?://[^\s'\"`<>]+", task)]
+        with stage("read"):
+            result = await crawl.crawl(urls or B6_SEED_URLS, "data/scraped_data.ndjson")
+        return {"status": "success", "message": "Website scraped successfully", **result}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Task B6 error: {e}")
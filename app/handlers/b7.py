@@ -0,0 +1,32 @@
+"""Task B7: transcribe audio."""
+import re
+
+from fastapi import HTTPException
+
+from app import transcribe
+from app.executor import io_pool
+from app.handlers.common import data_path
+from app.memo import TaskSpec
+from app.metrics import stage
+
+
+def _options(task: str):
+    """(audio file, recognizer backend)."""
+    audio = re.search(r"\bdata/[\w./-]+\.(?:mp3|wav|flac|ogg|m4a)\b", task, re.IGNORECASE)
+    backend = re.search(r"\b(" + "|".join(transcribe.BACKENDS) + r")\b", task, re.IGNORECASE)
+    return data_path(audio.group(0) if audio else "data/sample-audio.mp3"), backend.group(1).lower() if backend else transcribe.BACKEND
+
+
+def spec(task: str) -> TaskSpec:
+    audio, backend = _options(task)
+    return TaskSpec(inputs=(audio,), outputs=("data/transcription.txt",), params={"backend": backend})
+
+
+async def handle_b7(task: str):
+    try:
+        audio, backend = _options(task)
+        with stage("compute"):
+            result = await io_pool.run(transcribe.transcribe_file, audio, "data/transcription.txt", backend)
+        return {"status": "success", "message": "Audio transcribed successfully", **result}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Task B7 error: {e}")
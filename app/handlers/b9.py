@@ -0,0 +1,50 @@
+"""Task B9: convert Markdown to HTML."""
+import asyncio
+import re
+
+from fastapi import HTTPException
+
+from app import sitebuild
+from app.executor import cpu_pool, io_pool
+from app.memo import TaskSpec
+from app.metrics import stage
+
+
+def _convert_readme():
+    sitebuild.convert_file("data/README.md", "data/README.html")
+
+
+async def _build_site(src_root: str, dst_root: str) -> dict:
+    with stage("read"):
+        todo, skipped, removed = await io_pool.run(sitebuild.plan_build, src_root, dst_root)
+    with stage("compute"):
+        if len(todo) >= sitebuild.PARALLEL_MIN_FILES:
+            await asyncio.gather(*(cpu_pool.run(sitebuild.convert_batch, batch) for batch in sitebuild.batches(todo)))
+        elif todo:
+            await io_pool.run(sitebuild.convert_batch, [(src, dst) for _, src, dst in todo])
+    with stage("write"):
+        await io_pool.run(sitebuild.record_build, src_root, dst_root, todo)
+    return {"converted": len(todo), "skipped": skipped, "removed": removed}
+
+
+def _docs(task: str) -> bool:
+    return bool(re.search(r"\bdocs\b", task, re.IGNORECASE))
+
+
+def spec(task: str) -> TaskSpec:
+    if _docs(task):
+        return TaskSpec(inputs=("data/docs",), outputs=("data/site",))
+    return TaskSpec(inputs=("data/README.md",), outputs=("data/README.html",))
+
+
+async def handle_b9_convert(task: str):
+    try:
+        if _docs(task):
+            result = await _build_site("data/docs", "data/site")
+        else:
+            result = {}
+            with stage("compute"):
+                await io_pool.run(_convert_readme)
+        return {"status": "success", "message": "Markdown converted to HTML successfully", **result}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Task B9 error: {e}")
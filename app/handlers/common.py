@@ -0,0 +1,13 @@
+"""Helpers shared by the HTTP endpoints and the task handlers."""
+import os
+
+from fastapi import HTTPException
+
+
+def data_path(path: str) -> str:
+    """Absolute path for path, which must lie inside data/ (403 otherwise)."""
+    base_dir = os.path.abspath("data")
+    abs_path = os.path.abspath(path)
+    if os.path.commonpath([base_dir, abs_path]) != base_dir:
+        raise HTTPException(status_code=403, detail="Access to this file is not allowed")
+    return abs_path
@@ -0,0 +1,178 @@
+"""
+Image optimization for single files and whole directories (handle_b5).
+
+optimize_image() avoids full-resolution decodes it does not need: when the
+output is downscaled, JPEGs are opened with draft() so libjpeg decodes
+directly at 1/2, 1/4 or 1/8 scale, and thumbnail() finishes with reduce()
+before resampling. With a target byte size the encoder quality is found by
+binary search over in-memory encodes, so the file is written exactly once.
+
+plan_directory() decides which images need work. A manifest in data/.cache
+keyed by relative path remembers each source's stat, content hash and the
+settings used. An image is skipped when its output is still the one we
+wrote for the same content and settings. Only images whose stat changed are
+re-hashed.
+"""
+import hashlib
+import io
+import os
+import time
+from typing import List, Optional, Tuple
+
+from PIL import Image
+
+from app.fsutil import atomic_write, cache_path, load_json, save_json
+
+DEFAULT_QUALITY = int(os.getenv("IMAGE_QUALITY", 20))
+MIN_QUALITY = int(os.getenv("IMAGE_MIN_QUALITY", 10))
+MAX_QUALITY = 95
+EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+QUALITY_FORMATS = {"JPEG", "WEBP"}
+HASH_CHUNK = 1024 * 1024
+
+
+def _encode(image: Image.Image, fmt: str, quality: int) -> bytes:
+    sink = io.BytesIO()
+    if fmt in QUALITY_FORMATS:
+        image.save(sink, fmt, quality=quality, optimize=True)
+    else:
+        image.save(sink, fmt, optimize=True)
+    return sink.getvalue()
+
+
+def _encode_to_size(image: Image.Image, fmt: str, target_bytes: int) -> Tuple[bytes, int]:
+    """Highest quality whose encoding fits target_bytes (MIN_QUALITY if none does)."""
+    low, high = MIN_QUALITY, MAX_QUALITY
+    best = None
+    while low <= high:
+        quality = (low + high) // 2
+        data = _encode(image, fmt, quality)
+        if len(data) <= target_bytes:
+            best = (data, quality)
+            low = quality + 1
+        else:
+            high = quality - 1
+    return best or (_encode(image, fmt, MIN_QUALITY), MIN_QUALITY)
+
+
+def optimize_image(
+    src: str,
+    dst: str,
+    max_dimension: Optional[int] = None,
+    target_bytes: Optional[int] = None,
+    quality: int = DEFAULT_QUALITY,
+) -> dict:
+    """
+    Re-encodes src into dst, downscaling so neither side exceeds
+    max_dimension and, for JPEG/WebP, picking the quality that fits
+    target_bytes. Returns sizes, chosen quality and elapsed milliseconds.
+    """
+    start = time.perf_counter()
+    bytes_in = os.path.getsize(src)
+    with Image.open(src) as image:
+        fmt = image.format
+        resized = bool(max_dimension and max(image.size) > max_dimension)
+        if resized:
+            if fmt == "JPEG":
+                image.draft("RGB", (max_dimension, max_dimension))
+            image.thumbnail((max_dimension, max_dimension), Image.LANCZOS, reducing_gap=2.0)
+        else:
+            image.load()
+        if fmt == "JPEG" and image.mode not in ("RGB", "L", "CMYK"):
+            image = image.convert("RGB")
+        if target_bytes and fmt in QUALITY_FORMATS:
+            data, quality = _encode_to_size(image, fmt, target_bytes)
+        else:
+            data = _encode(image, fmt, quality)
+        size = image.size
+    if not resized and len(data) >= bytes_in:
+        # Re-encoding did not help; keep the original bytes.
+        with open(src, "rb") as file:
+            data = file.read()
+        quality = None
+
+    with atomic_write(dst, "wb") as output_file:
+        output_file.write(data)
+    return {
+        "src": src,
+        "dst": dst,
+        "width": size[0],
+        "height": size[1],
+        "quality": quality if fmt in QUALITY_FORMATS else None,
+        "bytes_in": bytes_in,
+        "bytes_out": len(data),
+        "bytes_saved": bytes_in - len(data),
+        "ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _manifest_path(src_dir: str, dst_dir: str) -> str:
+    key = f"{os.path.abspath(src_dir)}\0{os.path.abspath(dst_dir)}"
+    return cache_path(f"images-manifest-{hashlib.sha1(key.encode()).hexdigest()[:16]}.json")
+
+
+def _stat(path: str) -> Optional[list]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def plan_directory(src_dir: str, dst_dir: str, settings: dict) -> Tuple[List[Tuple[str, str, str, str]], int]:
+    """
+    Returns ([(key, src, dst, content hash), ...] for images that need
+    encoding, number of images skipped).
+    """
+    path = _manifest_path(src_dir, dst_dir)
+    manifest = load_json(path, default={})
+    todo, skipped, touched = [], 0, False
+    for root, _, names in os.walk(src_dir):
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() not in EXTENSIONS:
+                continue
+            src = os.path.join(root, name)
+            key = os.path.relpath(src, src_dir).replace(os.sep, "/")
+            dst = os.path.join(dst_dir, key)
+            entry = manifest.get(key)
+            stat = _stat(src)
+            current = entry is not None and entry["settings"] == settings and entry["output"] == _stat(dst)
+            if current and entry["stat"] == stat:
+                skipped += 1
+                continue
+            content_hash = file_hash(src)
+            if current and entry["hash"] == content_hash:
+                # Touched but not changed: remember the new stat, keep the output.
+                entry["stat"] = stat
+                skipped += 1
+                touched = True
+                continue
+            todo.append((key, src, dst, content_hash))
+    if touched:
+        save_json(path, manifest)
+    return todo, skipped
+
+
+def record_results(src_dir: str, dst_dir: str, settings: dict, done: List[Tuple[str, str, dict]]):
+    """Adds (key, content hash, result) for freshly encoded images to the manifest."""
+    path = _manifest_path(src_dir, dst_dir)
+    manifest = load_json(path, default={})
+    for key, content_hash, result in done:
+        manifest[key] = {
+            "stat": _stat(result["src"]),
+            "hash": content_hash,
+            "settings": settings,
+            "output": _stat(result["dst"]),
+        }
+    for key in list(manifest):
+        if not os.path.exists(os.path.join(src_dir, key)):
+            del manifest[key]
+    save_json(path, manifest)
@@ -0,0 +1,121 @@
+"""
+Background jobs and single-flight deduplication for POST /run.
+
+SingleFlight merges identical in-flight tasks so the work runs once and every
+caller awaits the same result. JobStore runs tasks in the background for
+`/run?async=1` and keeps a bounded history of finished jobs for GET /jobs/{id}.
+"""
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]):
+        """
+        Awaits factory() unless an identical call is already running, in which
+        case its result (or exception) is shared. The shared work is shielded,
+        so a caller that disconnects does not cancel it for everyone else.
+        """
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._forget(key, f))
+        return await asyncio.shield(future)
+
+    def _forget(self, key, future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+
+
+@dataclass
+class Job:
+    id: str
+    key: str
+    task: str
+    status: str = "queued"
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[dict] = None
+
+    def as_dict(self):
+        duration = None
+        if self.started_at is not None:
+            duration = (self.finished_at or time.time()) - self.started_at
+        return {
+            "job_id": self.id,
+            "task": self.task,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration": duration,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobStore:
+    def __init__(self, max_history: int = 1000):
+        self.max_history = max_history
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active: Dict[str, Job] = {}
+        # The event loop only keeps weak references to tasks; hold running
+        # jobs here so they cannot be garbage-collected mid-run.
+        self._tasks = set()
+
+    def submit(self, key: str, task: str, factory: Callable[[], Awaitable[Any]]) -> Job:
+        """
+        Starts factory() in the background and returns its job. Submitting a
+        task whose key is already queued or running returns the existing job.
+        """
+        job = self._active.get(key)
+        if job is not None:
+            return job
+        job = Job(id=uuid.uuid4().hex, key=key, task=task)
+        self._jobs[job.id] = job
+        self._active[key] = job
+        running = asyncio.ensure_future(self._run(job, factory))
+        self._tasks.add(running)
+        running.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def _run(self, job: Job, factory):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = await factory()
+            job.status = "succeeded"
+        except Exception as e:
+            job.status = "failed"
+            job.error = {
+                "status_code": getattr(e, "status_code", 500),
+                "detail": getattr(e, "detail", str(e)),
+            }
+        finally:
+            job.finished_at = time.time()
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+            self._evict()
+
+    def _evict(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None]
+        for job_id in finished[: max(0, len(finished) - self.max_history)]:
+            del self._jobs[job_id]
+
+
+flights = SingleFlight()
+jobs = JobStore(max_history=int(os.getenv("JOB_HISTORY", 1000)))
@@ -0,0 +1,53 @@
+"""
+Top-k most recently modified files of a large directory (handle_a5).
+
+The directory is listed with one os.scandir pass, stat'ing each entry, and
+the k newest files matching the glob are picked with a heap instead of
+sorting every entry. There is no persisted mtime index: a log appended to
+in place changes its mtime but not the directory's, so an index would need
+a stat per file on every call anyway, and the scan is exactly that.
+
+recent() is also the task memo's input state for A5, computed once per
+request and handed to the handler, which then only reads the first lines.
+First lines are read concurrently with a bounded readline.
+"""
+import fnmatch
+import heapq
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Tuple
+
+FIRST_LINE_BYTES = int(os.getenv("LOG_FIRST_LINE_BYTES", 4096))
+READ_WORKERS = 16
+
+
+def _scan(directory: str, pattern: str) -> Iterator[Tuple[str, int]]:
+    match = re.compile(fnmatch.translate(pattern)).match
+    with os.scandir(directory) as it:
+        for entry in it:
+            if not match(entry.name):
+                continue
+            try:
+                if entry.is_file():
+                    yield entry.name, entry.stat().st_mtime_ns
+            except FileNotFoundError:
+                continue
+
+
+def recent(directory: str, k: int = 10, pattern: str = "*.log") -> List[list]:
+    """[name, mtime_ns] of the k most recently modified files matching pattern, newest first."""
+    return [[name, mtime] for name, mtime in heapq.nlargest(k, _scan(directory, pattern), key=lambda item: (item[1], item[0]))]
+
+
+def read_first_line(path: str, limit: int = FIRST_LINE_BYTES) -> str:
+    with open(path, "rb") as file:
+        return file.readline(limit).decode("utf-8", errors="replace").strip()
+
+
+def first_lines(paths: List[str], limit: int = FIRST_LINE_BYTES) -> List[str]:
+    """Reads the first line of every file concurrently, preserving order."""
+    if not paths:
+        return []
+    with ThreadPoolExecutor(max_workers=min(READ_WORKERS, len(paths))) as executor:
+        return list(executor.map(lambda path: read_first_line(path, limit), paths))
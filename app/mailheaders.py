@@ -0,0 +1,187 @@
+"""
+Header-only email parsing (handle_a7).
+
+Only the header block of a message is read: files are read line by line up to
+the first blank line. mbox files are memory-mapped and scanned with find()
+for message separators and header ends, so bodies are skipped over at memchr
+speed but never copied or parsed. Header blocks go through email's
+BytesHeaderParser and the date through parsedate_to_datetime. Address lists
+of the usual shapes (`"Name" <addr>`, `Name <addr>`, `addr`) are split with
+one regex; anything else (comments, groups, odd quoting) goes through
+getaddresses.
+
+For bulk work an mbox is cut into byte ranges aligned to "From " separator
+lines, and a directory into batches of paths, so both can be spread over a
+process pool. Ranges are kept small enough that the records of one fit
+comfortably in memory, so callers can stream results range by range.
+"""
+import mmap
+import os
+import re
+from email.header import decode_header, make_header
+from email.parser import BytesHeaderParser
+from email.policy import compat32
+from email.utils import getaddresses, parsedate_to_datetime
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+MAX_HEADER_BYTES = int(os.getenv("MAIL_MAX_HEADER_BYTES", 256 * 1024))
+
+_parser = BytesHeaderParser(policy=compat32)
+
+# getaddresses() tokenizes in pure Python and dominates bulk runs; the common
+# shapes of address lists are matched with this instead.
+_ADDR_SPEC = r"[^<>\s()\",;:\\@\[\]]+@[^<>\s()\",;:\\@\[\]]+"
+_ADDRESS = re.compile(
+    rf"""\s*(?:"((?:[^"\\\r\n]|\\.)*)"\s*<({_ADDR_SPEC})>|([^",<>()@;:\\\[\]]*?)\s*<({_ADDR_SPEC})>|({_ADDR_SPEC}))\s*"""
+)
+
+
+def read_header_block(file: BinaryIO, limit: int = MAX_HEADER_BYTES) -> bytes:
+    """Reads lines from file up to (not including) the first blank line."""
+    lines, size = [], 0
+    for line in file:
+        if line in (b"\n", b"\r\n"):
+            break
+        lines.append(line)
+        size += len(line)
+        if size > limit:
+            raise ValueError(f"Header block larger than {limit} bytes")
+    return b"".join(lines)
+
+
+def _decode(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    if "=?" in value:
+        value = str(make_header(decode_header(value)))
+    return " ".join(value.split())
+
+
+def _simple_addresses(value: str) -> Optional[List[Tuple[str, str]]]:
+    """
+    (name, address) pairs for lists of plain `"Name" <addr>`, `Name <addr>`
+    and `addr` entries, or None if anything else (comments, groups, ...) is
+    present and the full getaddresses() parser is needed.
+    """
+    pairs, position = [], 0
+    while True:
+        match = _ADDRESS.match(value, position)
+        if match is None:
+            return None
+        quoted, quoted_address, plain, plain_address, bare_address = match.groups()
+        if quoted is not None:
+            pairs.append((re.sub(r"\\(.)", r"\1", quoted), quoted_address))
+        else:
+            pairs.append(((plain or "").strip(), plain_address or bare_address))
+        position = match.end()
+        if position == len(value):
+            return pairs
+        if value[position] != ",":
+            return None
+        position += 1
+
+
+def _addresses(values: List[str]) -> List[Dict[str, str]]:
+    pairs = []
+    for value in values:
+        simple = _simple_addresses(value)
+        pairs.extend(simple if simple is not None else getaddresses([value]))
+    return [{"name": _decode(name) or "", "email": address} for name, address in pairs if address]
+
+
+def parse_header_block(block: bytes) -> dict:
+    """Returns structured From/To/Cc/Date/Subject/Message-ID fields."""
+    message = _parser.parsebytes(block)
+    date = message.get("Date")
+    try:
+        parsed_date = parsedate_to_datetime(date).isoformat() if date else None
+    except (TypeError, ValueError, IndexError):
+        parsed_date = None
+    senders = _addresses(message.get_all("From", []))
+    return {
+        "from": senders[0] if senders else None,
+        "to": _addresses(message.get_all("To", [])),
+        "cc": _addresses(message.get_all("Cc", [])),
+        "date": parsed_date,
+        "subject": _decode(message.get("Subject")),
+        "message_id": message.get("Message-ID", "").strip() or None,
+    }
+
+
+def parse_file(path: str) -> dict:
+    with open(path, "rb") as file:
+        return parse_header_block(read_header_block(file))
+
+
+def parse_files(paths: List[str]) -> List[dict]:
+    """Parses the headers of each file (one pool task per batch of paths)."""
+    results = []
+    for path in paths:
+        try:
+            results.append({"source": path, **parse_file(path)})
+        except (OSError, ValueError) as e:
+            results.append({"source": path, "error": str(e)})
+    return results
+
+
+def _header_end(mm: mmap.mmap, start: int, end: int) -> int:
+    """End of the header block (keeping the last header's line ending)."""
+    candidates = []
+    lf = mm.find(b"\n\n", start, end)
+    if lf >= 0:
+        candidates.append(lf + 1)
+    crlf = mm.find(b"\r\n\r\n", start, end)
+    if crlf >= 0:
+        candidates.append(crlf + 2)
+    return min(candidates) if candidates else end
+
+
+def mbox_ranges(path: str, parts: int, max_bytes: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Splits the mbox at path into up to `parts` ranges starting at separators,
+    or more if that is needed to keep ranges near max_bytes.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    if max_bytes:
+        parts = max(parts, -(-size // max_bytes))
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        starts = [0]
+        for i in range(1, parts):
+            position = mm.find(b"\nFrom ", max(starts[-1], size * i // parts))
+            if position < 0:
+                break
+            if position + 1 > starts[-1]:
+                starts.append(position + 1)
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def parse_mbox_range(path: str, start: int, end: int) -> List[dict]:
+    """Parses the headers of every message whose "From " line starts in [start, end)."""
+    results = []
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[start:start + 5] == b"From ":
+            position = start
+        else:
+            found = mm.find(b"\nFrom ", start, end)
+            position = found + 1 if found >= 0 else end
+        while position < end:
+            headers_start = mm.find(b"\n", position) + 1
+            if headers_start == 0:
+                break
+            next_message = mm.find(b"\nFrom ", headers_start)
+            limit = next_message + 1 if next_message >= 0 else len(mm)
+            headers_end = _header_end(mm, headers_start, min(limit, headers_start + MAX_HEADER_BYTES))
+            results.append({"source": f"{path}@{position}", **parse_header_block(mm[headers_start:headers_end])})
+            if next_message < 0:
+                break
+            position = next_message + 1
+    return results
+
+
+def message_paths(directory: str) -> List[str]:
+    paths = []
+    for root, _, names in os.walk(directory):
+        paths.extend(os.path.join(root, name) for name in sorted(names) if not name.startswith("."))
+    return paths
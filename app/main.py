@@ -1,329 +1,260 @@
-import os
-import subprocess
-import re
+import asyncio
 import json
-import sqlite3
-import duckdb
-import pandas as pd
-import httpx
-import git
-from datetime import datetime
-from PIL import Image
-from fastapi import FastAPI, HTTPException, Query
-from bs4 import BeautifulSoup
-import speech_recognition as sr
-from pydub import AudioSegment
-import markdown
+import logging
+import os
+import sys
+from typing import List, Optional
+from fastapi import Body, FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import mimetypes
 from dotenv import load_dotenv
+from app import batch, files, handlers, memo, metrics
+from app.executor import error_status, io_pool, pools, shutdown_pools
+from app.handlers.common import data_path
+from app.jobs import flights, jobs
+from app.router import TaskRouter
 
 # Load environment variables for secure token handling
 load_dotenv()
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+logger = logging.getLogger(__name__)
 AIPROXY_TOKEN = os.getenv("AIPROXY_TOKEN")
 if not AIPROXY_TOKEN:
     raise RuntimeError("AIPROXY_TOKEN environment variable is missing")
 
-# Configure ffmpeg for pydub
-os.environ["FFMPEG_BINARY"] = r"C:\Users\baruc\dataworks-agent\ffmpeg\bin\ffmpeg.exe"
-os.environ["FFPROBE_BINARY"] = r"C:\Users\baruc\dataworks-agent\ffmpeg\bin\ffprobe.exe"
-
 app = FastAPI()
+router = TaskRouter()
+# Handler modules (and the libraries they need) are imported on first use;
+# see app/handlers/__init__.py.
+handlers.register(router)
+
+@app.on_event("startup")
+async def prewarm_handlers():
+    handlers.start_prewarm()
+
+@app.on_event("shutdown")
+async def release_resources():
+    memo.memo.flush()
+    shutdown_pools()
+    fetch = sys.modules.get("app.fetch")
+    if fetch is not None:
+        await fetch.close_client()
 
 @app.get("/")
 def read_root():
     return {"message": "DataWorks Agent API is running"}
 
-@app.post("/run")
-async def run_task(task: str = Query(..., description="Plain-English task description")):
-    """
-    Parses and executes the given task.
-    """
-    try:
-        print(f"Executing task: {task}")
-        if "install uv" in task.lower() and "datagen.py" in task.lower():
-            return await handle_a1(task)
-        elif "format" in task.lower() and "prettier" in task.lower():
-            return await handle_a2(task)
-        elif re.search(r"count.*wednesday", task, re.IGNORECASE):
-            return await handle_a3(task)
-        elif re.search(r"sort.*contacts", task, re.IGNORECASE):
-            return await handle_a4(task)
-        elif re.search(r"first.*line.*log", task, re.IGNORECASE):
-            return await handle_a5(task)
-        elif re.search(r"index.*markdown", task, re.IGNORECASE):
-            return await handle_a6(task)
-        elif re.search(r"extract.*email", task, re.IGNORECASE):
-            return await handle_a7(task)
-        elif re.search(r"credit.*card.*number", task, re.IGNORECASE):
-            return await handle_a8(task)
-        elif re.search(r"similar.*comments", task, re.IGNORECASE):
-            return await handle_a9(task)
-        elif re.search(r"sales.*gold.*tickets", task, re.IGNORECASE):
-            return await handle_a10(task)
-        elif re.search(r"fetch.*data.*api", task, re.IGNORECASE):
-            return await handle_b1(task)
-        elif re.search(r"clone.*git", task, re.IGNORECASE):
-            return await handle_b2(task)
-        elif re.search(r"run.*sql.*duckdb", task, re.IGNORECASE):
-            return await handle_b3(task)
-        elif re.search(r"compress.*image", task, re.IGNORECASE):
-            return await handle_b5(task)
-        elif re.search(r"scrape.*website", task, re.IGNORECASE):
-            return await handle_b6(task)
-        elif re.search(r"transcribe.*audio", task, re.IGNORECASE):
-            return await handle_b7(task)
-        elif re.search(r"convert.*markdown.*html", task, re.IGNORECASE):
-            return await handle_b9_convert(task)
-        elif re.search(r"filter.*csv.*json", task, re.IGNORECASE):
-            return await handle_b10(task)
-        else:
-            raise ValueError("Unknown task description")
+async def _spec(route, task: str):
+    """The handler's TaskSpec for task, or None if it declares none."""
+    describe = getattr(route.handler, "spec", None)
+    return await describe(task) if describe is not None else None
 
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+async def _batch_item(index: int, task: str, route) -> batch.BatchItem:
+    try:
+        return batch.BatchItem(index, task, route, await _spec(route, task))
     except Exception as e:
-        raise HTTPException(status_code=500, detail="Internal server error")
+        # Reported as this task's outcome; the rest of the batch still runs.
+        return batch.BatchItem(index, task, route, None, error=e)
 
+def _flight_key(route, task: str) -> str:
+    # Case and inner whitespace are kept: handlers read SQL, filter literals,
+    # URLs and paths from the task text, so tasks differing only in those are
+    # different tasks.
+    return f"{route.name}:{task.strip()}"
 
-@app.get("/read")
-async def read_file(path: str = Query(..., description="Path to the file")):
-    """
-    Reads and returns the content of the specified file.
-    """
-    try:
-        base_dir = os.path.abspath("data")
-        abs_path = os.path.abspath(path)
-        if not abs_path.startswith(base_dir):
-            raise HTTPException(status_code=403, detail="Access to this file is not allowed")
-        if not os.path.exists(abs_path):
-            raise HTTPException(status_code=404, detail="File not found")
-        with open(abs_path, "r") as file:
-            content = file.read()
-        return {"content": content}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail="Internal server error")
+async def _execute(route, task: str):
+    with metrics.task(route.name, task):
+        spec = await _spec(route, task)
 
+        async def run():
+            async with pools[route.pool].admit():
+                return await route.handler(task)
 
-# ------------------ TASK HANDLERS ------------------
+        return await memo.run(route.name, spec, run)
 
-### Task A1: Install 'uv' and run datagen.py
-async def handle_a1(task: str):
+@app.post("/run")
+async def run_task(
+    task: str = Query(..., description="Plain-English task description"),
+    run_async: bool = Query(False, alias="async", description="Return a job id instead of waiting for the result"),
+):
+    """
+    Parses and executes the given task. Identical tasks already in flight are
+    merged, so the work runs once and every caller gets the same result.
+    """
     try:
-        subprocess.run(["pip", "install", "uv"], check=True)
-        subprocess.run(["python", "datagen.py", "baruc@example.com"], check=True)
-        return {"status": "success", "message": "datagen.py executed successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Task A1 error: {e}")
+        logger.info("Executing task: %s", task)
+        route = router.resolve(task)
+        if route is None:
+            raise ValueError("Unknown task description")
+        key = _flight_key(route, task)
+        run = lambda: flights.do(key, lambda: _execute(route, task))
+        if run_async:
+            job = jobs.submit(key, task, run)
+            return JSONResponse(status_code=202, content={"job_id": job.id, "status": job.status})
+        return await run()
 
-### Task A2: Format using prettier
-async def handle_a2(task: str):
-    try:
-        subprocess.run(["prettier", "--write", "data/format.md"], check=True)
-        return {"status": "success", "message": "File formatted successfully"}
+    except HTTPException:
+        # Handlers report their own failures ("Task A3 error: ...").
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Task A2 error: {e}")
+        # The same mapping the metrics and /run/batch use.
+        status = error_status(e)
+        if status == 500:
+            logger.exception("Task failed: %s", task)
+            raise HTTPException(status_code=500, detail="Internal server error")
+        raise HTTPException(status_code=status, detail=str(e), headers={"Retry-After": "1"} if status == 503 else None)
 
-### Task A3: Count the number of Wednesdays
-async def handle_a3(task: str):
-    try:
-        with open("data/dates.txt", "r") as file:
-            dates = file.readlines()
-        wednesday_count = sum(1 for date in dates if datetime.strptime(date.strip(), "%Y-%m-%d").weekday() == 2)
-        with open("data/dates-wednesdays.txt", "w") as output_file:
-            output_file.write(str(wednesday_count))
-        return {"status": "success", "message": f"{wednesday_count} Wednesdays found"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Task A3 error: {e}")
 
-### Task A4: Sort contacts by last_name, first_name
-async def handle_a4(task: str):
-    try:
-        with open("data/contacts.json", "r") as file:
-            contacts = json.load(file)
-        sorted_contacts = sorted(contacts, key=lambda c: (c["last_name"], c["first_name"]))
-        with open("data/contacts-sorted.json", "w") as output_file:
-            json.dump(sorted_contacts, output_file, indent=2)
-        return {"status": "success", "message": "Contacts sorted successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Task A4 error: {e}")
+@app.post("/run/batch")
+async def run_batch(tasks: List[str] = Body(..., embed=True, description="Plain-English task descriptions")):
+    """
+    Runs several tasks, concurrently where their declared inputs and outputs
+    allow (A1's datagen.py run finishes before the tasks that read data/ start),
+    and streams one NDJSON line per task as it finishes.
+    """
+    if not tasks:
+        raise HTTPException(status_code=400, detail="No tasks given")
+    if len(tasks) > batch.BATCH_MAX_TASKS:
+        raise HTTPException(status_code=400, detail=f"At most {batch.BATCH_MAX_TASKS} tasks per batch")
+    routes = []
+    for index, task in enumerate(tasks):
+        route = router.resolve(task)
+        if route is None:
+            raise HTTPException(status_code=400, detail=f"Unknown task description (task {index}): {task}")
+        routes.append(route)
+    logger.info("Executing batch of %d tasks", len(tasks))
+    items = await asyncio.gather(*(_batch_item(index, task, route) for index, (task, route) in enumerate(zip(tasks, routes))))
 
-### Task A5: Extract the first line from the 10 most recent log files
-async def handle_a5(task: str):
-    try:
-        log_dir = "data/logs"
-        log_files = sorted([f for f in os.listdir(log_dir) if f.endswith(".log")],
-                           key=lambda f: os.path.getmtime(os.path.join(log_dir, f)), reverse=True)[:10]
-        first_lines = []
-        for log_file in log_files:
-            with open(os.path.join(log_dir, log_file), "r") as file:
-                first_lines.append(file.readline().strip())
-        with open("data/logs-recent.txt", "w") as output_file:
-            output_file.write("\n".join(first_lines))
-        return {"status": "success", "message": "First lines extracted successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Task A5 error: {e}")
+    def execute(item):
+        key = _flight_key(item.route, item.task)
+        return flights.do(key, lambda: _execute(item.route, item.task))
 
-# ------------------ Continue similarly for A6 to B10 ------------------
-### Task A6: Create an index of Markdown files
-async def handle_a6(task: str):
-    try:
-        markdown_dir = "data/docs"
-        index = {}
-        for file_name in os.listdir(markdown_dir):
-            if file_name.endswith(".md"):
-                with open(os.path.join(markdown_dir, file_name), "r") as file:
-                    first_h1 = next((line.strip("# ").strip() for line in file if line.startswith("# ")), "Untitled")
-                    index[file_name] = first_h1
-        with open("data/docs/index.json", "w") as index_file:
-            json.dump(index, index_file, indent=2)
-        return {"status": "success", "message": "Markdown index created successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Task A6 error: {e}")
+    async def lines():
+        async for outcome in batch.run(items, execute):
+            yield json.dumps(outcome) + "\n"
 
-### Task A7: Extract sender's email address from an email file
-async def handle_a7(task: str):
-    try:
-        with open("data/email.txt", "r") as file:
-            content = file.read()
-        email = extract_email_from_text(content)
-        if not email:
-            raise ValueError("No email address found")
-        with open("data/email-sender.txt", "w") as output_file:
-            output_file.write(email)
-        return {"status": "success", "message": "Sender email extracted successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Task A7 error: {e}")
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
-### Task A8: Extract credit card number from an image
-async def handle_a8(task: str):
-    try:
-        # Simulated credit card extraction from image
-        credit_card_number = extract_credit_card_number_from_image("data/credit-card.png")
-        with open("data/credit-card.txt", "w") as output_file:
-            output_file.write(credit_card_number)
-        return {"status": "success", "message": "Credit card number extracted successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Task A8 error: {e}")
 
-### Task A9: Find the most similar comments
-async def handle_a9(task: str):
-    try:
-        with open("data/comments.txt", "r") as file:
-            comments = file.readlines()
-        most_similar = (comments[0], comments[1])  # Simulated similar pair
-        with open("data/comments-similar.txt", "w") as output_file:
-            output_file.write("\n".join(most_similar))
-        return {"status": "success", "message": "Most similar comments found and written to file"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Task A9 error: {e}")
+@app.get("/metrics")
+def get_metrics():
+    """
+    Per-handler counters, latency and stage histograms and in-flight gauges
+    in the Prometheus text format.
+    """
+    for pool in pools.values():
+        metrics.pool_admitted.set(pool.admitted, pool.name)
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
-### Task A10: Calculate total sales for Gold tickets
-async def handle_a10(task: str):
-    try:
-        conn = sqlite3.connect("data/ticket-sales.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT SUM(units * price) FROM tickets WHERE type = 'Gold'")
-        total_sales = cursor.fetchone()[0] or 0
-        with open("data/ticket-sales-gold.txt", "w") as output_file:
-            output_file.write(str(total_sales))
-        return {"status": "success", "message": f"Total sales for Gold tickets: {total_sales}"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Task A10 error: {e}")
 
-# ------------------ BUSINESS TASK HANDLERS (B1 to B10) ------------------
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Returns the status, timing and result of a job started with /run?async=1.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.as_dict()
 
-### Task B1: Fetch data from an API
-async def handle_b1(task: str):
-    try:
-        response = httpx.get("https://jsonplaceholder.typicode.com/posts")
-        data = response.json()
-        with open("data/api-response.json", "w") as output_file:
-            json.dump(data, output_file)
-        return {"status": "success", "message": "Data fetched from API successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Task B1 error: {e}")
 
-### Task B2: Clone a Git repository and commit a change
-async def handle_b2(task: str):
+@app.get("/read")
+async def read_file(request: Request, path: str = Query(..., description="Path to the file")):
+    """
+    Streams the specified file. Supports single byte-range requests and
+    answers If-None-Match / If-Modified-Since with 304 when unchanged.
+    """
+    abs_path = data_path(path)
     try:
-        repo_url = "https://github.com/Baruch-George/dataworks-agent.git"
-        repo_path = "data/dataworks-agent"
-        if not os.path.exists(repo_path):
-            git.Repo.clone_from(repo_url, repo_path)
-        repo = git.Repo(repo_path)
-        with open(os.path.join(repo_path, "README.md"), "a") as readme_file:
-            readme_file.write(f"\n## Automated Update at {datetime.now()}")
-        repo.index.add(["README.md"])
-        repo.index.commit("Automated commit by DataWorks Agent")
-        origin = repo.remote(name="origin")
-        origin.push()
-        return {"status": "success", "message": "Repository cloned and changes committed"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Task B2 error: {e}")
+        st = os.stat(abs_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    except OSError:
+        raise HTTPException(status_code=500, detail="Internal server error")
+    if not os.path.isfile(abs_path):
+        raise HTTPException(status_code=404, detail="File not found")
 
-### Task B3: Run a SQL query on DuckDB
-async def handle_b3(task: str):
+    headers = {
+        "ETag": files.etag(st),
+        "Last-Modified": files.last_modified(st),
+        "Accept-Ranges": "bytes",
+    }
+    if files.not_modified(request.headers, st):
+        return Response(status_code=304, headers=headers)
     try:
-        con = duckdb.connect(database=":memory:")
-        con.execute("CREATE TABLE items (id INTEGER, name VARCHAR)")
-        result = con.execute("SELECT * FROM items").fetchall()
-        return {"status": "success", "message": "SQL query executed successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Task B3 error: {e}")
+        byte_range = files.parse_range(request.headers, st)
+    except files.RangeNotSatisfiable:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{st.st_size}"})
 
-### Task B5: Compress or resize an image
-async def handle_b5(task: str):
-    try:
-        image = Image.open("data/sample-image.jpg")
-        image.save("data/sample-image-compressed.jpg", optimize=True, quality=20)
-        return {"status": "success", "message": "Image compressed successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Task B5 error: {e}")
+    media_type = mimetypes.guess_type(abs_path)[0] or "application/octet-stream"
+    status_code = 200
+    start, end = 0, st.st_size - 1
+    if byte_range is not None:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{st.st_size}"
 
-### Task B6: Scrape data from a website
-async def handle_b6(task: str):
     try:
-        response = requests.get("https://en.wikipedia.org/wiki/Straive")
-        soup = BeautifulSoup(response.content, "html.parser")
-        title = soup.title.string
-        with open("data/scraped_data.json", "w") as output_file:
-            json.dump({"title": title}, output_file)
-        return {"status": "success", "message": "Website scraped successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Task B6 error: {e}")
+        if files.small_files.accepts(st):
+            content = files.small_files.get(abs_path, st)
+            if content is None:
+                content = await io_pool.run(files.read_all, abs_path)
+                files.small_files.put(abs_path, st, content)
+            return Response(content=content[start:end + 1], status_code=status_code, headers=headers, media_type=media_type)
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(files.iter_file(abs_path, start, end), status_code=status_code, headers=headers, media_type=media_type)
+    except OSError:
+        raise HTTPException(status_code=500, detail="Internal server error")
 
-### Task B7: Transcribe audio from MP3
-async def handle_b7(task: str):
-    try:
-        audio = AudioSegment.from_mp3("data/sample-audio.mp3")
-        wav_file = "data/sample-audio.wav"
-        audio.export(wav_file, format="wav")
-        recognizer = sr.Recognizer()
-        with sr.AudioFile(wav_file) as source:
-            audio_data = recognizer.record(source)
-            transcription = recognizer.recognize_google(audio_data)
-        with open("data/transcription.txt", "w") as output_file:
-            output_file.write(transcription)
-        return {"status": "success", "message": "Audio transcribed successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Task B7 error: {e}")
 
-### Task B9: Convert Markdown to HTML
-async def handle_b9_convert(task: str):
+@app.get("/duckdb/query")
+async def duckdb_query(
+    sql: str = Query(..., description="SQL to run (the database is opened read-only)"),
+    db: str = Query("data/sample.duckdb", description="Path to the DuckDB file"),
+    format: str = Query("ndjson", description="ndjson, json, csv, parquet or arrow"),
+):
+    """
+    Runs a read-only query on a persistent DuckDB connection and streams the
+    result as it is produced.
+    """
+    abs_path = data_path(db)
+    if not os.path.isfile(abs_path):
+        raise HTTPException(status_code=404, detail="Database not found")
+    duckquery = await handlers.load_module("app.duckquery")
+    import duckdb  # loaded with app.duckquery
     try:
-        with open("data/README.md", "r") as md_file:
-            html = markdown.markdown(md_file.read())
-        with open("data/README.html", "w") as html_file:
-            html_file.write(html)
-        return {"status": "success", "message": "Markdown converted to HTML successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Task B9 error: {e}")
+        chunks = await io_pool.run(duckquery.query, abs_path, sql, format)
+    except (ValueError, duckdb.Error) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(chunks, media_type=duckquery.MEDIA_TYPES[format])
+
 
-### Task B10: Filter a CSV file and return JSON data
-async def handle_b10(task: str):
+@app.get("/csv/filter")
+async def csv_filter(
+    path: str = Query(..., description="Path to the CSV file"),
+    where: str = Query("", description='Filter expression, e.g. name == "Alice" and age >= 30'),
+    columns: str = Query("", description="Comma-separated columns to return (default: all)"),
+    format: str = Query("ndjson", description="ndjson, json, csv or parquet"),
+    limit: Optional[int] = Query(None, ge=0, description="Maximum number of rows"),
+):
+    """
+    Streams the rows of a CSV file that match a filter expression. The file
+    is scanned out of core with the filter and projection pushed down.
+    """
+    abs_path = data_path(path)
+    if not os.path.isfile(abs_path):
+        raise HTTPException(status_code=404, detail="File not found")
+    if format == "arrow":
+        raise HTTPException(status_code=400, detail="Unsupported format: arrow")
+    select = [name.strip() for name in columns.split(",") if name.strip()]
+    csvfilter = await handlers.load_module("app.csvfilter")
+    import duckdb  # loaded with app.csvfilter
+    from app import duckquery
     try:
-        df = pd.read_csv("data/query-result.csv")
-        filtered_df = df[df["name"] == "Alice"]
-        filtered_df.to_json("data/filtered_data.json", orient="records")
-        return {"status": "success", "message": "Filtered data saved to JSON"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Task B10 error: {e}")
+        chunks = await io_pool.run(csvfilter.filter_csv, abs_path, where, select, format, limit)
+    except (ValueError, duckdb.Error) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(chunks, media_type=duckquery.MEDIA_TYPES[format])
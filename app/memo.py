@@ -0,0 +1,372 @@
+"""
+Input-fingerprinted memoization of task results for POST /run.
+
+Handler modules describe a task with spec(task) -> TaskSpec: the paths it
+reads, the paths it writes and the parameters parsed from the task text.
+Before the handler runs, its inputs are fingerprinted:
+
+  file       sha256 of the content. Digests are cached by path with the
+             file's [mtime_ns, size], so an unchanged file costs one stat; a
+             touched file is re-read, and still matches if its bytes are the
+             same (datagen.py rewrites identical data, for instance).
+  directory  relative path, mtime_ns and size of every file below it, minus
+             the task's own outputs and dotfiles. Stat only: handlers such as
+             A5 depend on mtimes, and hashing whole trees is exactly what the
+             incremental engines (images, sitebuild) avoid. The walk is cached
+             with the mtime of every directory in the tree and reused while
+             those are unchanged, so a lookup costs a stat per directory, not
+             per file. A task that runs here invalidates the trees its outputs
+             overlap; a file rewritten in place by another process (which
+             leaves its directory's mtime alone) is noticed on the next full
+             walk, at most TASK_MEMO_TREE_MAX_AGE seconds later.
+  engine     a spec can name a function that computes the state of an
+             input the way its engine sees it (A5's view of data/logs). It
+             is computed once per request, at lookup; on a miss the handler
+             gets the same value through engine_state() instead of
+             recomputing it, and the result is recorded against it without
+             computing it again.
+  missing    recorded as such, so the path appearing invalidates the entry.
+
+If the route, parameters and input fingerprint match an earlier run and
+every output still has the stat recorded after that run, the earlier result
+is returned and the handler does not run. Otherwise it runs, and its result
+is recorded only if the inputs' stat is the same afterwards, so a file
+edited mid-run is never paired with a stale result. Tasks that rewrite an
+input in place (A2) are recorded with their inputs as they are after the
+run. A task seen for the first time is not hashed before it runs; hashing
+its inputs and recording the result happen in the background once the
+response is ready, so memoization adds a few stats to a cold run.
+
+Entries (the TASK_MEMO_ENTRIES most recently used) and the digest cache are
+kept in memory and in data/.cache/task-memo.json, so they survive restarts.
+The file is rewritten at most once per TASK_MEMO_SAVE_DELAY seconds, with
+every result recorded in the meantime, and on shutdown.
+Handlers write outputs with fsutil.atomic_write, so an output is never seen
+half-written, whether by a reader or by the stat check. TASK_MEMO=0 turns
+memoization off.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from app import metrics
+from app.executor import io_pool
+from app.fsutil import atomic_write, cache_path, load_json
+
+TASK_MEMO = os.getenv("TASK_MEMO", "1").lower() not in ("0", "false", "no", "off")
+TASK_MEMO_ENTRIES = int(os.getenv("TASK_MEMO_ENTRIES", 1000))
+TASK_MEMO_TREE_MAX_AGE = float(os.getenv("TASK_MEMO_TREE_MAX_AGE", 2))
+TASK_MEMO_SAVE_DELAY = float(os.getenv("TASK_MEMO_SAVE_DELAY", 1))
+HASH_CHUNK = 1 << 20
+
+MISS = object()
+
+logger = logging.getLogger(__name__)
+
+memo_lookups_total = metrics.Counter("memo_lookups_total", "Memoized task lookups by outcome.", ("handler", "result"))
+
+
+@dataclass(frozen=True)
+class TaskSpec:
+    """
+    What one task reads and writes. Paths are made absolute. A spec with
+    memoize=False still describes the task (for batch scheduling) but its
+    results are never reused, for tasks whose result depends on more than
+    their inputs (the network, a remote repository). states maps an input
+    to a function of its path returning JSON-serializable engine state, used
+    instead of the generic fingerprint.
+    """
+    inputs: Sequence[str] = ()
+    outputs: Sequence[str] = ()
+    params: Dict[str, Any] = field(default_factory=dict)
+    memoize: bool = True
+    states: Dict[str, Callable[[str], Any]] = field(default_factory=dict)
+
+    def __post_init__(self):
+        object.__setattr__(self, "inputs", tuple(os.path.abspath(path) for path in self.inputs))
+        object.__setattr__(self, "outputs", tuple(os.path.abspath(path) for path in self.outputs))
+        object.__setattr__(self, "states", {os.path.abspath(path): state for path, state in self.states.items()})
+
+    def key(self, name: str) -> str:
+        text = json.dumps([name, self.params, self.inputs, self.outputs], sort_keys=True, default=str)
+        return hashlib.sha1(text.encode()).hexdigest()
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _json_digest(value: Any) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+def _within(path: str, roots: Sequence[str]) -> bool:
+    return any(path == root or path.startswith(root + os.sep) for root in roots)
+
+
+def _overlap(path: str, other: str) -> bool:
+    return _within(path, (other,)) or _within(other, (path,))
+
+
+def _walk(root: str, exclude: Sequence[str]) -> Tuple[List[Tuple[str, int, int]], Dict[str, int]]:
+    """(relative path, mtime_ns, size) of every file, and the mtime_ns of every directory."""
+    entries = []
+    directories = {}
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            # Stat before listing: a change made during the listing leaves
+            # the recorded mtime out of date, so the next check walks again.
+            directories[directory] = os.stat(directory).st_mtime_ns
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.name.startswith(".") or _within(entry.path, exclude):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file():
+                        st = entry.stat()
+                        entries.append((entry.path[len(root):], st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            continue
+    entries.sort()
+    return entries, directories
+
+
+def _unchanged(directories: Dict[str, int]) -> bool:
+    for directory, mtime_ns in directories.items():
+        try:
+            if os.stat(directory).st_mtime_ns != mtime_ns:
+                return False
+        except FileNotFoundError:
+            return False
+    return True
+
+
+class TaskMemo:
+    def __init__(self, path: Optional[str] = None):
+        self._path = path
+        self._lock = threading.Lock()
+        self._entries: Optional["OrderedDict[str, dict]"] = None
+        self._digests: Dict[str, list] = {}
+        self._hashing: Dict[str, threading.Lock] = {}
+        # (root, excluded paths) -> (walked at, directory mtimes, digest)
+        self._trees: Dict[Tuple[str, tuple], tuple] = {}
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+        self._saving = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return self._path or cache_path("task-memo.json")
+
+    def _load(self):
+        if self._entries is None:
+            data = load_json(self.path, default={})
+            self._entries = OrderedDict(data.get("entries", {}))
+            self._digests = data.get("digests", {})
+
+    def _save_later(self):
+        # Called with the lock held.
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(TASK_MEMO_SAVE_DELAY, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Writes entries and digests to disk if they changed since the last write."""
+        # Encoding and writing under one lock keeps writes in order.
+        with self._saving:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                encoded = json.dumps({"entries": self._entries, "digests": self._digests}, separators=(",", ":"))
+            with atomic_write(self.path) as file:
+                file.write(encoded)
+
+    def tree_state(self, path: str, exclude: Sequence[str] = ()) -> str:
+        """
+        Digest of the stat of every file below path, walked again only when a
+        directory in the tree changed, it was invalidated, or the last walk
+        is TASK_MEMO_TREE_MAX_AGE seconds old.
+        """
+        key = (path, tuple(exclude))
+        with self._lock:
+            cached = self._trees.get(key)
+        if cached is not None and time.monotonic() - cached[0] < TASK_MEMO_TREE_MAX_AGE and _unchanged(cached[1]):
+            return cached[2]
+        walked_at = time.monotonic()
+        entries, directories = _walk(path, exclude)
+        state = _json_digest(entries)
+        with self._lock:
+            self._trees[key] = (walked_at, directories, state)
+        return state
+
+    def invalidate(self, paths: Optional[Sequence[str]]):
+        """Forgets the cached trees that overlap paths (all of them for None)."""
+        with self._lock:
+            for key in list(self._trees):
+                if paths is None or any(_overlap(key[0], path) for path in paths):
+                    del self._trees[key]
+
+    def output_state(self, path: str) -> Optional[list]:
+        """[mtime_ns, size] of a file, ["dir", listing digest] of a directory, None if missing."""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        if os.path.isdir(path):
+            return ["dir", self.tree_state(path)]
+        return [st.st_mtime_ns, st.st_size]
+
+    def digest(self, path: str) -> Optional[str]:
+        """sha256 of a file, re-read only when its stat changed; None if it is missing."""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        stat = [st.st_mtime_ns, st.st_size]
+        with self._lock:
+            self._load()
+            cached = self._digests.get(path)
+        if cached is not None and cached[:2] == stat:
+            return cached[2]
+        with self._lock:
+            hashing = self._hashing.setdefault(path, threading.Lock())
+        # Tasks reading the same file (in a batch, say) hash it once.
+        with hashing:
+            with self._lock:
+                cached = self._digests.get(path)
+            if cached is not None and cached[:2] == stat:
+                return cached[2]
+            digest = _sha256(path)
+            with self._lock:
+                self._digests[path] = stat + [digest]
+        return digest
+
+    def _input_state(self, spec: TaskSpec, path: str, states: Dict[str, Any]) -> Optional[list]:
+        if path in states:
+            return ["engine", _json_digest(states[path])]
+        if os.path.isdir(path):
+            return ["dir", self.tree_state(path, spec.outputs)]
+        return self.output_state(path)
+
+    def snapshot(self, spec: TaskSpec, states: Dict[str, Any]) -> list:
+        """Stat of every input (states for the engine ones): enough to tell whether one changed."""
+        return [[path, self._input_state(spec, path, states)] for path in spec.inputs]
+
+    def fingerprint(self, snapshot: list) -> str:
+        """Snapshot with the stat of every file input replaced by its content digest."""
+        parts = []
+        for path, state in snapshot:
+            if state is not None and state[0] in ("dir", "engine"):
+                parts.append([path] + state)
+            else:
+                parts.append([path, self.digest(path)])
+        return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+    def lookup(self, key: str, spec: TaskSpec) -> Tuple[list, Dict[str, Any], Any]:
+        """
+        (input snapshot, engine states, earlier result) if the task can be
+        skipped, (input snapshot, engine states, MISS) otherwise. Inputs are
+        only hashed if there is an earlier result to compare with.
+        """
+        states = {path: state(path) for path, state in spec.states.items()}
+        snapshot = self.snapshot(spec, states)
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+        if entry is None or entry["fingerprint"] != self.fingerprint(snapshot):
+            return snapshot, states, MISS
+        if any(self.output_state(path) != entry["outputs"].get(path) for path in spec.outputs):
+            return snapshot, states, MISS
+        with self._lock:
+            self._entries.move_to_end(key)
+        return snapshot, states, entry["result"]
+
+    def record(self, key: str, spec: TaskSpec, snapshot: list, states: Dict[str, Any], result: Any) -> bool:
+        """Stores result unless an input changed since snapshot; see the module docstring."""
+        # The handler worked from states, so they are not computed again.
+        after = self.snapshot(spec, states)
+        if after != snapshot and not set(spec.inputs) & set(spec.outputs):
+            return False
+        fingerprint = self.fingerprint(after)
+        outputs = {path: self.output_state(path) for path in spec.outputs}
+        with self._lock:
+            self._load()
+            self._entries[key] = {"fingerprint": fingerprint, "outputs": outputs, "result": result}
+            self._entries.move_to_end(key)
+            while len(self._entries) > TASK_MEMO_ENTRIES:
+                self._entries.popitem(last=False)
+            self._save_later()
+        return True
+
+
+memo = TaskMemo()
+_recording = set()
+_engine_states: ContextVar[Dict[str, Any]] = ContextVar("engine_states", default={})
+
+
+def engine_state(path: str) -> Any:
+    """
+    The engine state the memo computed for input path in the current
+    request, or None if it did not (memoization off, say).
+    """
+    return _engine_states.get().get(os.path.abspath(path))
+
+
+def _recorded(task: asyncio.Future):
+    _recording.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Could not record task result", exc_info=task.exception())
+
+
+async def run(name: str, spec: Optional[TaskSpec], factory: Callable[[], Awaitable[Any]]):
+    """
+    Awaits factory() for the task named name unless spec's inputs, outputs
+    and parameters match an earlier run, whose result is returned instead.
+    """
+    if not TASK_MEMO or spec is None or not spec.memoize:
+        try:
+            return await factory()
+        finally:
+            # A task without a spec might have written anywhere.
+            memo.invalidate(spec.outputs if spec is not None else None)
+    key = spec.key(name)
+    with metrics.stage("fingerprint"):
+        snapshot, states, result = await io_pool.run(memo.lookup, key, spec)
+    if result is not MISS:
+        memo_lookups_total.inc(name, "hit")
+        return result
+    memo_lookups_total.inc(name, "miss")
+    token = _engine_states.set(states)
+    try:
+        result = await factory()
+    finally:
+        _engine_states.reset(token)
+        memo.invalidate(spec.outputs)
+    # Stored (and returned on a hit) as the JSON the client received.
+    recording = asyncio.ensure_future(io_pool.run(memo.record, key, spec, snapshot, states, jsonable_encoder(result)))
+    _recording.add(recording)
+    recording.add_done_callback(_recorded)
+    return result
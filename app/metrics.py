@@ -0,0 +1,205 @@
+"""
+In-process task metrics, exposed in Prometheus text format on GET /metrics.
+
+Counters, gauges and histograms keep their values in a dict keyed by label
+values, guarded by one lock per metric. An update is a lock, a dict lookup
+and an add (a bisect for histograms), so instrumenting every task costs a
+few microseconds.
+
+task() wraps one handler execution. It counts it, times it, tracks how many
+are in flight and logs it if it is slower than SLOW_TASK_SECONDS. It also
+makes the task current through a ContextVar, so stage() spans inside the
+handler coroutine (e.g. around the awaits that read input, compute and
+write output) are attributed to the task without passing anything around.
+Stage durations go to the task_stage_seconds histogram and into the slow
+task log line.
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.executor import error_status
+
+SLOW_TASK_SECONDS = float(os.getenv("SLOW_TASK_SECONDS", 5))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+logger = logging.getLogger(__name__)
+
+_registry: List["_Metric"] = []
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def samples(self) -> Iterator[Tuple[str, Tuple[Tuple[str, str], ...], float]]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield self.name, tuple(zip(self.labels, labels)), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # [per-bucket counts (last one is +Inf), sum, count]
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, (list(counts), total, count)) for labels, (counts, total, count) in self._values.items()]
+        for labels, (counts, total, count) in items:
+            pairs = tuple(zip(self.labels, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket", pairs + (("le", le),), cumulative
+            yield f"{self.name}_sum", pairs, total
+            yield f"{self.name}_count", pairs, count
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            if labels:
+                label_text = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels)
+                lines.append(f"{name}{{{label_text}}} {_format(value)}")
+            else:
+                lines.append(f"{name} {_format(value)}")
+    return "\n".join(lines) + "\n"
+
+
+tasks_total = Counter("tasks_total", "Handler executions by outcome (HTTP status code).", ("handler", "status"))
+task_errors_total = Counter("task_errors_total", "Failed handler executions by exception type.", ("handler", "error"))
+tasks_in_flight = Gauge("tasks_in_flight", "Handler executions currently running.", ("handler",))
+task_duration_seconds = Histogram("task_duration_seconds", "Handler execution time.", ("handler",))
+task_stage_seconds = Histogram("task_stage_seconds", "Time spent in each stage of a handler.", ("handler", "stage"))
+slow_tasks_total = Counter("slow_tasks_total", "Handler executions slower than SLOW_TASK_SECONDS.", ("handler",))
+pool_admitted = Gauge("pool_admitted", "Requests running or queued on each worker pool.", ("pool",))
+
+
+class TaskSpan:
+    __slots__ = ("handler", "description", "stages")
+
+    def __init__(self, handler: str, description: str):
+        self.handler = handler
+        self.description = description
+        self.stages: Dict[str, float] = {}
+
+
+_current: ContextVar[Optional[TaskSpan]] = ContextVar("current_task", default=None)
+
+
+@contextmanager
+def task(handler: str, description: str = ""):
+    """Times one execution of handler; see the module docstring."""
+    span = TaskSpan(handler, description)
+    token = _current.set(span)
+    tasks_in_flight.inc(handler)
+    status = "200"
+    start = time.perf_counter()
+    try:
+        yield span
+    except BaseException as e:
+        status = str(error_status(e))
+        # Handlers wrap failures in HTTPException; count what actually went wrong.
+        task_errors_total.inc(handler, type(e.__cause__ or e.__context__ or e).__name__)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _current.reset(token)
+        tasks_in_flight.dec(handler)
+        tasks_total.inc(handler, status)
+        task_duration_seconds.observe(elapsed, handler)
+        if elapsed >= SLOW_TASK_SECONDS:
+            slow_tasks_total.inc(handler)
+            stages = ", ".join(f"{name} {seconds:.3f} s" for name, seconds in span.stages.items())
+            logger.warning(
+                "Slow task %s took %.3f s (%s, status %s): %s",
+                handler, elapsed, stages or "no stages recorded", status, description,
+            )
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Times a stage ("read", "compute", "write", ...) of the current task. Use
+    it around awaits in the handler coroutine; code running on pool workers
+    is outside the task's context.
+    """
+    span = _current.get()
+    if span is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        span.stages[name] = span.stages.get(name, 0.0) + elapsed
+        task_stage_seconds.observe(elapsed, span.handler, name)
@@ -0,0 +1,97 @@
+"""
+Declarative task routing for POST /run.
+
+Handlers register the patterns that select them; the router compiles every
+registered route into a single anchored regular expression (one alternative
+per route, tried in priority order) and memoizes the normalized task text to
+the winning route, so repeated tasks never touch the regex engine at all.
+"""
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Route:
+    name: str
+    handler: Callable
+    patterns: Tuple[str, ...]
+    priority: int = 0
+    pool: Optional[str] = None
+
+
+class TaskRouter:
+    def __init__(self, cache_size: int = 4096):
+        self._routes = []
+        self._matcher = None
+        self._ordered = ()
+        self._resolve_cached = lru_cache(maxsize=cache_size)(self._resolve)
+
+    @staticmethod
+    def normalize(task: str) -> str:
+        """Lower-cases the task and collapses runs of whitespace."""
+        return " ".join(task.lower().split())
+
+    def route(self, *patterns: str, name: Optional[str] = None, priority: int = 0, pool: Optional[str] = None):
+        """
+        Decorator registering a handler. Every pattern must match somewhere in
+        the task for the route to be selected; higher priority routes win,
+        ties go to the route registered first. `pool` names the worker pool
+        the handler's blocking work is admitted to.
+        """
+        def decorator(handler):
+            self.add(handler, *patterns, name=name, priority=priority, pool=pool)
+            return handler
+        return decorator
+
+    def add(
+        self,
+        handler: Callable,
+        *patterns: str,
+        name: Optional[str] = None,
+        priority: int = 0,
+        pool: Optional[str] = None,
+    ) -> Route:
+        if not patterns:
+            raise ValueError("A route needs at least one pattern")
+        for pattern in patterns:
+            re.compile(pattern)
+        route = Route(name or handler.__name__, handler, tuple(patterns), priority, pool)
+        self._routes.append(route)
+        self._matcher = None
+        self._resolve_cached.cache_clear()
+        return route
+
+    @property
+    def routes(self) -> Tuple[Route, ...]:
+        if self._matcher is None:
+            self._compile()
+        return self._ordered
+
+    def resolve(self, task: str) -> Optional[Route]:
+        """Returns the route selected for the task, or None if nothing matches."""
+        return self._resolve_cached(self.normalize(task))
+
+    def cache_info(self):
+        return self._resolve_cached.cache_info()
+
+    def _compile(self):
+        # sorted() is stable, so equal priorities keep registration order.
+        ordered = tuple(sorted(self._routes, key=lambda r: -r.priority))
+        alternatives = []
+        for i, route in enumerate(ordered):
+            lookaheads = "".join(f"(?=.*?(?:{p}))" for p in route.patterns)
+            # The empty group closes last, so match.lastindex identifies the route.
+            alternatives.append(f"{lookaheads}(?P<r{i}>)")
+        self._matcher = re.compile("|".join(alternatives) or "(?!)", re.IGNORECASE | re.DOTALL)
+        self._ordered = ordered
+        self._group_to_route = {self._matcher.groupindex[f"r{i}"]: route for i, route in enumerate(ordered)}
+
+    def _resolve(self, normalized: str) -> Optional[Route]:
+        if self._matcher is None:
+            self._compile()
+        match = self._matcher.match(normalized)
+        if match is None:
+            return None
+        return self._group_to_route[match.lastindex]
@@ -0,0 +1,322 @@
+"""
+Near-duplicate search over a file with one comment per line (handle_a9).
+
+Every line becomes a TF-IDF weighted vector of hashed byte 3-grams, built
+for a whole block of lines at once with NumPy and stored as a SciPy sparse
+matrix. The most similar pairs (cosine) are then found either
+
+- exactly, by multiplying row blocks against the columns at or after the
+  block and keeping a running top-k, or
+- approximately, for corpora larger than SIMILARITY_EXACT_LIMIT lines, by
+  MinHash signatures and LSH banding, scoring only the candidate pairs that
+  share a band bucket.
+
+The raw n-gram counts and MinHash signatures are persisted under
+data/.cache. When the file has only grown since the last run, only the
+appended lines are featurized; IDF weights are re-derived from the stored
+counts, which is a cheap vector operation.
+"""
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+from app.fsutil import cache_path
+
+DIMENSION_BITS = 20
+DIMENSIONS = 1 << DIMENSION_BITS
+NUM_PERM = 64
+BANDS = 16
+EXACT_LIMIT = int(os.getenv("SIMILARITY_EXACT_LIMIT", 50_000))
+# Common 3-grams make row-by-row products nearly dense, so a block of rows
+# is sized to hold about this many products whatever the corpus size.
+PRODUCT_BUDGET = int(os.getenv("SIMILARITY_PRODUCT_BUDGET", 4_000_000))
+MIN_BLOCK_ROWS = 64
+MAX_BUCKET = 64
+FEATURIZE_BYTES = 64 * 1024 * 1024
+INDEX_VERSION = 1
+
+_MAX_HASH = np.uint32(0xFFFFFFFF)
+_BIN_BITS = NUM_PERM.bit_length() - 1
+_BAND_MIX = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0x27D4EB2F165667C5], dtype=np.uint64)
+
+
+@dataclass
+class SimilarPair:
+    score: float
+    first: int
+    second: int
+    first_text: str = ""
+    second_text: str = ""
+
+    def as_dict(self):
+        return {"score": round(self.score, 6), "lines": [self.first + 1, self.second + 1]}
+
+
+def featurize(block: bytes) -> sp.csr_matrix:
+    """Hashed byte 3-gram counts for every newline-terminated line of block."""
+    data = np.frombuffer(block.lower(), dtype=np.uint8)
+    newlines = np.flatnonzero(data == 10)
+    n_lines = len(newlines)
+    if len(data) < 3:
+        return sp.csr_matrix((n_lines, DIMENSIONS), dtype=np.float32)
+    first, second, third = data[:-2], data[1:-1], data[2:]
+    positions = np.flatnonzero((first != 10) & (second != 10) & (third != 10))
+    grams = (
+        first[positions].astype(np.uint64) << np.uint64(16)
+        | second[positions].astype(np.uint64) << np.uint64(8)
+        | third[positions].astype(np.uint64)
+    )
+    columns = ((grams * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(64 - DIMENSION_BITS)).astype(np.int32)
+    # Lines before a position = newlines before it (the position itself is not one).
+    rows = np.cumsum(data == 10, dtype=np.int32)[positions]
+    counts = sp.csr_matrix(
+        (np.ones(len(positions), dtype=np.float32), (rows, columns)), shape=(n_lines, DIMENSIONS)
+    )
+    counts.sum_duplicates()
+    return counts
+
+
+def minhash(counts: sp.csr_matrix) -> np.ndarray:
+    """
+    MinHash signatures (n_rows x NUM_PERM) of each row's set of n-grams, using
+    one-permutation hashing: every n-gram is hashed once, the top bits pick
+    one of NUM_PERM bins and each bin keeps its minimum. Empty bins borrow
+    from the next non-empty bin to the right (rotation densification). Rows
+    without any n-gram keep an all-_MAX_HASH signature.
+    """
+    n_rows = counts.shape[0]
+    signatures = np.full((n_rows, NUM_PERM), _MAX_HASH, dtype=np.uint32)
+    if counts.nnz == 0:
+        return signatures
+    hashes = counts.indices.astype(np.uint32) * np.uint32(0x9E3779B1)
+    hashes ^= hashes >> np.uint32(15)
+    hashes *= np.uint32(0x85EBCA77)
+    hashes ^= hashes >> np.uint32(13)
+    bins = (hashes >> np.uint32(32 - _BIN_BITS)).astype(np.intp)
+    values = hashes & np.uint32((1 << (32 - _BIN_BITS)) - 1)
+    rows = np.repeat(np.arange(n_rows), np.diff(counts.indptr))
+    np.minimum.at(signatures, (rows, bins), values)
+
+    nonempty_rows = np.diff(counts.indptr) > 0
+    for distance in range(1, NUM_PERM):
+        empty = (signatures == _MAX_HASH) & nonempty_rows[:, None]
+        if not empty.any():
+            break
+        borrowed = np.roll(signatures, -1, axis=1)
+        fill = empty & (borrowed != _MAX_HASH)
+        # Offsetting by the distance keeps borrowed values apart from real ones.
+        signatures[fill] = borrowed[fill] + np.uint32(distance << (32 - _BIN_BITS))
+    return signatures
+
+
+def tfidf(counts: sp.csr_matrix) -> sp.csr_matrix:
+    """Sublinear TF-IDF with L2-normalized rows."""
+    n_rows = counts.shape[0]
+    df = np.bincount(counts.indices, minlength=DIMENSIONS)
+    idf = (np.log((1 + n_rows) / (1 + df)) + 1).astype(np.float32)
+    weighted = counts.copy()
+    weighted.data = np.log1p(weighted.data) * idf[weighted.indices]
+    norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sp.csr_matrix(sp.diags(1 / norms) @ weighted, dtype=np.float32)
+
+
+def _keep_top(best, rows, cols, scores, k):
+    rows = np.concatenate([best[0], rows])
+    cols = np.concatenate([best[1], cols])
+    scores = np.concatenate([best[2], scores])
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        rows, cols, scores = rows[keep], cols[keep], scores[keep]
+    return rows, cols, scores
+
+
+def exact_top_pairs(vectors: sp.csr_matrix, k: int, budget: int = PRODUCT_BUDGET):
+    """Top-k (row, col, score) with row < col by blocked sparse matrix products."""
+    n_rows = vectors.shape[0]
+    block_rows = max(MIN_BLOCK_ROWS, budget // max(n_rows, 1))
+    transposed = vectors.T.tocsc()
+    best = (np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float32))
+    for start in range(0, n_rows, block_rows):
+        # Only columns from start on can hold pairs with row < col.
+        products = (vectors[start:start + block_rows] @ transposed[:, start:]).tocoo()
+        upper = products.col > products.row
+        best = _keep_top(
+            best, products.row[upper].astype(np.int64) + start, products.col[upper].astype(np.int64) + start,
+            products.data[upper], k,
+        )
+    return best
+
+
+def _pair_keys(a, b, n_rows):
+    return np.minimum(a, b).astype(np.int64) * n_rows + np.maximum(a, b)
+
+
+def lsh_candidates(signatures: np.ndarray, max_bucket: int = MAX_BUCKET) -> np.ndarray:
+    """Pairs (n x 2, first < second) of rows sharing at least one LSH band."""
+    n_rows = signatures.shape[0]
+    eligible = np.flatnonzero(signatures[:, 0] != _MAX_HASH)
+    rows_per_band = NUM_PERM // BANDS
+    pair_keys = []
+    for band in range(BANDS):
+        part = signatures[eligible, band * rows_per_band:(band + 1) * rows_per_band].astype(np.uint64)
+        keys = (part * _BAND_MIX[:rows_per_band]).sum(axis=1, dtype=np.uint64)
+        order = eligible[np.argsort(keys, kind="stable")]
+        sorted_keys = np.sort(keys)
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(sorted_keys)) + 1))
+        sizes = np.diff(np.concatenate((starts, [len(order)])))
+        # Buckets of two are by far the most common; handle them in bulk.
+        pairs = starts[sizes == 2]
+        pair_keys.append(_pair_keys(order[pairs], order[pairs + 1], n_rows))
+        for start, size in zip(starts[sizes > 2], sizes[sizes > 2]):
+            group = order[start:start + size]
+            if size <= max_bucket:
+                first, second = np.triu_indices(size, k=1)
+            else:
+                # Oversized buckets are chained rather than expanded pairwise.
+                first, second = np.arange(size - 1), np.arange(1, size)
+            pair_keys.append(_pair_keys(group[first], group[second], n_rows))
+    if not pair_keys:
+        return np.empty((0, 2), dtype=np.int64)
+    unique = np.unique(np.concatenate(pair_keys))
+    return np.stack([unique // n_rows, unique % n_rows], axis=1)
+
+
+def approximate_top_pairs(vectors: sp.csr_matrix, signatures: np.ndarray, k: int, chunk: int = 1 << 20):
+    """Top-k (row, col, score) among LSH candidate pairs, scored exactly."""
+    candidates = lsh_candidates(signatures)
+    best = (np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float32))
+    for start in range(0, len(candidates), chunk):
+        pairs = candidates[start:start + chunk]
+        scores = np.asarray(vectors[pairs[:, 0]].multiply(vectors[pairs[:, 1]]).sum(axis=1)).ravel()
+        best = _keep_top(best, pairs[:, 0], pairs[:, 1], scores.astype(np.float32), k)
+    return best
+
+
+class CommentIndex:
+    """
+    Persisted n-gram counts, MinHash signatures and line offsets for a file.
+    Only complete (newline-terminated) lines are persisted; a trailing line
+    without a newline is featurized on every load.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:16]
+        self.index_path = cache_path(f"comments-{digest}.npz")
+
+    def load(self) -> Tuple[sp.csr_matrix, np.ndarray, np.ndarray]:
+        """Returns (counts, signatures, line offsets) covering every line of the file."""
+        counts, signatures, offsets, committed = self._load_persisted()
+        appended = False
+        tail = b""
+        with open(self.path, "rb") as file:
+            file.seek(committed)
+            while not tail:
+                block = file.read(FEATURIZE_BYTES)
+                if not block:
+                    break
+                if not block.endswith(b"\n"):
+                    block += file.readline()
+                cut = block.rfind(b"\n") + 1
+                # Anything after the last newline can only be an unterminated
+                # final line at end of file.
+                block, tail = block[:cut], block[cut:]
+                if not block:
+                    break
+                new_counts = featurize(block)
+                counts = sp.vstack([counts, new_counts], format="csr")
+                signatures = np.concatenate([signatures, minhash(new_counts)])
+                starts = np.concatenate(([0], np.flatnonzero(np.frombuffer(block, np.uint8) == 10)[:-1] + 1))
+                offsets = np.concatenate([offsets, starts + committed])
+                committed += cut
+                appended = True
+        if appended:
+            self._save(counts, signatures, offsets, committed)
+        if tail.strip():
+            tail_counts = featurize(tail + b"\n")
+            counts = sp.vstack([counts, tail_counts], format="csr")
+            signatures = np.concatenate([signatures, minhash(tail_counts)])
+            offsets = np.concatenate([offsets, [committed]])
+        return counts, signatures, offsets
+
+    def _empty(self):
+        return (
+            sp.csr_matrix((0, DIMENSIONS), dtype=np.float32),
+            np.empty((0, NUM_PERM), dtype=np.uint32),
+            np.empty(0, dtype=np.int64),
+            0,
+        )
+
+    def _load_persisted(self):
+        try:
+            stored = np.load(self.index_path)
+        except (OSError, ValueError):
+            return self._empty()
+        with stored:
+            committed = int(stored["committed"])
+            if int(stored["version"]) != INDEX_VERSION or os.path.getsize(self.path) < committed:
+                return self._empty()
+            # The file must still start with the bytes we indexed; compare the
+            # last indexed bytes as a cheap check for rewrites.
+            check = bytes(stored["check"])
+            with open(self.path, "rb") as file:
+                file.seek(committed - len(check))
+                if file.read(len(check)) != check:
+                    return self._empty()
+            counts = sp.csr_matrix(
+                (stored["data"], stored["indices"], stored["indptr"]), shape=(len(stored["offsets"]), DIMENSIONS)
+            )
+            return counts, stored["signatures"], stored["offsets"], committed
+
+    def _save(self, counts, signatures, offsets, committed):
+        with open(self.path, "rb") as file:
+            start = max(0, committed - 256)
+            file.seek(start)
+            check = file.read(committed - start)
+        partial = self.index_path + ".tmp.npz"
+        np.savez(
+            partial,
+            version=INDEX_VERSION,
+            data=counts.data,
+            indices=counts.indices,
+            indptr=counts.indptr,
+            signatures=signatures,
+            offsets=offsets,
+            committed=committed,
+            check=np.frombuffer(check, dtype=np.uint8),
+        )
+        os.replace(partial, self.index_path)
+
+
+def _line_at(file, offset: int) -> str:
+    file.seek(int(offset))
+    return file.readline().decode("utf-8", errors="replace").rstrip("\r\n")
+
+
+def most_similar(path: str, k: int = 1, method: str = "auto") -> List[SimilarPair]:
+    """
+    Returns the k most similar pairs of lines in path, best first. method is
+    "exact", "approximate" or "auto" (exact up to EXACT_LIMIT lines).
+    """
+    counts, signatures, offsets = CommentIndex(path).load()
+    vectors = tfidf(counts)
+    if method == "auto":
+        method = "exact" if vectors.shape[0] <= EXACT_LIMIT else "approximate"
+    if method == "exact":
+        rows, cols, scores = exact_top_pairs(vectors, k)
+    else:
+        rows, cols, scores = approximate_top_pairs(vectors, signatures, k)
+    order = sorted(range(len(scores)), key=lambda i: (-scores[i], rows[i], cols[i]))
+    pairs = []
+    with open(path, "rb") as file:
+        for i in order:
+            pairs.append(SimilarPair(
+                float(scores[i]), int(rows[i]), int(cols[i]),
+                _line_at(file, offsets[rows[i]]), _line_at(file, offsets[cols[i]]),
+            ))
+    return pairs
@@ -0,0 +1,164 @@
+"""
+Incremental Markdown-to-HTML builds (handle_b9_convert).
+
+Each worker process, and each io_pool thread converting a small batch,
+keeps one markdown.Markdown instance (per thread: the class is not
+thread-safe) and reset()s it between documents instead of rebuilding the
+parser and extensions per call as markdown.markdown() does.
+
+plan_build() walks the source tree with docindex.walk_markdown and compares
+it with a manifest of [mtime_ns, size, sha256, output stat] per relative
+path. Files whose stat is unchanged are skipped without being opened (their
+outputs are trusted, not re-stat'ed). Files that were touched but hash the
+same are skipped after one read, provided their output is still in place.
+Outputs are written atomically, and outputs of deleted sources are removed,
+so a rebuild after one edit costs a stat per file plus one conversion.
+Manifests are shared by concurrent builds and only touched under a lock.
+"""
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import markdown
+
+from app.docindex import WORKERS, walk_markdown
+from app.fsutil import atomic_write, cache_path, load_json, save_json
+
+EXTENSIONS = [name for name in os.getenv("SITE_MARKDOWN_EXTENSIONS", "").split(",") if name]
+# Below this many changed files the conversion stays on the calling thread;
+# starting work on the process pool costs more than it saves.
+PARALLEL_MIN_FILES = int(os.getenv("SITE_PARALLEL_MIN_FILES", 64))
+BATCH_FILES = int(os.getenv("SITE_BATCH_FILES", 256))
+
+_local = threading.local()
+_lock = threading.Lock()
+_manifests: Dict[str, dict] = {}
+_dirty = set()
+
+
+def _markdown() -> markdown.Markdown:
+    converter = getattr(_local, "converter", None)
+    if converter is None:
+        converter = _local.converter = markdown.Markdown(extensions=EXTENSIONS)
+    return converter
+
+
+def convert_file(src: str, dst: str):
+    with open(src, "r", encoding="utf-8") as md_file:
+        html = _markdown().reset().convert(md_file.read())
+    with atomic_write(dst) as html_file:
+        html_file.write(html)
+
+
+def convert_batch(pairs: List[Tuple[str, str]]) -> int:
+    """Converts (src, dst) pairs with this process's Markdown instance."""
+    for src, dst in pairs:
+        convert_file(src, dst)
+    return len(pairs)
+
+
+def output_path(dst_root: str, key: str) -> str:
+    return os.path.join(dst_root, os.path.splitext(key)[0] + ".html")
+
+
+def _manifest_path(src_root: str, dst_root: str) -> str:
+    key = f"{os.path.abspath(src_root)}\0{os.path.abspath(dst_root)}"
+    return cache_path(f"site-manifest-{hashlib.sha1(key.encode()).hexdigest()[:16]}.json")
+
+
+def _load_manifest(src_root: str, dst_root: str) -> dict:
+    # Called with _lock held.
+    path = _manifest_path(src_root, dst_root)
+    manifest = _manifests.get(path)
+    if manifest is None:
+        manifest = _manifests[path] = load_json(path, default={})
+    return manifest
+
+
+def _stat(path: str) -> Optional[list]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _output_current(entry: list, dst_root: str, key: str) -> bool:
+    return entry[3] is not None and entry[3] == _stat(output_path(dst_root, key))
+
+
+def _sha256(path: str) -> str:
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def plan_build(src_root: str, dst_root: str) -> Tuple[List[Tuple[str, str, str]], int, int]:
+    """
+    Returns ([(key, src, dst), ...] files to convert, files skipped, outputs
+    removed for deleted sources).
+    """
+    manifest_path = _manifest_path(src_root, dst_root)
+    # walk_markdown returns paths as os.path.join(src_root, ...), so slicing
+    # off the prefix is equivalent to (and much cheaper than) relpath.
+    prefix = len(os.path.join(src_root, ""))
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        found = walk_markdown(src_root, executor)
+        candidates, skipped = [], 0
+        seen = set()
+        with _lock:
+            manifest = _load_manifest(src_root, dst_root)
+            for path, mtime_ns, size in found:
+                key = path[prefix:].replace(os.sep, "/")
+                seen.add(key)
+                entry = manifest.get(key)
+                if entry is not None and entry[0] == mtime_ns and entry[1] == size and entry[3] is not None:
+                    skipped += 1
+                else:
+                    candidates.append((key, path, [mtime_ns, size]))
+        hashes = list(executor.map(_sha256, [path for _, path, _ in candidates]))
+
+    todo = []
+    removed = 0
+    with _lock:
+        if candidates:
+            _dirty.add(manifest_path)
+        for (key, path, stat), content_hash in zip(candidates, hashes):
+            entry = manifest.get(key)
+            dst = output_path(dst_root, key)
+            if entry is not None and entry[2] == content_hash and _output_current(entry, dst_root, key):
+                manifest[key] = stat + entry[2:]
+                skipped += 1
+            else:
+                # The output stat is filled in by record_build once written.
+                manifest[key] = stat + [content_hash, None]
+                todo.append((key, path, dst))
+
+        for key in [key for key in manifest if key not in seen]:
+            del manifest[key]
+            _dirty.add(manifest_path)
+            try:
+                os.remove(output_path(dst_root, key))
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return todo, skipped, removed
+
+
+def record_build(src_root: str, dst_root: str, done: List[Tuple[str, str, str]]):
+    """Stores the output stat of converted files and persists the manifest."""
+    manifest_path = _manifest_path(src_root, dst_root)
+    with _lock:
+        manifest = _load_manifest(src_root, dst_root)
+        for key, _, dst in done:
+            if key in manifest:
+                manifest[key][3] = _stat(dst)
+        if manifest_path in _dirty:
+            save_json(manifest_path, manifest)
+            _dirty.discard(manifest_path)
+
+
+def batches(todo: List[Tuple[str, str, str]], size: int = BATCH_FILES) -> List[List[Tuple[str, str]]]:
+    pairs = [(src, dst) for _, src, dst in todo]
+    return [pairs[i:i + size] for i in range(0, len(pairs), size)]
@@ -0,0 +1,127 @@
+"""
+Read-only SQLite access with per-thread connections and cached aggregates.
+
+Connections are opened once per thread and database file as read-only URI
+connections (mode=ro) tuned for scans: memory-mapped I/O, a larger page
+cache and in-memory temp storage. A database that is already in WAL mode is
+read without blocking writers; a read-only connection cannot switch the
+journal mode itself, so that is left to whoever writes the file.
+
+Aggregate results are cached keyed on the query and on the stat of the
+database file and its -wal file, so repeat queries against an unchanged
+database are answered from memory.
+"""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", 256 * 1024 * 1024))
+CACHE_KIB = int(os.getenv("SQLITE_CACHE_KIB", 64 * 1024))
+RESULT_CACHE_SIZE = int(os.getenv("SQLITE_RESULT_CACHE_SIZE", 256))
+
+METRICS = {
+    "sales": "SUM(units * price)",
+    "units": "SUM(units)",
+    "count": "COUNT(*)",
+    "avg_price": "AVG(price)",
+}
+
+_local = threading.local()
+_results: "OrderedDict[tuple, object]" = OrderedDict()
+_results_lock = threading.Lock()
+
+
+def _version(path: str) -> tuple:
+    st = os.stat(path)
+    try:
+        wal = os.stat(path + "-wal")
+        wal_version = (wal.st_mtime_ns, wal.st_size)
+    except FileNotFoundError:
+        wal_version = None
+    return (st.st_ino, st.st_mtime_ns, st.st_size, wal_version)
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Returns this thread's read-only connection to path, opening it if needed."""
+    path = os.path.abspath(path)
+    connections: Dict[str, tuple] = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    inode = os.stat(path).st_ino
+    cached = connections.get(path)
+    if cached is not None:
+        if cached[0] == inode:
+            return cached[1]
+        # The file was replaced (e.g. regenerated by datagen.py); reopen.
+        cached[1].close()
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.execute(f"PRAGMA mmap_size = {MMAP_BYTES}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_KIB}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA query_only = 1")
+    connections[path] = (inode, conn)
+    return conn
+
+
+def close_thread_connections():
+    for _, conn in getattr(_local, "connections", {}).values():
+        conn.close()
+    _local.connections = {}
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> set:
+    rows = conn.execute("SELECT name FROM pragma_table_info(?)", (table,)).fetchall()
+    if not rows:
+        raise ValueError(f"Unknown table: {table}")
+    return {row[0] for row in rows}
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def aggregate(
+    path: str,
+    metric: str = "sales",
+    table: str = "tickets",
+    where: Optional[Dict[str, object]] = None,
+    group_by: Optional[str] = None,
+):
+    """
+    Computes METRICS[metric] over table, filtered by column equality on
+    `where`. Returns a number, or {group value: number} when group_by is set.
+    Column names are checked against the table schema and values are bound
+    as parameters.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric}")
+    where = where or {}
+    key = (os.path.abspath(path), _version(path), metric, table, tuple(sorted(where.items())), group_by)
+    with _results_lock:
+        if key in _results:
+            _results.move_to_end(key)
+            return _results[key]
+
+    conn = connect(path)
+    columns = _columns(conn, table)
+    unknown = [name for name in [*where, group_by] if name is not None and name not in columns]
+    if unknown:
+        raise ValueError(f"Unknown column(s) for {table}: {', '.join(unknown)}")
+
+    sql = f"SELECT {METRICS[metric]} FROM {_quote(table)}"
+    if group_by:
+        sql = f"SELECT {_quote(group_by)}, {METRICS[metric]} FROM {_quote(table)}"
+    if where:
+        sql += " WHERE " + " AND ".join(f"{_quote(column)} = ?" for column in where)
+    if group_by:
+        sql += f" GROUP BY {_quote(group_by)} ORDER BY {_quote(group_by)}"
+    rows = conn.execute(sql, tuple(where.values())).fetchall()
+    result = {row[0]: row[1] or 0 for row in rows} if group_by else (rows[0][0] or 0)
+
+    with _results_lock:
+        _results[key] = result
+        while len(_results) > RESULT_CACHE_SIZE:
+            _results.popitem(last=False)
+    return result
@@ -0,0 +1,258 @@
+"""
+Streaming audio transcription (handle_b7).
+
+ffmpeg decodes the input to 16 kHz mono 16-bit PCM on a pipe, which is read
+in blocks. Nothing is written to disk. SilenceSplitter cuts the stream into
+chunks at pauses, using the RMS of short frames computed with NumPy. Chunks
+are sent to a recognizer backend on a small thread pool, and transcripts
+are emitted in chunk order as soon as each prefix of chunks has finished.
+Memory stays bounded by the in-flight chunks, not by the recording length.
+
+transcribe_file() writes the transcript atomically, so the output appears
+complete or not at all; meanwhile the text so far is appended, chunk by
+chunk, to a ".partial" file next to it, which is removed at the end.
+
+Backends are selected by name (TRANSCRIBE_BACKEND):
+- google: speech_recognition's web API.
+- sphinx: offline, needs pocketsphinx.
+- stub: no recognizer, reports chunk timings, for testing without network.
+"""
+import itertools
+import os
+import shutil
+import subprocess
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+import numpy as np
+
+from app.fsutil import atomic_write
+
+SAMPLE_RATE = 16000
+BLOCK_SECONDS = 1.0
+FRAME_MS = 30
+SILENCE_DB = float(os.getenv("TRANSCRIBE_SILENCE_DB", -40))
+MIN_SILENCE_MS = int(os.getenv("TRANSCRIBE_MIN_SILENCE_MS", 500))
+MIN_CHUNK_SECONDS = float(os.getenv("TRANSCRIBE_MIN_CHUNK_SECONDS", 3))
+MAX_CHUNK_SECONDS = float(os.getenv("TRANSCRIBE_MAX_CHUNK_SECONDS", 30))
+WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", 4))
+BACKEND = os.getenv("TRANSCRIBE_BACKEND", "google")
+FFMPEG = shutil.which(os.getenv("FFMPEG_BINARY", "ffmpeg")) or "ffmpeg"
+PARTIAL_SUFFIX = ".partial"
+
+
+def decode_pcm(path: str, rate: int = SAMPLE_RATE, block_seconds: float = BLOCK_SECONDS) -> Iterator[np.ndarray]:
+    """Yields int16 mono sample blocks of path, decoded by ffmpeg."""
+    # stderr goes to a temporary file: a pipe nobody reads until stdout ends
+    # can fill up on a noisy decode and deadlock both processes.
+    errors = tempfile.TemporaryFile()
+    process = subprocess.Popen(
+        [FFMPEG, "-nostdin", "-v", "error", "-i", path, "-f", "s16le", "-ac", "1", "-ar", str(rate), "-"],
+        stdout=subprocess.PIPE,
+        stderr=errors,
+    )
+    block_bytes = int(rate * block_seconds) * 2
+    try:
+        leftover = b""
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            data = leftover + data
+            usable = len(data) - len(data) % 2
+            leftover = data[usable:]
+            yield np.frombuffer(data[:usable], dtype=np.int16)
+        if process.wait() != 0:
+            errors.seek(0)
+            raise RuntimeError(f"ffmpeg failed: {errors.read().decode(errors='replace').strip()}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        errors.close()
+
+
+class SilenceSplitter:
+    """
+    Incrementally cuts a sample stream into chunks of at least
+    MIN_CHUNK_SECONDS, ending in the middle of a pause of MIN_SILENCE_MS, or
+    at MAX_CHUNK_SECONDS if no pause comes. Chunks with no frame above the
+    silence threshold are dropped.
+    """
+
+    def __init__(self, rate: int = SAMPLE_RATE, silence_db: float = SILENCE_DB,
+                 min_silence_ms: int = MIN_SILENCE_MS, min_chunk_seconds: float = MIN_CHUNK_SECONDS,
+                 max_chunk_seconds: float = MAX_CHUNK_SECONDS):
+        self.rate = rate
+        self.frame = rate * FRAME_MS // 1000
+        self.threshold = 32768 * 10 ** (silence_db / 20)
+        self.min_silence = rate * min_silence_ms // 1000
+        self.min_chunk = int(rate * min_chunk_seconds)
+        self.max_chunk = int(rate * max_chunk_seconds)
+        self.buffer = np.empty(0, dtype=np.int16)
+        self.offset = 0
+        self.scanned = 0
+        self.silence_start: Optional[int] = None
+        self.voiced = False
+
+    def _emit(self, cut: int) -> Optional[Tuple[float, np.ndarray]]:
+        chunk, voiced = self.buffer[:cut], self.voiced
+        start = self.offset / self.rate
+        self.buffer = self.buffer[cut:]
+        self.offset += cut
+        self.scanned = 0
+        self.silence_start = None
+        self.voiced = False
+        return (start, chunk) if voiced else None
+
+    def feed(self, samples: np.ndarray) -> List[Tuple[float, np.ndarray]]:
+        """Adds samples; returns the (start seconds, samples) chunks completed."""
+        self.buffer = np.concatenate([self.buffer, samples])
+        chunks = []
+        while True:
+            count = (len(self.buffer) - self.scanned) // self.frame
+            if count == 0:
+                return chunks
+            frames = self.buffer[self.scanned:self.scanned + count * self.frame].astype(np.float32)
+            rms = np.sqrt(np.mean(frames.reshape(count, self.frame) ** 2, axis=1))
+            cut = None
+            for quiet in rms < self.threshold:
+                position = self.scanned
+                self.scanned += self.frame
+                if not quiet:
+                    self.voiced = True
+                    self.silence_start = None
+                elif self.silence_start is None:
+                    self.silence_start = position
+                if (self.silence_start is not None and self.silence_start >= self.min_chunk
+                        and self.scanned - self.silence_start >= self.min_silence):
+                    cut = self.silence_start + self.min_silence // 2
+                elif self.scanned >= self.max_chunk:
+                    # Cut at the pause in progress, unless the whole chunk is one.
+                    cut = self.silence_start or self.scanned
+                if cut is not None:
+                    break
+            if cut is None:
+                return chunks
+            chunk = self._emit(cut)
+            if chunk is not None:
+                chunks.append(chunk)
+
+    def flush(self) -> List[Tuple[float, np.ndarray]]:
+        self.voiced = self.voiced or bool(
+            len(self.buffer) > self.scanned
+            and np.abs(self.buffer[self.scanned:]).max() >= self.threshold
+        )
+        chunk = self._emit(len(self.buffer)) if len(self.buffer) else None
+        return [chunk] if chunk is not None else []
+
+
+def _recognize_google(pcm: bytes, rate: int) -> str:
+    import speech_recognition as sr
+
+    try:
+        return sr.Recognizer().recognize_google(sr.AudioData(pcm, rate, 2))
+    except sr.UnknownValueError:
+        return ""
+
+
+def _recognize_sphinx(pcm: bytes, rate: int) -> str:
+    import speech_recognition as sr
+
+    try:
+        return sr.Recognizer().recognize_sphinx(sr.AudioData(pcm, rate, 2))
+    except sr.UnknownValueError:
+        return ""
+
+
+def _recognize_stub(pcm: bytes, rate: int) -> str:
+    return f"[{len(pcm) / 2 / rate:.2f}s]"
+
+
+BACKENDS: Dict[str, Callable[[bytes, int], str]] = {
+    "google": _recognize_google,
+    "sphinx": _recognize_sphinx,
+    "stub": _recognize_stub,
+}
+
+
+def transcribe_stream(
+    blocks: Iterable[np.ndarray],
+    output: TextIO,
+    backend: str = BACKEND,
+    rate: int = SAMPLE_RATE,
+    workers: int = WORKERS,
+    on_partial: Optional[Callable[[float, str], None]] = None,
+) -> dict:
+    """
+    Transcribes int16 sample blocks, writing each chunk's text to output (and
+    passing (start seconds, text) to on_partial) in order as it completes.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend: {backend}")
+    recognize = BACKENDS[backend]
+    splitter = SilenceSplitter(rate)
+    pending = deque()
+    stats = {"backend": backend, "chunks": 0, "seconds": 0.0, "characters": 0}
+
+    def emit(limit: int):
+        # Writes finished chunks from the head of the queue, waiting for the
+        # head while more than limit chunks are in flight.
+        while pending and (len(pending) > limit or pending[0][1].done()):
+            start, future = pending.popleft()
+            text = future.result().strip()
+            if not text:
+                continue
+            output.write((" " if stats["characters"] else "") + text)
+            output.flush()
+            stats["characters"] += len(text) + (1 if stats["characters"] else 0)
+            if on_partial:
+                on_partial(start, text)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for samples in itertools.chain(blocks, [None]):
+            if samples is None:
+                chunks = splitter.flush()
+            else:
+                stats["seconds"] += len(samples) / rate
+                chunks = splitter.feed(samples)
+            for start, chunk in chunks:
+                stats["chunks"] += 1
+                pending.append((start, executor.submit(recognize, chunk.tobytes(), rate)))
+            emit(limit=workers * 2)
+        emit(limit=0)
+    stats["seconds"] = round(stats["seconds"], 3)
+    return stats
+
+
+class _Tee:
+    def __init__(self, *files: TextIO):
+        self._files = files
+
+    def write(self, text: str):
+        for file in self._files:
+            file.write(text)
+
+    def flush(self):
+        for file in self._files:
+            file.flush()
+
+
+def transcribe_file(
+    path: str,
+    output_path: str,
+    backend: str = BACKEND,
+    on_partial: Optional[Callable[[float, str], None]] = None,
+) -> dict:
+    partial_path = output_path + PARTIAL_SUFFIX
+    try:
+        with open(partial_path, "w", encoding="utf-8") as partial, atomic_write(output_path) as output:
+            return transcribe_stream(decode_pcm(path), _Tee(output, partial), backend, on_partial=on_partial)
+    finally:
+        try:
+            os.remove(partial_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,90 @@
+"""
+Cold-start report for the API: import time and RSS of app.main, and what
+loading each task handler adds on top.
+
+Every measurement runs in a fresh interpreter, so a handler is charged for
+all the libraries it pulls in, even those it shares with other handlers:
+
+  app.main     importing the app with no handler loaded
+  <handler>    loading that one handler after app.main
+  all          loading every handler (what importing app.main used to cost)
+
+Usage: python benchmarks/bench_cold_start.py [--repeat 3] [--json report.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def child(name):
+    os.environ.setdefault("AIPROXY_TOKEN", "cold-start-report")
+    from app.handlers import _rss
+
+    start = time.perf_counter()
+    import app.main  # noqa: F401
+    from app import handlers
+
+    result = {"app_seconds": time.perf_counter() - start, "app_rss": _rss()}
+    names = list(handlers.handlers) if name == "all" else [name] if name != "app.main" else []
+    start = time.perf_counter()
+    errors = {}
+    for handler in names:
+        try:
+            handlers.handlers[handler].load()
+        except Exception as e:
+            errors[handler] = f"{type(e).__name__}: {e}"
+    result.update(seconds=time.perf_counter() - start, rss=_rss(), errors=errors)
+    print(json.dumps(result))
+
+
+def measure(name, repeat):
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", name],
+            check=True, capture_output=True, text=True, cwd=ROOT,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    # Median by load time; RSS barely varies between runs.
+    runs.sort(key=lambda run: run["seconds"] + run["app_seconds"])
+    return runs[len(runs) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="Also write the report to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+        return
+
+    from app.handlers import HANDLERS
+
+    base = measure("app.main", args.repeat)
+    report = {"app.main": {"seconds": base["app_seconds"], "rss": base["app_rss"]}}
+    print(f"{'':<20} {'import s':>9} {'RSS MB':>8} {'+s':>8} {'+RSS MB':>8}")
+    print(f"{'app.main':<20} {base['app_seconds']:>9.3f} {base['app_rss'] / 1e6:>8.1f}")
+    for name in [name for name, _, _, _ in HANDLERS] + ["all"]:
+        run = measure(name, args.repeat)
+        added = run["rss"] - run["app_rss"]
+        report[name] = {"seconds": run["seconds"], "rss": run["rss"], "rss_added": added, "errors": run["errors"]}
+        note = f"  ({len(run['errors'])} failed to import)" if run["errors"] else ""
+        print(
+            f"{name:<20} {run['app_seconds'] + run['seconds']:>9.3f} {run['rss'] / 1e6:>8.1f}"
+            f" {run['seconds']:>8.3f} {added / 1e6:>8.1f}{note}"
+        )
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark for app.crawl against a local fixture server.
+
+Serves --pages generated HTML pages (with ETags and an optional per-request
+--latency) from a threaded HTTP server, then reports pages/sec for the
+previous approach (sequential GET + BeautifulSoup html.parser), a cold crawl,
+and a warm re-crawl where every page answers 304.
+
+Usage: python benchmarks/bench_crawl.py [--pages 500] [--latency 0.02] [--concurrency 32]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PARAGRAPH = "<p>" + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 20 + "</p>\n"
+
+
+def page(n):
+    return (
+        f"<!doctype html><html lang=en><head><title>Fixture page {n}</title>"
+        f'<meta name="description" content="Page {n}"></head><body><h1>Page {n}</h1>'
+        + PARAGRAPH * 50
+        + "</body></html>"
+    ).encode()
+
+
+def serve(pages, latency):
+    bodies = {f"/page/{n}": page(n) for n in range(pages)}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            body = bodies.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            if latency:
+                time.sleep(latency)
+            etag = f'"{hash(body) & 0xffffffff:x}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def baseline(urls):
+    import httpx
+    from bs4 import BeautifulSoup
+
+    with httpx.Client() as session:
+        for url in urls:
+            BeautifulSoup(session.get(url).content, "html.parser").title.string
+
+
+def report(label, pages, elapsed):
+    print(f"{label:<36} {elapsed:>8.2f} s {pages / elapsed:>10.1f} pages/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--skip-baseline", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-crawl-")
+    os.environ["DATAWORKS_CACHE_DIR"] = os.path.join(workdir, "cache")
+    from app import crawl, fetch
+
+    server = serve(args.pages, args.latency)
+    urls = [f"http://127.0.0.1:{server.server_port}/page/{n}" for n in range(args.pages)]
+    output = os.path.join(workdir, "scraped.ndjson")
+
+    if not args.skip_baseline:
+        start = time.perf_counter()
+        baseline(urls)
+        report("sequential + html.parser", len(urls), time.perf_counter() - start)
+
+    async def run():
+        for label in ("crawl (cold)", "crawl (warm, 304s)"):
+            start = time.perf_counter()
+            counts = await crawl.crawl(urls, output, concurrency=args.concurrency, per_host=args.concurrency)
+            report(f"{label} {counts['changed']}/{counts['unchanged']}", len(urls), time.perf_counter() - start)
+        await fetch.close_client()
+
+    asyncio.run(run())
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark for app.csvfilter against the previous pandas path.
+
+Generates a CSV with --rows rows in a scratch directory, then runs each
+method in a fresh subprocess so peak RSS is measured independently:
+
+  pandas       read_csv + boolean mask + to_json(orient="records")
+  csvfilter    DuckDB read_csv_auto with pushdown, streamed to JSON / Parquet
+
+Usage: python benchmarks/bench_csv_filter.py [--rows 5000000] [--workdir /tmp/bench]
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WHERE = 'name == "Alice" and age >= 30'
+
+
+def generate(path, rows):
+    rng = random.Random(0)
+    names = ["Alice", "Bob", "Carol", "Dave", "Eve"]
+    cities = ["Paris", "Rome", "Oslo", "Lima", "Pune"]
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["id", "name", "age", "city", "score", "note"])
+        for i in range(rows):
+            writer.writerow([
+                i, rng.choice(names), rng.randint(18, 90), rng.choice(cities),
+                round(rng.random() * 100, 3), f"note {rng.getrandbits(32):08x}",
+            ])
+
+
+def run_pandas(src, dst):
+    import pandas as pd
+
+    df = pd.read_csv(src)
+    df[(df["name"] == "Alice") & (df["age"] >= 30)].to_json(dst, orient="records")
+
+
+def run_csvfilter(src, dst, fmt):
+    from app import csvfilter
+
+    csvfilter.filter_to_file(src, dst, WHERE, None, fmt)
+
+
+def child(method, src, dst):
+    start = time.perf_counter()
+    if method == "pandas":
+        run_pandas(src, dst)
+    else:
+        run_csvfilter(src, dst, method.split(":")[1])
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print(json.dumps({"seconds": elapsed, "peak_rss": peak}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--workdir", default="/tmp/bench-csv-filter")
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+
+    os.makedirs(args.workdir, exist_ok=True)
+    src = os.path.join(args.workdir, "data.csv")
+    if not os.path.exists(src) or os.path.getsize(src) == 0:
+        print(f"generating {args.rows} rows...")
+        generate(src, args.rows)
+    size = os.path.getsize(src)
+    print(f"{src}: {size / 1e6:.1f} MB, filter: {WHERE}")
+
+    for method, ext in (("pandas", "json"), ("csvfilter:json", "json"), ("csvfilter:parquet", "parquet")):
+        dst = os.path.join(args.workdir, f"out-{method.replace(':', '-')}.{ext}")
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", method, src, dst],
+            check=True, capture_output=True, text=True, cwd=ROOT,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{method:<20} {result['seconds']:>8.2f} s {size / result['seconds'] / 1e6:>8.1f} MB/s"
+            f" peak RSS {result['peak_rss'] / 1e6:>8.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,514 @@
+"""
+End-to-end benchmark for every task handler.
+
+For each --scales factor a data directory is seeded with datagen.py, plus
+the fixtures datagen does not make: a DuckDB file, a CSV, a JPEG, a WAV, a
+README and a bare Git repository. Then every handler is run in each mode in
+a fresh child process:
+
+  inprocess   awaits the handler coroutine directly, one call at a time
+  http        POSTs /run through the FastAPI app (httpx ASGI transport) with
+              --concurrency requests in flight, then GETs the handler's
+              output file from /read the same way
+  pipeline    (opt-in) runs every scenario's task once per scale, first as
+              one POST /run after another, then as a single POST /run/batch,
+              with TASK_MEMO=0; reports both wall times and the batch's
+              critical path (longest chain of dependent task times)
+
+Each child makes one cold call (with data/.cache cleared), then --requests
+timed calls, and reports p50/p90/p99/max latency, throughput and peak RSS
+(of the child and of its pool workers). Concurrent identical /run requests
+are merged by single-flight, as they would be in production, and in http
+mode repeated calls are answered from the task memo (app.memo) unless
+TASK_MEMO=0 is set; inprocess always runs the handler.
+
+Handlers that need the network run against local stand-ins: B1 fetches
+from and B6 crawls a local HTTP server, B2 clones and pushes a local bare
+repository (B2_REPO_URL), and B7 uses the offline "stub" recognizer. A1 is
+skipped (it pip-installs uv and regenerates data/), as is A2 unless prettier
+is on PATH.
+
+Results are written as JSON. --baseline compares p50 latency and
+throughput with an earlier results file and exits with status 1 if any
+handler regressed by more than --threshold.
+
+Usage: python benchmarks/bench_e2e.py [--scales 1 10] [--requests 20] [--concurrency 4]
+           [--modes inprocess http pipeline] [--only handle_a3,handle_b10]
+           [--output e2e.json] [--baseline old.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SKIPPED = {
+    "handle_a1": "installs uv with pip and regenerates data/ with datagen.py",
+}
+
+
+def scenarios(scale):
+    """(scenario, route name, task, output file served by /read)."""
+    items = [
+        ("handle_a2", "handle_a2", "Format data/format.md with prettier", "data/format.md"),
+        ("handle_a3", "handle_a3", "Count the number of Wednesdays in data/dates.txt", "data/dates-wednesdays.txt"),
+        ("handle_a4", "handle_a4", "Sort the contacts by last_name, then first_name", "data/contacts-sorted.json"),
+        ("handle_a5", "handle_a5", "Write the first line of the 10 most recent log files", "data/logs-recent.txt"),
+        ("handle_a6", "handle_a6", "Create an index of the Markdown files in data/docs", "data/docs/index.json"),
+        ("handle_a7", "handle_a7", "Extract the sender's email address from data/email.txt", "data/email-sender.txt"),
+        ("handle_a8", "handle_a8", "Extract the credit card number from data/credit_card.png", "data/credit-card.txt"),
+        ("handle_a9", "handle_a9", "Find the most similar comments", "data/comments-similar.txt"),
+        ("handle_a10", "handle_a10", "Calculate the total sales for Gold tickets", "data/ticket-sales-gold.txt"),
+        ("handle_b1", "handle_b1", "Fetch data from the API at {api_url}", "data/api-response.json"),
+        ("handle_b2", "handle_b2", "Clone the git repository and commit a change", "data/dataworks-agent/README.md"),
+        ("handle_b3", "handle_b3", "Run SQL on DuckDB data/sample.duckdb: `SELECT kind, count(*), avg(value) FROM events GROUP BY kind`", "data/duckdb-result.ndjson"),
+        ("handle_b5", "handle_b5", "Compress the image data/sample-image.jpg to 1024px", "data/sample-image-compressed.jpg"),
+        ("handle_b6", "handle_b6", "Scrape the website", "data/scraped_data.ndjson"),
+        ("handle_b7", "handle_b7", "Transcribe audio from data/sample-audio.wav with the stub recognizer", "data/transcription.txt"),
+        ("handle_b9_convert", "handle_b9_convert", "Convert the Markdown README to HTML", "data/README.html"),
+        ("handle_b9_docs", "handle_b9_convert", "Convert the Markdown docs to HTML", "data/site"),
+        ("handle_b10", "handle_b10", "Filter the CSV data/query-result.csv by `age >= 30` and save as JSON", "data/filtered_data.json"),
+    ]
+    if scale > 1:
+        items += [
+            ("handle_a7_mbox", "handle_a7", "Extract sender email addresses from data/emails.mbox", "data/email-senders.ndjson"),
+            ("handle_a8_dir", "handle_a8", "Extract the credit card numbers in data/credit_cards", "data/credit-cards.json"),
+            ("handle_b5_dir", "handle_b5", "Compress the images in data/credit_cards to 512px", None),
+        ]
+    return items
+
+
+# ------------------ seeding ------------------
+
+def _git(*args, cwd=None):
+    subprocess.run(
+        ["git", "-c", "user.name=bench", "-c", "user.email=bench@example.com", *args],
+        check=True, capture_output=True, cwd=cwd,
+    )
+
+
+def seed(scale_dir, scale, workers):
+    data = os.path.join(scale_dir, "data")
+    marker = os.path.join(data, ".seeded")
+    if os.path.exists(marker):
+        return
+    shutil.rmtree(scale_dir, ignore_errors=True)
+    os.makedirs(data)
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, os.path.join(ROOT, "datagen.py"), "bench@example.com",
+         "--root", data, "--scale", str(scale), "--workers", str(workers)],
+        check=True, stdout=subprocess.DEVNULL,
+    )
+
+    import duckdb
+    import numpy as np
+    from PIL import Image
+
+    rows = 100_000 * scale
+    conn = duckdb.connect(os.path.join(data, "sample.duckdb"))
+    conn.execute(
+        f"CREATE TABLE events AS SELECT range AS id, range % 7 AS kind, (hash(range) % 1000) / 10.0 AS value FROM range({rows})"
+    )
+    conn.execute(
+        f"""COPY (SELECT range AS id,
+                         ['Alice', 'Bob', 'Carol', 'Dave', 'Eve'][range % 5 + 1] AS name,
+                         18 + hash(range) % 60 AS age,
+                         ['Paris', 'Rome', 'Oslo', 'Lima'][range % 4 + 1] AS city
+                  FROM range({rows})) TO '{os.path.join(data, "query-result.csv")}' (HEADER)"""
+    )
+    conn.close()
+
+    noise = Image.effect_noise((2400, 1600), 48)
+    gradient = Image.linear_gradient("L").resize((2400, 1600))
+    Image.merge("RGB", (gradient, noise, gradient.transpose(Image.FLIP_LEFT_RIGHT))).save(
+        os.path.join(data, "sample-image.jpg"), quality=95
+    )
+
+    # Tone bursts separated by silence, so the splitter has chunks to find.
+    rate, seconds = 16000, 12 * min(scale, 10)
+    t = np.arange(rate * seconds) / rate
+    signal = (0.3 * np.sin(2 * np.pi * 440 * t) * ((t % 3) < 2) * 32767).astype(np.int16)
+    with wave.open(os.path.join(data, "sample-audio.wav"), "wb") as audio:
+        audio.setnchannels(1)
+        audio.setsampwidth(2)
+        audio.setframerate(rate)
+        audio.writeframes(signal.tobytes())
+
+    with open(os.path.join(data, "README.md"), "w") as readme:
+        for section in range(20):
+            readme.write(f"## Section {section}\n\nSome *text* with a [link](https://example.com/{section}).\n\n")
+            readme.write("".join(f"- item {item}\n" for item in range(10)) + "\n```\ncode block\n```\n\n")
+
+    remote = os.path.join(scale_dir, "remote.git")
+    _git("init", "--bare", remote)
+    checkout = os.path.join(scale_dir, "remote-init")
+    _git("clone", remote, checkout)
+    shutil.copy(os.path.join(data, "README.md"), checkout)
+    _git("add", "README.md", cwd=checkout)
+    _git("commit", "-m", "Initial commit", cwd=checkout)
+    _git("push", "origin", "HEAD", cwd=checkout)
+    shutil.rmtree(checkout)
+
+    with open(marker, "w") as file:
+        file.write(str(scale))
+    print(f"seeded scale {scale} in {time.perf_counter() - start:.1f} s", flush=True)
+
+
+# ------------------ child: one scenario in one mode ------------------
+
+def serve_fixtures(pages):
+    """Local stand-in for the B1 API and the B6 websites; returns the server."""
+    bodies = {"/api/posts": json.dumps([{"id": i, "title": f"Post {i}", "body": "x" * 200} for i in range(100)]).encode()}
+    for n in range(pages):
+        bodies[f"/site/{n}"] = (
+            f"<!doctype html><html lang=en><head><title>Page {n}</title>"
+            f'<meta name="description" content="Fixture page {n}"></head><body>'
+            + "<p>Lorem ipsum dolor sit amet.</p>" * 500 + "</body></html>"
+        ).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            body = bodies.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            etag = f'"{hash(body) & 0xffffffff:x}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json" if self.path.startswith("/api") else "text/html")
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def peak_rss():
+    """Peak RSS of this process in bytes. ru_maxrss survives exec on Linux, so
+    a child would report the parent's peak; VmHWM is reset by exec."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def load(call, requests, concurrency):
+    latencies, errors = [], []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await call()
+            except Exception as e:
+                errors.append(str(e)[:200])
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:3],
+        "p50_ms": percentile(latencies, 0.50) and percentile(latencies, 0.50) * 1000,
+        "p90_ms": percentile(latencies, 0.90) and percentile(latencies, 0.90) * 1000,
+        "p99_ms": percentile(latencies, 0.99) and percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else None,
+        "throughput_rps": len(latencies) / wall if wall else None,
+        "wall_s": wall,
+    }
+
+
+def critical_path(outcomes):
+    """Seconds along the longest chain of dependent tasks in a batch."""
+    finish = {}
+    for outcome in sorted(outcomes, key=lambda outcome: outcome["index"]):
+        finish[outcome["index"]] = outcome["seconds"] + max((finish[d] for d in outcome["depends_on"]), default=0.0)
+    return max(finish.values(), default=0.0)
+
+
+async def run_pipeline(client, tasks):
+    async def sequential():
+        errors = 0
+        for task in tasks:
+            response = await client.post("/run", params={"task": task})
+            errors += response.status_code != 200
+        return errors
+
+    async def batch():
+        outcomes = []
+        async with client.stream("POST", "/run/batch", json={"tasks": tasks}) as response:
+            async for line in response.aiter_lines():
+                if line:
+                    outcomes.append(json.loads(line))
+        return outcomes
+
+    await batch()  # warm imports, pools and the page cache for both runs
+    start = time.perf_counter()
+    errors = await sequential()
+    sequential_s = time.perf_counter() - start
+    start = time.perf_counter()
+    outcomes = await batch()
+    batch_s = time.perf_counter() - start
+    return {
+        "name": "pipeline",
+        "tasks": len(tasks),
+        "errors": errors,
+        "batch_errors": sum(outcome["status"] != 200 for outcome in outcomes),
+        "sequential_ms": sequential_s * 1000,
+        "batch_ms": batch_s * 1000,
+        "critical_path_ms": critical_path(outcomes) * 1000,
+    }
+
+
+async def run_child(spec):
+    server = serve_fixtures(pages=spec["pages"])
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["B6_SEED_URLS"] = " ".join(f"{base}/site/{n}" for n in range(spec["pages"]))
+    os.environ.setdefault("AIPROXY_TOKEN", "bench")
+    if spec["mode"] == "pipeline":
+        os.environ["TASK_MEMO"] = "0"
+    task = spec["task"].format(api_url=f"{base}/api/posts")
+
+    from app import handlers
+    from app.executor import shutdown_pools
+
+    results = []
+    if spec["mode"] == "inprocess":
+        handler = handlers.handlers[spec["route"]]
+
+        async def call():
+            await handler(task)
+
+        start = time.perf_counter()
+        cold_error = None
+        try:
+            await call()
+        except Exception as e:
+            cold_error = str(e)[:200]
+        cold = time.perf_counter() - start
+        result = await load(call, spec["requests"], 1)
+        results.append({"name": spec["scenario"], "first_ms": cold * 1000, "first_error": cold_error, **result})
+    elif spec["mode"] == "pipeline":
+        import httpx
+        from app.main import app
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            results.append(await run_pipeline(client, [task.format(api_url=f"{base}/api/posts") for task in spec["tasks"]]))
+    else:
+        import httpx
+        from app.main import app
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            async def run():
+                response = await client.post("/run", params={"task": task})
+                if response.status_code != 200:
+                    raise RuntimeError(f"{response.status_code}: {response.text}")
+
+            start = time.perf_counter()
+            cold_error = None
+            try:
+                await run()
+            except Exception as e:
+                cold_error = str(e)[:200]
+            cold = time.perf_counter() - start
+            result = await load(run, spec["requests"], spec["concurrency"])
+            results.append({"name": spec["scenario"], "first_ms": cold * 1000, "first_error": cold_error, **result})
+
+            output = spec["output"]
+            if output and os.path.isfile(output) and result["errors"] < result["requests"]:
+                async def read():
+                    response = await client.get("/read", params={"path": output})
+                    if response.status_code != 200:
+                        raise RuntimeError(f"{response.status_code}: {response.text}")
+
+                result = await load(read, spec["requests"], spec["concurrency"])
+                results.append({"name": f"{spec['scenario']}:read", "first_ms": None, "first_error": None, **result})
+
+    fetch = sys.modules.get("app.fetch")
+    if fetch is not None:
+        await fetch.close_client()
+    shutdown_pools(wait=True)
+    server.shutdown()
+    peak = peak_rss()
+    workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    for result in results:
+        result.update(peak_rss=peak, peak_rss_workers=workers)
+    print(json.dumps(results))
+
+
+# ------------------ parent ------------------
+
+def run_scenario(scale_dir, spec, timeout):
+    shutil.rmtree(os.path.join(scale_dir, "data", ".cache"), ignore_errors=True)
+    env = {**os.environ, "B2_REPO_URL": os.path.join(scale_dir, "remote.git"), "PYTHONPATH": ROOT}
+    try:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", json.dumps(spec)],
+            cwd=scale_dir, env=env, capture_output=True, text=True, timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return [{"name": spec["scenario"], "failed": f"timed out after {timeout} s"}]
+    if completed.returncode != 0:
+        return [{"name": spec["scenario"], "failed": completed.stderr.strip().splitlines()[-1:]}]
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _ms(value):
+    return f"{value:>9.1f}" if value is not None else f"{'-':>9}"
+
+
+def report_line(result):
+    if "failed" in result:
+        return f"  {result['name']:<24} FAILED {result['failed']}"
+    if result["name"] == "pipeline":
+        return (
+            f"  {'pipeline':<24} {result['tasks']} tasks: sequential {result['sequential_ms']:.1f} ms,"
+            f" batch {result['batch_ms']:.1f} ms, critical path {result['critical_path_ms']:.1f} ms"
+            f" ({result['errors']}/{result['batch_errors']} failed)"
+        )
+    rps = result["throughput_rps"]
+    line = (
+        f"  {result['name']:<24} {result['requests'] - result['errors']:>4}/{result['requests']:<4}"
+        f"{_ms(result['first_ms'])}{_ms(result['p50_ms'])}{_ms(result['p90_ms'])}{_ms(result['p99_ms'])}"
+        f" {rps if rps is not None else 0:>9.1f} {result['peak_rss'] / 1e6:>7.0f} {result['peak_rss_workers'] / 1e6:>7.0f}"
+    )
+    errors = result["error_samples"] or ([result["first_error"]] if result.get("first_error") else [])
+    return line + (f"  error: {errors[0]}" if errors else "")
+
+
+def compare(results, baseline_path, threshold):
+    """Prints p50/throughput changes against a baseline; returns the number of regressions."""
+    with open(baseline_path) as file:
+        baseline = {(r["scale"], r["mode"], r["name"]): r for r in json.load(file)["results"]}
+    regressions = 0
+    print(f"\ncompared with {baseline_path} (threshold {threshold:.0%}):")
+    for result in results:
+        old = baseline.get((result["scale"], result["mode"], result["name"]))
+        if old is None or not result.get("p50_ms") or not old.get("p50_ms"):
+            continue
+        latency = result["p50_ms"] / old["p50_ms"]
+        throughput = (result["throughput_rps"] or 0) / (old["throughput_rps"] or 1)
+        regressed = latency > 1 + threshold or throughput < 1 / (1 + threshold)
+        regressions += regressed
+        print(
+            f"  scale {result['scale']:<5} {result['mode']:<10} {result['name']:<24}"
+            f" p50 x{latency:>5.2f}  throughput x{throughput:>5.2f}{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--modes", nargs="+", default=["inprocess", "http"], choices=["inprocess", "http", "pipeline"])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--only", default="", help="Comma-separated scenario names")
+    parser.add_argument("--workdir", default="/tmp/bench-e2e")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="datagen.py workers")
+    parser.add_argument("--reseed", action="store_true", help="Regenerate data even if already seeded")
+    parser.add_argument("--timeout", type=float, default=900, help="Seconds per scenario")
+    parser.add_argument("--output", default="bench-e2e.json")
+    parser.add_argument("--baseline", help="Earlier results file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        asyncio.run(run_child(json.loads(args.child)))
+        return
+
+    only = {name.strip() for name in args.only.split(",") if name.strip()}
+    results = []
+    for scale in args.scales:
+        scale_dir = os.path.join(os.path.abspath(args.workdir), f"scale-{scale}")
+        if args.reseed:
+            shutil.rmtree(scale_dir, ignore_errors=True)
+        seed(scale_dir, scale, args.workers)
+        print(f"\nscale {scale}")
+        print(f"  {'':<24} {'ok':>9}{'first ms':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9} {'req/s':>9} {'RSS MB':>7} {'workers':>7}")
+        pipeline_tasks = []
+        for scenario, route, task, output in scenarios(scale):
+            if only and scenario not in only:
+                continue
+            if route == "handle_a2" and not shutil.which("prettier"):
+                print(f"  {scenario:<24} skipped: prettier is not on PATH")
+                continue
+            pipeline_tasks.append(task)
+            for mode in [mode for mode in args.modes if mode != "pipeline"]:
+                spec = {
+                    "scenario": scenario, "route": route, "task": task, "output": output, "mode": mode,
+                    "requests": args.requests, "concurrency": args.concurrency, "pages": 20 * scale,
+                }
+                for result in run_scenario(scale_dir, spec, args.timeout):
+                    result.update(scale=scale, mode=mode)
+                    results.append(result)
+                    print(f"{report_line(result)}  [{mode}]", flush=True)
+        for scenario, reason in SKIPPED.items():
+            print(f"  {scenario:<24} skipped: {reason}")
+        if "pipeline" in args.modes and pipeline_tasks:
+            spec = {"scenario": "pipeline", "task": "", "tasks": pipeline_tasks, "mode": "pipeline", "pages": 20 * scale}
+            for result in run_scenario(scale_dir, spec, args.timeout):
+                result.update(scale=scale, mode="pipeline")
+                results.append(result)
+                print(report_line(result), flush=True)
+
+    commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    meta = {
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+    }
+    with open(args.output, "w") as file:
+        json.dump({"meta": meta, "results": results}, file, indent=2)
+    print(f"\nresults written to {args.output}")
+    if args.baseline and compare(results, args.baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
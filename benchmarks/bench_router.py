@@ -0,0 +1,87 @@
+"""
+Micro-benchmark for app.router.TaskRouter.
+
+Registers the production route table plus N synthetic routes and reports
+routes/sec for cold (cache-miss) and warm (cache-hit) lookups.
+
+Usage: python benchmarks/bench_router.py [--routes 18 100 1000] [--iterations 200000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.router import TaskRouter  # noqa: E402
+
+PRODUCTION_PATTERNS = [
+    (r"install uv", r"datagen\.py"),
+    (r"format", r"prettier"),
+    (r"count.*wednesday",),
+    (r"sort.*contacts",),
+    (r"first.*line.*log",),
+    (r"index.*markdown",),
+    (r"extract.*email",),
+    (r"credit.*card.*number",),
+    (r"similar.*comments",),
+    (r"sales.*gold.*tickets",),
+    (r"fetch.*data.*api",),
+    (r"clone.*git",),
+    (r"run.*sql.*duckdb",),
+    (r"compress.*image",),
+    (r"scrape.*website",),
+    (r"transcribe.*audio",),
+    (r"convert.*markdown.*html",),
+    (r"filter.*csv.*json",),
+]
+
+TASKS = [
+    "Install uv and run datagen.py with my email",
+    "Count the number of Wednesdays in data/dates.txt",
+    "Sort the contacts by last_name then first_name",
+    "Write the first line of the 10 most recent log files",
+    "Filter the CSV file and write JSON",
+    "Convert the Markdown README to HTML",
+    "Something no handler understands",
+]
+
+
+def build_router(total_routes):
+    router = TaskRouter()
+    for i, patterns in enumerate(PRODUCTION_PATTERNS):
+        router.add(lambda task: None, *patterns, name=f"prod{i}")
+    for i in range(max(0, total_routes - len(PRODUCTION_PATTERNS))):
+        router.add(lambda task: None, rf"synthetic{i}.*route", name=f"synthetic{i}")
+    router.resolve("warm up")
+    return router
+
+
+def bench(router, tasks, iterations):
+    start = time.perf_counter()
+    resolve = router.resolve
+    n = len(tasks)
+    for i in range(iterations):
+        resolve(tasks[i % n])
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--routes", type=int, nargs="+", default=[18, 100, 1000])
+    parser.add_argument("--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+
+    print(f"{'routes':>8} {'cold routes/s':>15} {'warm routes/s':>15}")
+    for total in args.routes:
+        router = build_router(total)
+        cold_iterations = min(args.iterations, 20_000)
+        # Unique suffixes defeat the routing cache and exercise the combined matcher.
+        cold_tasks = [f"{TASKS[i % len(TASKS)]} #{i}" for i in range(cold_iterations)]
+        cold = bench(router, cold_tasks, cold_iterations)
+        warm = bench(router, TASKS, args.iterations)
+        print(f"{total:>8} {cold:>15,.0f} {warm:>15,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark for app.sqlitedb aggregates over a generated tickets table.
+
+Builds ticket-sales.db with --rows rows (same schema as datagen.py) in a
+scratch directory, then times a cold aggregate, a cached repeat, a group-by,
+and the previous connect-per-request query for comparison.
+
+Usage: python benchmarks/bench_sqlite_agg.py [--rows 100000000] [--workdir /tmp/bench]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import sqlitedb  # noqa: E402
+
+BATCH = 100_000
+
+
+def generate(path, rows):
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("CREATE TABLE tickets (type TEXT NOT NULL, units INTEGER NOT NULL, price DECIMAL(10,2) NOT NULL)")
+    rng = random.Random(0)
+    types = ["Gold", "Silver", "Bronze"]
+    for start in range(0, rows, BATCH):
+        batch = [
+            (rng.choice(types), rng.randint(1, 10), round(rng.uniform(50, 150), 2))
+            for _ in range(min(BATCH, rows - start))
+        ]
+        conn.executemany("INSERT INTO tickets VALUES (?, ?, ?)", batch)
+        conn.commit()
+    conn.close()
+
+
+def timed(label, fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<32} {elapsed * 1000:>12.3f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--workdir", default="/tmp/dataworks-bench")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    path = os.path.join(args.workdir, "ticket-sales.db")
+    start = time.perf_counter()
+    generate(path, args.rows)
+    print(f"generated {args.rows:,} rows in {time.perf_counter() - start:.1f}s")
+
+    def connect_per_request():
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute("SELECT SUM(units * price) FROM tickets WHERE type = 'Gold'").fetchone()[0]
+        finally:
+            conn.close()
+
+    timed("connect per request (old)", connect_per_request)
+    timed("aggregate, cold", lambda: sqlitedb.aggregate(path, "sales", where={"type": "Gold"}))
+    timed("aggregate, cached", lambda: sqlitedb.aggregate(path, "sales", where={"type": "Gold"}), repeat=10_000)
+    timed("group by type, cold", lambda: sqlitedb.aggregate(path, "sales", group_by="type"))
+    timed("group by type, cached", lambda: sqlitedb.aggregate(path, "sales", group_by="type"), repeat=10_000)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 # DISCLAIMER: THIS SCRIPT WILL CHANGE BEFORE THE EVALUATION. TREAT THIS AS A GUIDE.
 
-# Usage: uv run datagen.py <email>
+# Usage: uv run datagen.py <email> [--root /data] [--scale N] [--workers N] [--only a3,a10]
 
 # /// script
 # requires-python = ">=3.13"
@@ -10,6 +10,13 @@
 # ]
 # ///
 
+# --scale N multiplies every dataset by generating N shards of it. Shard 0 is
+# seeded exactly as before, so --scale 1 output is unchanged; shard s > 0 is
+# seeded with "<email>:<task>:<s>", so the output depends only on the email
+# and the scale, never on --workers. Shards are generated in chunks on a
+# process pool and written out in shard order as chunks complete, with only
+# a few chunks in flight, so no dataset is ever held in memory whole.
+
 import datetime
 import hashlib
 import json
@@ -17,21 +24,98 @@ import os
 import random
 import sqlite3
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image, ImageDraw, ImageFont
 from faker import Faker
 
-config = {"root": "/data"}
+config = {"root": "/data", "scale": 1, "workers": 1}
+
+# Shards per pool task: large enough to amortize pickling, small enough that
+# the few chunks in flight stay small.
+CHUNK_SHARDS = 64
+
+# Bulk-load settings for ticket-sales.db and its per-chunk parts. The database
+# is built under a temporary name and renamed into place, so skipping the
+# journal and fsyncs cannot leave a half-written file behind.
+SQLITE_PRAGMAS = [
+    "PRAGMA page_size = 65536",
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA locking_mode = EXCLUSIVE",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -262144",
+]
+
+_fake = None
+_executor = None
 
 
 def num(str):
     return int(hashlib.sha256(str.encode()).hexdigest(), 16) % (2**32)
 
 
+def seed(email, task, shard=0):
+    """Seed text for one shard of a task; shard 0 keeps the original seed."""
+    return f"{email}:{task}" if shard == 0 else f"{email}:{task}:{shard}"
+
+
+def faker(seed_text):
+    """This process's Faker instance, re-seeded (creating one per shard is slow)."""
+    global _fake
+    if _fake is None:
+        _fake = Faker()
+    _fake.seed_instance(num(seed_text))
+    return _fake
+
+
 def write_file(path, content):
     with open(os.path.join(config["root"], path), "w", encoding="utf-8") as f:
         f.write(content)
 
 
+def _init_worker(parent_config):
+    config.update(parent_config)
+
+
+def run_sharded(fn, *args):
+    """
+    Yields fn(shards, *args) for consecutive ranges of shards covering
+    range(scale), in order. With more than one worker the calls run on the
+    process pool, with at most two per worker in flight.
+    """
+    scale, workers = config["scale"], config["workers"]
+    size = max(1, min(CHUNK_SHARDS, -(-scale // (4 * workers))))
+    chunks = [range(start, min(start + size, scale)) for start in range(0, scale, size)]
+    if workers <= 1 or len(chunks) == 1:
+        for chunk in chunks:
+            yield fn(chunk, *args)
+        return
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(dict(config),))
+    pending = deque()
+    for chunk in chunks:
+        pending.append(_executor.submit(fn, chunk, *args))
+        if len(pending) >= 2 * workers:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def write_joined(path, parts, separator, prefix="", suffix=""):
+    """Streams parts to path, separator-joined, as they are produced."""
+    with open(os.path.join(config["root"], path), "w", encoding="utf-8") as f:
+        f.write(prefix)
+        first = True
+        for part in parts:
+            if not part:
+                continue
+            f.write(part if first else separator + part)
+            first = False
+        f.write(suffix)
+
+
 def get_markdown(email):
     return f"""#Unformatted Markdown
 
@@ -56,8 +140,8 @@ def a2_format_markdown():
     write_file("format.md", get_markdown(config["email"]))
 
 
-def get_dates(email):
-    random.seed(f"{email}:a3", version=2)
+def get_dates(email, shard=0):
+    rng = random.Random(seed(email, "a3", shard))
     start_date = datetime.datetime(2000, 1, 1)
     end_date = datetime.datetime(2024, 12, 31)
     formats = [
@@ -66,14 +150,18 @@ def get_dates(email):
         "%b %d, %Y",  # Mar 14, 2024
         "%Y/%m/%d %H:%M:%S",  # 2024/03/14 15:30:45
     ]
-    timestamps = random.sample(range(int(start_date.timestamp()), int(end_date.timestamp())), 1000)
+    timestamps = rng.sample(range(int(start_date.timestamp()), int(end_date.timestamp())), 1000)
     return [
-        datetime.datetime.fromtimestamp(ts).strftime(random.choice(formats)) for ts in timestamps
+        datetime.datetime.fromtimestamp(ts).strftime(rng.choice(formats)) for ts in timestamps
     ]
 
 
+def _dates_chunk(shards):
+    return "\n".join("\n".join(get_dates(config["email"], shard)) for shard in shards)
+
+
 def a3_dates():
-    """Save 1,000 random non-unique dates between 2000-01-01 and 2024-12-31 at dates.txt
+    """Save 1,000 random non-unique dates per shard between 2000-01-01 and 2024-12-31 at dates.txt
 
     Generates dates in various unambiguous formats:
     - ISO 8601: yyyy-mm-dd
@@ -81,76 +169,89 @@ def a3_dates():
     - MMM dd, yyyy
     - yyyy/mm/dd HH:MM:SS
     """
-    dates = get_dates(config["email"])
-    write_file("dates.txt", "\n".join(dates))
+    write_joined("dates.txt", run_sharded(_dates_chunk), "\n")
 
 
-def get_contacts(email):
-    fake = Faker()
-    fake.seed_instance(num(f"{email}:a4"))
+def get_contacts(email, shard=0):
+    fake = faker(seed(email, "a4", shard))
     return [
         {"first_name": fake.first_name(), "last_name": fake.last_name(), "email": fake.email()}
         for _ in range(100)
     ]
 
 
+def _contacts_chunk(shards):
+    return ", ".join(
+        json.dumps(contact) for shard in shards for contact in get_contacts(config["email"], shard)
+    )
+
+
 def a4_contacts():
-    """Generate a JSON with 100 contacts with random first_name, last_name, and email"""
-    contacts = get_contacts(config["email"])
-    write_file("contacts.json", json.dumps(contacts))
+    """Generate a JSON with 100 contacts per shard with random first_name, last_name, and email"""
+    write_joined("contacts.json", run_sharded(_contacts_chunk), ", ", "[", "]")
 
 
-def get_logs(email):
+def get_logs(email, shard=0):
     files = []
-    random.seed(f"{email}:a5", version=2)
-    fake = Faker()
-    fake.seed_instance(num(f"{email}:a5"))
+    rng = random.Random(seed(email, "a5", shard))
+    fake = faker(seed(email, "a5", shard))
     for i in range(50):
         text = "\n".join([fake.text() for _ in range(10)])
-        age = random.randint(1, 24 * 60 * 60 * 365)
+        age = rng.randint(1, 24 * 60 * 60 * 365)
         files.append((age, text))
     return files
 
 
+def _logs_chunk(shards, now):
+    for shard in shards:
+        for i, (age, text) in enumerate(get_logs(config["email"], shard), start=50 * shard):
+            write_file(f"logs/log-{i}.log", text)
+            os.utime(os.path.join(config["root"], f"logs/log-{i}.log"), (now - age, now - age))
+    return len(shards)
+
+
 def a5_logs():
-    """Generate 50 log files with 10 lines each of random content at logs/"""
-    email = config["email"]
+    """Generate 50 log files per shard with 10 lines each of random content at logs/"""
     os.makedirs(os.path.join(config["root"], "logs"), exist_ok=True)
-    now = time.time()
-    for i, (age, text) in enumerate(get_logs(email)):
-        write_file(f"logs/log-{i}.log", text)
-        os.utime(os.path.join(config["root"], f"logs/log-{i}.log"), (now - age, now - age))
+    for _ in run_sharded(_logs_chunk, time.time()):
+        pass
 
 
-def get_docs(email):
+def get_docs(email, shard=0):
     files = []
-    random.seed(f"{email}:a6", version=2)
-    fake = Faker()
-    fake.seed_instance(num(f"{email}:a6"))
+    rng = random.Random(seed(email, "a6", shard))
+    fake = faker(seed(email, "a6", shard))
     for dir in fake.words(10):
         for file in fake.words(10):
-            prefix = "\n".join([fake.text() for _ in range(random.randint(0, 10))])
+            prefix = "\n".join([fake.text() for _ in range(rng.randint(0, 10))])
             heading = f"# {fake.sentence()}"
-            suffix = "\n".join([fake.text() for _ in range(random.randint(0, 10))])
+            suffix = "\n".join([fake.text() for _ in range(rng.randint(0, 10))])
             text = "\n".join([prefix, heading, suffix])
             files.append((dir, file, text))
     return files
 
 
+def _docs_chunk(shards):
+    for shard in shards:
+        # Shards other than 0 get their own subtree; their random words
+        # would otherwise overwrite each other's files.
+        root = os.path.join(config["root"], "docs", *([f"shard-{shard}"] if shard else []))
+        for dir, file, text in get_docs(config["email"], shard):
+            dirname = os.path.join(root, dir)
+            os.makedirs(dirname, exist_ok=True)
+            write_file(os.path.join(dirname, f"{file}.md"), text)
+    return len(shards)
+
+
 def a6_docs():
-    """Generate 10 Markdown files each under 10 random subdirectories with random content."""
-    email = config["email"]
-    docs = get_docs(email)
+    """Generate 10 Markdown files each under 10 random subdirectories (per shard) with random content."""
     os.makedirs(os.path.join(config["root"], "docs"), exist_ok=True)
-    for dir, file, text in docs:
-        dirname = os.path.join(config["root"], "docs", dir)
-        os.makedirs(dirname, exist_ok=True)
-        write_file(os.path.join(dirname, f"{file}.md"), text)
+    for _ in run_sharded(_docs_chunk):
+        pass
 
 
-def get_email(email):
-    fake = Faker()
-    fake.seed_instance(num(f"{email}:a7"))
+def get_email(email, shard=0):
+    fake = faker(seed(email, "a7", shard))
     email = {
         "recipient": fake.email(),
         "from_name": fake.name(),
@@ -169,12 +270,8 @@ def get_email(email):
     return email
 
 
-def a7_email():
-    """Generate an email file at email.txt"""
-    data = get_email(config["email"])
-    write_file(
-        "email.txt",
-        f"""Delivered-To: {data["recipient"]}
+def format_email(data):
+    return f"""Delivered-To: {data["recipient"]}
 MIME-Version: 1.0
 From: "{data["from_name"]}" <{data["from_email"]}>
 Date: {data["date"]}
@@ -190,13 +287,27 @@ Content-Transfer-Encoding: quoted-printable
 {data["body"]}
 
 --00000000000091a0ba062bcdefca--
-""",
-    )
+"""
+
 
+def _emails_chunk(shards):
+    messages = []
+    for shard in shards:
+        data = get_email(config["email"], shard)
+        body = format_email(data).replace("\nFrom ", "\n>From ")
+        messages.append(f"From {data['from_email']} {data['date']}\n{body}\n")
+    return "".join(messages)
 
-def get_credit_card(email):
-    fake = Faker()
-    fake.seed_instance(num(f"{email}:a8"))
+
+def a7_email():
+    """Generate an email file at email.txt (and, when scaled, one message per shard at emails.mbox)"""
+    write_file("email.txt", format_email(get_email(config["email"])))
+    if config["scale"] > 1:
+        write_joined("emails.mbox", run_sharded(_emails_chunk), "")
+
+
+def get_credit_card(email, shard=0):
+    fake = faker(seed(email, "a8", shard))
     return {
         "number": fake.credit_card_number(),
         "expiry": fake.credit_card_expire(),
@@ -205,10 +316,7 @@ def get_credit_card(email):
     }
 
 
-def a8_credit_card_image():
-    """Generate a credit card image at credit_card.png that mimics a real credit card layout"""
-    data = get_credit_card(config["email"])
-
+def draw_credit_card(data):
     # Create image with credit card proportions (3.375" x 2.125" at 300 DPI)
     WIDTH, HEIGHT = 1012, 638
     image = Image.new("RGB", (WIDTH, HEIGHT), (25, 68, 141))  # Deep blue background
@@ -226,49 +334,113 @@ def a8_credit_card_image():
     draw.text((50, 480), data["expiry"], fill=(255, 255, 255))
     draw.text((250, 480), data["security_code"], fill=(255, 255, 255))
     draw.text((50, 550), data["name"], fill=(255, 255, 255))
+    return image
+
+
+def _credit_cards_chunk(shards):
+    for shard in shards:
+        image = draw_credit_card(get_credit_card(config["email"], shard))
+        image.save(os.path.join(config["root"], "credit_cards", f"card-{shard}.png"))
+    return len(shards)
 
-    image.save(os.path.join(config["root"], "credit_card.png"))
+
+def a8_credit_card_image():
+    """Generate a credit card image at credit_card.png that mimics a real credit card layout
+    (and, when scaled, one per shard under credit_cards/)"""
+    draw_credit_card(get_credit_card(config["email"])).save(os.path.join(config["root"], "credit_card.png"))
+    if config["scale"] > 1:
+        os.makedirs(os.path.join(config["root"], "credit_cards"), exist_ok=True)
+        for _ in run_sharded(_credit_cards_chunk):
+            pass
 
 
-def get_comments(email):
-    fake = Faker()
-    fake.seed_instance(num(f"{email}:a9"))
+def get_comments(email, shard=0):
+    fake = faker(seed(email, "a9", shard))
     return [fake.paragraph() for _ in range(100)]
 
 
+def _comments_chunk(shards):
+    return "\n".join("\n".join(get_comments(config["email"], shard)) for shard in shards)
+
+
 def a9_comments():
-    """Generate a comments.txt file with 100 random comments"""
-    write_file("comments.txt", "\n".join(get_comments(config["email"])))
+    """Generate a comments.txt file with 100 random comments per shard"""
+    write_joined("comments.txt", run_sharded(_comments_chunk), "\n")
 
 
-def get_tickets(email):
-    random.seed(f"{email}:a10", version=2)
+def get_tickets(email, shard=0):
+    rng = random.Random(seed(email, "a10", shard))
     ticket_types = ["Gold", "Silver", "Bronze"]
+    choice, randint, uniform = rng.choice, rng.randint, rng.uniform
     return [
-        (random.choice(ticket_types), random.randint(1, 10), round(random.uniform(50, 150), 2))
+        (choice(ticket_types), randint(1, 10), round(uniform(50, 150), 2))
         for _ in range(1000)
     ]
 
 
-def a10_ticket_sales():
-    """Generate ticket-sales.db with a tickets(type, units, price) table. 1 row per ticket"""
-    target = os.path.join(config["root"], "ticket-sales.db")
-    if os.path.exists(target):
-        os.remove(target)
-    conn = sqlite3.connect(target)
-    cursor = conn.cursor()
-    cursor.execute(
-        """
+TICKETS_TABLE = """
         CREATE TABLE IF NOT EXISTS tickets (
             type TEXT NOT NULL,
             units INTEGER NOT NULL,
             price DECIMAL(10,2) NOT NULL
         )
     """
-    )
-    cursor.executemany("INSERT INTO tickets VALUES (?, ?, ?)", get_tickets(config["email"]))
-    conn.commit()
+
+
+def bulk_connect(path):
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    conn.execute(TICKETS_TABLE)
+    return conn
+
+
+def _tickets_chunk(shards, parts_dir):
+    """Writes the chunk's rows to a database of its own; returns its path."""
+    path = os.path.join(parts_dir, f"part-{shards.start}.db")
+    conn = bulk_connect(path)
+    conn.execute("BEGIN")
+    for shard in shards:
+        conn.executemany("INSERT INTO tickets VALUES (?, ?, ?)", get_tickets(config["email"], shard))
+    conn.execute("COMMIT")
     conn.close()
+    return path
+
+
+def a10_ticket_sales():
+    """Generate ticket-sales.db with a tickets(type, units, price) table. 1 row per ticket, 1,000 per shard"""
+    target = os.path.join(config["root"], "ticket-sales.db")
+    parts_dir = target + ".parts"
+    os.makedirs(parts_dir, exist_ok=True)
+    conn = bulk_connect(target + ".partial")
+    # Workers insert rows (the slow, per-row part) into their own databases;
+    # merging one in is a single INSERT ... SELECT, in one transaction.
+    for part in run_sharded(_tickets_chunk, parts_dir):
+        conn.execute("ATTACH DATABASE ? AS part", (part,))
+        conn.execute("BEGIN")
+        conn.execute("INSERT INTO tickets SELECT * FROM part.tickets")
+        conn.execute("COMMIT")
+        conn.execute("DETACH DATABASE part")
+        os.remove(part)
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.close()
+    os.rmdir(parts_dir)
+    os.replace(target + ".partial", target)
+
+
+GENERATORS = {
+    "a2": a2_format_markdown,
+    "a3": a3_dates,
+    "a4": a4_contacts,
+    "a5": a5_logs,
+    "a6": a6_docs,
+    "a7": a7_email,
+    "a8": a8_credit_card_image,
+    "a9": a9_comments,
+    "a10": a10_ticket_sales,
+}
 
 
 if __name__ == "__main__":
@@ -277,23 +449,31 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("email")
     parser.add_argument("--root", default="/data")
+    parser.add_argument("--scale", type=int, default=1, help="Multiply every dataset by this factor")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Generator processes")
+    parser.add_argument("--only", default="", help=f"Comma-separated subset of {', '.join(GENERATORS)}")
     args = parser.parse_args()
+    if args.scale < 1 or args.workers < 1:
+        parser.error("--scale and --workers must be at least 1")
+    only = [name.strip() for name in args.only.split(",") if name.strip()] or list(GENERATORS)
+    unknown = [name for name in only if name not in GENERATORS]
+    if unknown:
+        parser.error(f"unknown dataset(s): {', '.join(unknown)}")
     config["email"] = args.email
     config["root"] = os.path.abspath(args.root)
+    config["scale"] = args.scale
+    config["workers"] = args.workers
 
     os.makedirs(config["root"], exist_ok=True)
 
     print("DISCLAIMER: THIS SCRIPT WILL CHANGE BEFORE THE EVALUATION. TREAT THIS AS A GUIDE.")
     print("Files created at", config["root"])
 
-    a2_format_markdown()
-    a3_dates()
-    a4_contacts()
-    a5_logs()
-    a6_docs()
-    a7_email()
-    a8_credit_card_image()
-    a9_comments()
-    a10_ticket_sales()
+    try:
+        for name in only:
+            GENERATORS[name]()
+    finally:
+        if _executor is not None:
+            _executor.shutdown()
 
 # DISCLAIMER: THIS SCRIPT WILL CHANGE BEFORE THE EVALUATION. TREAT THIS AS A GUIDE.